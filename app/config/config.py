@@ -3,18 +3,114 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
 class Config:
     # LocationIQ
     LOCATIONIQ_API_KEY = os.getenv("VITE_LOCATIONIQ_API_KEY", "pk.c9228d44132bed501f2cab0dc3c6e783")
+    LOCATIONIQ_BASE_URL = os.getenv("LOCATIONIQ_BASE_URL", "https://us1.locationiq.com/v1")
+
+    # Geocoding client: pooled session, LRU+TTL cache (GEOCODE_CACHE_PATH persists it; empty disables)
+    GEOCODE_TIMEOUT_SECONDS = float(os.getenv("GEOCODE_TIMEOUT_SECONDS", "8"))
+    GEOCODE_POOL_SIZE = int(os.getenv("GEOCODE_POOL_SIZE", "10"))
+    GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+    GEOCODE_CACHE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", "86400"))
+    GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "")
+    GEOCODE_CACHE_SAVE_SECONDS = float(os.getenv("GEOCODE_CACHE_SAVE_SECONDS", "30"))
+    # Answer autocomplete/geocode from the offline street index before calling LocationIQ
+    STREET_INDEX_ENABLED = os.getenv("STREET_INDEX_ENABLED", "1") == "1"
 
-    # Paths to data files (inside /data)
-    POPULATION_DATA = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/data/melbourne_population_cleaned_new.xlsx")
-    VEHICLE_DATA = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/data/victoria_vehicle_registration_cleaned.xlsx")
-    PARKING_BAYS_DATA = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/data/on_street_parking_bays_cleaned.xlsx")
-    BAY_SENSORS_DATA = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/data/on_street_parking_bay_sensors_cleaned.csv")
-    PARKING_ZONES_DATA = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/data/parking_zones_linked_to_street_segments_cleaned.csv")
-    SIGN_PLATES_DATA = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/data/sign_plates_located_in_each_parking_zone_cleaned.csv")
+    # Paths to data files (inside /data); DATA_DIR or any single path can be overridden
+    DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+    POPULATION_DATA = os.getenv("POPULATION_DATA", os.path.join(DATA_DIR, "melbourne_population_cleaned_new.xlsx"))
+    VEHICLE_DATA = os.getenv("VEHICLE_DATA", os.path.join(DATA_DIR, "victoria_vehicle_registration_cleaned.xlsx"))
+    PARKING_BAYS_DATA = os.getenv("PARKING_BAYS_DATA", os.path.join(DATA_DIR, "on_street_parking_bays_cleaned.xlsx"))
+    BAY_SENSORS_DATA = os.getenv("BAY_SENSORS_DATA", os.path.join(DATA_DIR, "on_street_parking_bay_sensors_cleaned.csv"))
+    PARKING_ZONES_DATA = os.getenv("PARKING_ZONES_DATA", os.path.join(DATA_DIR, "parking_zones_linked_to_street_segments_cleaned.csv"))
+    SIGN_PLATES_DATA = os.getenv("SIGN_PLATES_DATA", os.path.join(DATA_DIR, "sign_plates_located_in_each_parking_zone_cleaned.csv"))
 
     # Paths inside /app
-    ZONE_LOCATIONS_PATH = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/app/config/zone_locations.json")
-    ML_MODEL_PATH = os.path.join("E:/Monash/Semester 4/FIT5120/Onboarding_Project/findmyspot/app/ml_model/findmyspot_model.pth")
+    ZONE_LOCATIONS_PATH = os.getenv("ZONE_LOCATIONS_PATH", os.path.join(BASE_DIR, "app", "config", "zone_locations.json"))
+    ML_MODEL_PATH = os.getenv("ML_MODEL_PATH", os.path.join(BASE_DIR, "app", "ml_model", "findmyspot_model.pth"))
+
+    # Data backend (see app/repository.py): files | postgres | sqlite
+    DATA_BACKEND = os.getenv("DATA_BACKEND", "files")
+    DATABASE_URL = os.getenv("DATABASE_URL", "")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(DATA_DIR, "findmyspot.sqlite"))
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+    # How long a table's change token (row count / newest sensor timestamp) is trusted before re-querying
+    DB_TOKEN_TTL_SECONDS = float(os.getenv("DB_TOKEN_TTL_SECONDS", "5"))
+
+    # LSTM inference: input window length (hours) and CPU threads per worker
+    ML_SEQUENCE_LENGTH = int(os.getenv("ML_SEQUENCE_LENGTH", "24"))
+    ML_TORCH_THREADS = int(os.getenv("ML_TORCH_THREADS", "1"))
+    ML_PRELOAD_MODEL = os.getenv("ML_PRELOAD_MODEL", "1") == "1"
+
+    # Forecast table: how often to check the model file, and max table age before a rebuild
+    FORECAST_CHECK_SECONDS = float(os.getenv("FORECAST_CHECK_SECONDS", "300"))
+    FORECAST_MAX_AGE_SECONDS = float(os.getenv("FORECAST_MAX_AGE_SECONDS", "86400"))
+
+    # Columnar snapshot cache for the Excel/CSV sources (see app/snapshots.py)
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, ".snapshots"))
+    SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "1") == "1"
+
+    # HTTP response cache (ETag / 304 / pre-compressed bodies) for trends, realtime and find
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+    HTTP_CACHE_ENTRIES = int(os.getenv("HTTP_CACHE_ENTRIES", "1024"))
+    HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    HTTP_CACHE_MAX_BODY_BYTES = int(os.getenv("HTTP_CACHE_MAX_BODY_BYTES", str(4 * 1024 * 1024)))
+    HTTP_CACHE_MIN_COMPRESS_BYTES = int(os.getenv("HTTP_CACHE_MIN_COMPRESS_BYTES", "512"))
+
+    # Fill empty sensor Zone_Number values from the k nearest zoned bays (distance-weighted vote)
+    ZONE_IMPUTE_ENABLED = os.getenv("ZONE_IMPUTE_ENABLED", "1") == "1"
+    ZONE_IMPUTE_K = int(os.getenv("ZONE_IMPUTE_K", "5"))
+    ZONE_IMPUTE_RADIUS_M = float(os.getenv("ZONE_IMPUTE_RADIUS_M", "200"))
+
+    # Shared stage pool (app/executor.py) and /find per-stage deadlines in seconds (0 = no deadline)
+    STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "8"))
+    FIND_GEOCODE_TIMEOUT_SECONDS = float(os.getenv("FIND_GEOCODE_TIMEOUT_SECONDS", "5"))
+    FIND_SEARCH_TIMEOUT_SECONDS = float(os.getenv("FIND_SEARCH_TIMEOUT_SECONDS", "10"))
+    FIND_PREDICT_TIMEOUT_SECONDS = float(os.getenv("FIND_PREDICT_TIMEOUT_SECONDS", "1.5"))
+    # Geocode pool: its own threads, and lookups past GEOCODE_MAX_PENDING (running + queued) get a 503
+    GEOCODE_WORKERS = int(os.getenv("GEOCODE_WORKERS", os.getenv("GEOCODE_POOL_SIZE", "10")))
+    GEOCODE_MAX_PENDING = int(os.getenv("GEOCODE_MAX_PENDING", "64"))
+    # GET /nearest: largest k, and the candidate pool (× k) re-ranked by predicted availability
+    NEAREST_MAX_K = int(os.getenv("NEAREST_MAX_K", "50"))
+    NEAREST_RERANK_POOL = int(os.getenv("NEAREST_RERANK_POOL", "4"))
+    NEAREST_MAX_RADIUS_M = float(os.getenv("NEAREST_MAX_RADIUS_M", "5000"))
+    # POST /find_batch limits
+    FIND_BATCH_MAX_POINTS = int(os.getenv("FIND_BATCH_MAX_POINTS", "200"))
+    FIND_BATCH_MAX_RADIUS_M = float(os.getenv("FIND_BATCH_MAX_RADIUS_M", "2000"))
+
+    # Live sensor feed: seconds between checks of BAY_SENSORS_DATA for new rows (0 disables)
+    SENSOR_REFRESH_SECONDS = float(os.getenv("SENSOR_REFRESH_SECONDS", "60"))
+    # Prometheus metrics at /api/metrics; slow requests are logged with their stage breakdown
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", "1000"))
+    METRICS_SLOW_SAMPLE_RATE = float(os.getenv("METRICS_SLOW_SAMPLE_RATE", "1.0"))
+    # GET /stream (server-sent occupancy deltas)
+    STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))
+    STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+    STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "600"))
+    STREAM_RETRY_MS = int(os.getenv("STREAM_RETRY_MS", "3000"))
+    STREAM_MAX_ZONES = int(os.getenv("STREAM_MAX_ZONES", "100"))
+    # Open streams per worker process. Each one holds a handler thread, so the default keeps
+    # half of gunicorn's GUNICORN_THREADS free for the other endpoints and /api/ready
+    STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS",
+                                           str(max(int(os.getenv("GUNICORN_THREADS", "4")) // 2, 1))))
+    # GET /tiles/<z>/<x>/<y> (occupancy clusters per map tile)
+    TILE_MIN_ZOOM = int(os.getenv("TILE_MIN_ZOOM", "10"))
+    TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "18"))
+    TILE_CLUSTER_DEPTH = int(os.getenv("TILE_CLUSTER_DEPTH", "3"))
+    TILE_BAYS_ZOOM = int(os.getenv("TILE_BAYS_ZOOM", "17"))
+    # Warm-up before traffic (app/warmup.py): background | sync | off
+    WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+    # Wall-clock zone of the sign plates, the model and HH:MM / "now" parameters (the host may run in UTC)
+    LOCAL_TIMEZONE = os.getenv("LOCAL_TIMEZONE", "Australia/Melbourne")
+    # Sensor status history and hourly profiles (app/parking/history.py); intervals between
+    # two readings of a bay count for at most HISTORY_MAX_INTERVAL_SECONDS
+    HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+    HISTORY_DIR = os.getenv("HISTORY_DIR", os.path.join(DATA_DIR, ".history"))
+    HISTORY_TIMEZONE = os.getenv("HISTORY_TIMEZONE", LOCAL_TIMEZONE)
+    HISTORY_MAX_INTERVAL_SECONDS = float(os.getenv("HISTORY_MAX_INTERVAL_SECONDS", "43200"))
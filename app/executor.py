@@ -0,0 +1,129 @@
+# app/executor.py
+"""
+Worker pools for request stages that wait on I/O (geocoding) or may stall (first model
+load), so a request can overlap them and give up on one after a deadline.
+
+- stage pool: index warm-up and predictions
+- geocode pool: LocationIQ lookups only. It holds at most GEOCODE_MAX_PENDING lookups
+  (running or queued) and refuses more with StageBusy, so a slow upstream fills this pool
+  and nothing else; searches that need no address never wait behind it.
+
+Pools are per process and re-created after a fork. A stage that misses its deadline keeps
+running in its pool, and its result is dropped, so it still fills caches for the next
+request. Only the request that timed out moves on without it.
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+from app.config.config import Config
+from app.metrics import record_span
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} did not finish within {timeout:g}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class StageBusy(Exception):
+    """A stage's pool is saturated; the work was refused rather than queued."""
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} is at capacity, retry later")
+        self.stage = stage
+
+
+class BoundedPool:
+    """Thread pool that refuses work once ``max_pending`` submissions are running or queued."""
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max(max_pending, workers))
+        self.rejected = 0
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise StageBusy(self.name)
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_geocode_pool: Optional[BoundedPool] = None
+_geocode_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=Config.STAGE_WORKERS, thread_name_prefix="stage")
+                _pool_pid = os.getpid()
+    return _pool
+
+def get_geocode_executor() -> BoundedPool:
+    global _geocode_pool, _geocode_pool_pid
+    if _geocode_pool is None or _geocode_pool_pid != os.getpid():
+        with _pool_lock:
+            if _geocode_pool is None or _geocode_pool_pid != os.getpid():
+                _geocode_pool = BoundedPool("geocode", Config.GEOCODE_WORKERS, Config.GEOCODE_MAX_PENDING)
+                _geocode_pool_pid = os.getpid()
+    return _geocode_pool
+
+
+class StageTimer:
+    """Wall time per named stage, rendered as a Server-Timing header."""
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    def wait(self, stage: str, future: Future, timeout: Optional[float]) -> Any:
+        """Result of ``future``, or StageTimeout once ``timeout`` seconds pass (None = no deadline)."""
+        t0 = time.perf_counter()
+        try:
+            return future.result(timeout=timeout if timeout and timeout > 0 else None)
+        except FutureTimeout:
+            future.cancel()  # no-op if already running; it then finishes in the background
+            raise StageTimeout(stage, timeout) from None
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.durations[stage] = self.durations.get(stage, 0.0) + elapsed * 1000
+            record_span(stage, elapsed)
+
+    def run(self, stage: str, fn: Callable[..., Any], *args, timeout: Optional[float] = None,
+            pool: Any = None, **kwargs) -> Any:
+        """
+        Run ``fn`` in ``pool`` (default: the stage pool) and wait for it up to ``timeout``
+        seconds. A BoundedPool may raise StageBusy instead of accepting the work.
+        """
+        # A copy of this context, so spans recorded inside fn land in the caller's request
+        ctx = contextvars.copy_context()
+        return self.wait(stage, (pool or get_executor()).submit(ctx.run, fn, *args, **kwargs), timeout)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a block on the calling thread as a stage."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.durations[stage] = self.durations.get(stage, 0.0) + elapsed * 1000
+            record_span(stage, elapsed)
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.durations.items())
@@ -0,0 +1,203 @@
+# app/http_cache.py
+"""
+HTTP response cache for the read-heavy JSON endpoints.
+
+Entries are keyed on (endpoint, raw query string, data version). The version comes
+from the snapshot or repository change token each endpoint reads, so an entry dies when its data changes. A cached
+entry keeps its body pre-compressed (gzip, plus brotli when the ``brotli`` package from
+requirements-optional.txt is installed). It carries a strong ETag, so a repeat request costs a dict lookup, or a
+``304 Not Modified`` when the client already holds the body.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+from app.config.config import Config
+from app.utils import local_now
+from app.repository import get_repository
+
+try:  # optional (requirements-optional.txt): brotli bodies are only offered when installed
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+    print("[HttpCache] brotli not installed; cached bodies are offered as gzip only")
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, mimetype: str):
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        self.mimetype = mimetype
+        self.etag = digest
+        self.bodies: Dict[str, bytes] = {"identity": body}
+        if len(body) >= Config.HTTP_CACHE_MIN_COMPRESS_BYTES:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body, quality=5)
+
+    @property
+    def size(self) -> int:
+        return sum(len(b) for b in self.bodies.values())
+
+    def _tag(self, encoding: str) -> str:
+        # Strong validators must differ per content-coding
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+    def respond(self) -> Response:
+        encoding = "identity"
+        accepted = request.accept_encodings
+        for enc in ("br", "gzip"):
+            if enc in self.bodies and accepted[enc] > 0:
+                encoding = enc
+                break
+        headers = {"ETag": f'"{self._tag(encoding)}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+        inm = request.if_none_match
+        if inm and (inm.star_tag or any(inm.contains(self._tag(e)) for e in self.bodies)):
+            return Response(status=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], status=200, mimetype=self.mimetype, headers=headers)
+
+
+class ResponseCache:
+    """Bounded LRU (entries and bytes) of CachedResponse objects."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, entry: CachedResponse):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._data[key] = entry
+            self._bytes += entry.size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._data), "bytes": self._bytes, "hits": self.hits,
+                "misses": self.misses, "not_modified": self.not_modified, "brotli": brotli is not None}
+
+
+response_cache = ResponseCache(Config.HTTP_CACHE_ENTRIES, Config.HTTP_CACHE_MAX_BYTES)
+
+# ------------------------------------
+# Data versions per endpoint
+# ------------------------------------
+def _token(table: str) -> Any:
+    return get_repository().token(table)
+
+def _sensor_version() -> Tuple:
+    from app.parking.sensor_feed import sensor_store
+    snap = sensor_store.current()
+    return snap.version, snap.loaded_at
+
+def _find_version() -> Tuple:
+    from app.ml_model.ml_predictor import forecast_store
+    table = forecast_store.current()
+    # Predictions and the default legality time follow the clock: bucket by minute when a
+    # stay is checked against "now", otherwise by hour
+    now = local_now()
+    bucket = now.strftime("%Y%m%d%H%M" if request.args.get("stay") and not request.args.get("at") else "%Y%m%d%H")
+    return (_sensor_version(), table.built_at if table else None, bucket,
+            _token("bays"), _token("zone_links"), _token("sign_plates"))
+
+def _history_version() -> Tuple:
+    from app.parking.history import history_store
+    return _sensor_version(), history_store.current().total_events
+
+# endpoint name → data version function
+CACHED_ENDPOINTS: Dict[str, Callable[[], Any]] = {
+    "population.population_trends": lambda: _token("population"),
+    "vehicles.vehicle_trends": lambda: _token("vehicles"),
+    "parking.api_realtime_by_zone": _sensor_version,
+    "parking.api_find_nearby": _find_version,
+    "parking.api_nearest_free": _find_version,
+    "parking.api_occupancy_tile": _sensor_version,
+    "parking.api_historical": _history_version,
+    "parking.api_turnover": _history_version,
+}
+
+def _cache_key() -> Optional[Tuple]:
+    version_fn = CACHED_ENDPOINTS.get(request.endpoint)
+    if version_fn is None or request.method != "GET":
+        return None
+    # Raw args: handlers read them case- and whitespace-sensitively, so normalising here
+    # would let differently-handled requests share an entry
+    query = tuple(sorted(request.args.items(multi=True)))
+    path = tuple(sorted((request.view_args or {}).items()))
+    return request.endpoint, path, query, version_fn()
+
+# ------------------------------------
+# Flask hooks
+# ------------------------------------
+def init_http_cache(app: Flask):
+    if not Config.HTTP_CACHE_ENABLED:
+        return
+
+    @app.before_request
+    def _serve_cached():
+        key = _cache_key()
+        if key is None:
+            return None
+        g.http_cache_key = key
+        entry = response_cache.get(key)
+        if entry is None:
+            return None
+        g.http_cache_hit = True
+        resp = entry.respond()
+        if resp.status_code == 304:
+            response_cache.not_modified += 1
+        return resp
+
+    @app.after_request
+    def _store_response(resp: Response):
+        key = g.pop("http_cache_key", None)
+        if key is None or g.pop("http_cache_hit", False):
+            return resp
+        if resp.status_code != 200 or resp.direct_passthrough or resp.mimetype != "application/json":
+            return resp
+        if "no-store" in resp.headers.get("Cache-Control", ""):
+            return resp
+        body = resp.get_data()
+        if len(body) > Config.HTTP_CACHE_MAX_BODY_BYTES:
+            return resp
+        entry = CachedResponse(body, resp.mimetype)
+        response_cache.put(key, entry)
+        out = entry.respond()
+        if out.status_code == 304:
+            response_cache.not_modified += 1
+        # Keep any headers set by the view itself
+        for name, value in resp.headers.items():
+            if name.lower() not in ("content-length", "content-type", "content-encoding", "etag", "vary"):
+                out.headers.setdefault(name, value)
+        return out
@@ -1,5 +1,10 @@
 # app/__init__.py
 import os
+
+# Started first so the import breakdown covers everything below (see app/warmup.py)
+from app.warmup import startup
+startup.time_imports("numpy", "pandas", "flask")
+
 from flask import Flask
 from flask_cors import CORS
 
@@ -8,6 +13,20 @@ from app.routes import core_bp
 from app.parking.parking_routes import parking_bp
 from app.trends.population_routes import population_bp
 from app.trends.vehicle_routes import vehicle_bp
+from app.snapshots import snapshot_cli
+from app.repository import db_cli
+from app.parking.zone_imputation import zones_cli
+from app.memory import memory_cli
+from app.parking.history import history_cli, history_store
+from app.parking.turnover import turnover_store
+from app.http_cache import init_http_cache
+from app.metrics import init_metrics
+from app.parking.sensor_feed import sensor_store
+from app.parking.live_updates import subscriptions
+from app.parking.tile_pyramid import tile_store
+from app.config.config import Config
+
+startup.imports_done()
 
 def create_app():
     app = Flask(__name__)
@@ -28,6 +47,35 @@ def create_app():
     app.register_blueprint(population_bp, url_prefix="/api/population")
     app.register_blueprint(vehicle_bp, url_prefix="/api/vehicles")
 
+    # Request/stage latency histograms for /api/metrics. Registered before the HTTP cache
+    # so that cache hits are timed too
+    init_metrics(app)
+
+    # ETag / 304 / pre-compressed response cache keyed on the data snapshot version
+    init_http_cache(app)
+
+    # CLI: `flask --app wsgi snapshots build` prebuilds data snapshots during deploy
+    app.cli.add_command(snapshot_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(zones_cli)
+    app.cli.add_command(memory_cli)
+    app.cli.add_command(history_cli)
+
+    # Background refresh of the live sensor snapshot (per worker process); each swap
+    # pushes the changed bays to /api/parking/stream subscribers and the tile counters
+    sensor_store.add_listener(subscriptions.publish)
+    sensor_store.add_listener(tile_store.on_snapshot)
+    # ... and appends the status changes to the history log behind /historical, which
+    # passes them on to the dwell and turnover totals behind /turnover
+    if Config.HISTORY_ENABLED:
+        sensor_store.add_listener(history_store.on_snapshot)
+        history_store.add_listener(turnover_store.on_batch)
+    sensor_store.start()
+
+    # Load every snapshot, index, trend cube and (with ML_PRELOAD_MODEL) the model and its
+    # forecast table before traffic arrives; /api/ready flips when done
+    startup.start(Config.WARMUP_MODE)
+
     @app.route("/")
     def index():
         return "FindMySpot backend is running. Try /api/health", 200
@@ -0,0 +1,214 @@
+# app/memory.py
+"""
+Compact in-memory datasets, loading before fork and a memory report.
+
+The parking tables are compacted once, when they enter the process caches:
+
+- integral ID columns become int32, or float32 while they still hold blanks (exact for
+  IDs below 2^24)
+- repetitive text becomes categorical: one copy of each distinct string plus small integer
+  codes. This covers statuses, restriction days and displays, street names, segment
+  descriptions and feed timestamps
+- the ``Location`` text column is dropped, because it repeats Latitude/Longitude
+
+Coordinates stay float64. In float32 a Melbourne longitude moves by up to about 1 m,
+which would change the lat/lon the API returns.
+
+Under gunicorn (see gunicorn.conf.py) the master runs the warm-up (app/warmup.py), freezes
+the garbage collector and then forks. The workers share those pages copy-on-write rather
+than each reading its own copy. Categorical columns also matter here: reading an object
+column touches the reference count of every string, which copies the page it lives on.
+Each worker still builds its own sensor snapshots after the first refresh.
+
+``flask memory report`` prints bytes per dataset and index, plus the process's resident
+memory split into shared and private pages.
+"""
+import gc
+import sys
+import ctypes
+from typing import Any, Dict, Optional, Set
+
+import click
+import numpy as np
+import pandas as pd
+from flask.cli import AppGroup
+
+from app.config.config import Config
+
+ID_COLUMNS = ("KerbsideID", "RoadSegmentID", "ParkingZone", "Zone_Number", "Segment_ID")
+REDUNDANT_COLUMNS = ("Location",)
+# Text columns whose distinct values are at most this share of the rows become categorical
+CATEGORY_MAX_SHARE = 0.5
+
+# ------------------------------------
+# Compact frames
+# ------------------------------------
+def _compact_ids(col: pd.Series) -> pd.Series:
+    values = pd.to_numeric(col, errors="coerce")
+    present = values.notna().to_numpy()
+    if present.sum() != col.notna().sum():
+        return col  # stray non-numeric IDs: keep the column as read
+    known = values[present].to_numpy(dtype=np.float64)
+    if len(known) and (np.any(known != np.round(known)) or np.abs(known).max() >= 2 ** 31):
+        return col
+    if present.all():
+        return values.astype(np.int32)
+    if len(known) and np.abs(known).max() >= 2 ** 24:
+        return col
+    return pd.Series(values.to_numpy(dtype=np.float64, na_value=np.nan).astype(np.float32), index=col.index)
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Typed, dictionary-encoded copy of a parking table (see the module docstring)."""
+    out = df.drop(columns=[c for c in REDUNDANT_COLUMNS if c in df.columns])
+    for name in out.columns:
+        col = out[name]
+        if name in ID_COLUMNS:
+            out[name] = _compact_ids(col)
+        elif isinstance(col.dtype, pd.CategoricalDtype):
+            out[name] = col.cat.remove_unused_categories()
+        elif col.dtype == object and len(col) and col.nunique() <= CATEGORY_MAX_SHARE * len(col):
+            out[name] = col.astype("category")
+    return out
+
+# ------------------------------------
+# Sizes
+# ------------------------------------
+def deep_bytes(obj: Any, _seen: Optional[Set[int]] = None) -> int:
+    """
+    Approximate bytes held by ``obj``: DataFrames via ``memory_usage(deep=True)``, array
+    buffers once each (views count towards their base), and the attributes of index
+    objects followed recursively.
+    """
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, np.ndarray):
+        base = obj
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        total = 0
+        if base is obj or id(base) not in seen:
+            seen.add(id(base))
+            total = base.nbytes
+        if obj.dtype == object:
+            total += sum(deep_bytes(v, seen) for v in obj.ravel().tolist())
+        return total
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(deep_bytes(k, seen) + deep_bytes(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(deep_bytes(v, seen) for v in obj)
+    attrs = getattr(obj, "__dict__", None)
+    if attrs is not None and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(deep_bytes(v, seen) for v in attrs.values())
+    return sys.getsizeof(obj)
+
+def process_memory() -> Dict[str, int]:
+    """Resident bytes of this process, split into shared and private pages (Linux only)."""
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    out: Dict[str, int] = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    out[fields[key]] = out.get(fields[key], 0) + int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return {}
+    return out
+
+def dataset_report() -> Dict[str, Dict[str, Any]]:
+    """Rows and bytes for each loaded parking dataset and index (loads them if needed)."""
+    from app.parking import parking_utils as pu
+    from app.parking.sensor_feed import sensor_store
+    from app.parking.tile_pyramid import load_tile_geometry, tile_store
+
+    snap = sensor_store.current()
+    items: Dict[str, Any] = {
+        "bays": pu.load_bays(),
+        "sensors": snap.frame,
+        "zone_links": pu.load_zone_links(),
+        "sign_plates": pu.load_sign_plates(),
+        "bay_index": pu.load_bay_index(),
+        "join_graph": pu.load_join_graph(),
+        "sensor_index": snap.index,
+        "restriction_engine": pu.load_restriction_engine(),
+        "tile_geometry": load_tile_geometry(),
+        "tile_counts": tile_store.current(snap),
+    }
+    if Config.STREET_INDEX_ENABLED:
+        items["street_index"] = pu.load_street_index()
+    # One shared ``seen`` set: a buffer referenced from several indexes counts once, towards
+    # the first item listed
+    seen: Set[int] = set()
+    report = {}
+    for name, obj in items.items():
+        rows = len(obj) if isinstance(obj, pd.DataFrame) else None
+        report[name] = {"rows": rows, "bytes": deep_bytes(obj, seen)}
+    return report
+
+# ------------------------------------
+# Pre-fork loading
+# ------------------------------------
+def _release_free_heap():
+    # glibc keeps the freed parse and index-build buffers mapped; return them to the OS so
+    # workers don't inherit (and later dirty) those pages
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def preload_shared_data():
+    """
+    Run the warm-up (every dataset, index and the model) in this process, then freeze the
+    garbage collector. Call it in the gunicorn master before workers fork. Collections in
+    the workers then skip the inherited objects and leave their pages shared.
+    """
+    from app.warmup import startup
+    startup.run()
+    gc.collect()
+    _release_free_heap()
+    gc.freeze()
+    print(f"[Memory] {gc.get_freeze_count()} objects frozen before fork")
+
+def before_fork():
+    """
+    Stop the master's sensor refresher and forecast rebuilder, so no worker is forked in the
+    middle of a swap, and let go of the history log, so that one worker can take over writing it.
+    """
+    from app.parking.sensor_feed import sensor_store
+    from app.parking.history import history_store
+    from app.ml_model.ml_predictor import forecast_store
+    sensor_store.stop(timeout=30)
+    forecast_store.stop(timeout=30)
+    history_store.release_writer()
+
+def after_fork():
+    """Restart the per-process background threads in a freshly forked worker."""
+    from app.parking.sensor_feed import sensor_store
+    from app.ml_model.ml_predictor import forecast_store
+    sensor_store.start()
+    if Config.ML_PRELOAD_MODEL:
+        # The table built by the master is inherited; only the refresher thread is missing
+        forecast_store.start(Config.FORECAST_CHECK_SECONDS, Config.FORECAST_MAX_AGE_SECONDS)
+
+# ------------------------------------
+# CLI: flask memory report
+# ------------------------------------
+memory_cli = AppGroup("memory", help="Memory footprint diagnostics.")
+
+@memory_cli.command("report")
+def memory_report_command():
+    """Bytes per parking dataset and index, and this process's resident memory."""
+    report = dataset_report()
+    click.echo(f"{'dataset':<20} {'rows':>9} {'MB':>9}")
+    for name, r in report.items():
+        rows = "" if r["rows"] is None else r["rows"]
+        click.echo(f"{name:<20} {rows:>9} {r['bytes'] / 1e6:>9.2f}")
+    click.echo(f"{'total':<20} {'':>9} {sum(r['bytes'] for r in report.values()) / 1e6:>9.2f}")
+    for key, value in process_memory().items():
+        click.echo(f"process {key:<12} {'':>9} {value / 1e6:>9.2f}")
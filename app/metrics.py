@@ -0,0 +1,275 @@
+# app/metrics.py
+"""
+In-process metrics in the Prometheus text format, served at /api/metrics.
+
+- request latency histograms per endpoint, method and status
+- named stage spans (``with span("radius_query"):``) recorded both into a histogram and
+  into the current request's breakdown. The breakdown follows work into the stage pool,
+  because StageTimer runs stages in a copy of the request's context
+- upstream call histograms (LocationIQ) and data load times (snapshots, sensor refresh,
+  trend cubes, model)
+- cache and store counters read from the existing stats objects at scrape time
+
+Slow requests can be logged with their stage breakdown (METRICS_SLOW_REQUEST_MS, sampled
+at METRICS_SLOW_SAMPLE_RATE). Observing a value takes a bisect and a short lock, so the
+metrics stay on in production. Counts are per worker process; Prometheus sums them
+across targets.
+"""
+import json
+import time
+import random
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+from app.config.config import Config
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOAD_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _num(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines += [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}  # per-bucket counts (+Inf last), then sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(s)) for k, s in self._series.items()]
+        for key, series in items:
+            running = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                running += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {_num(running)}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {_num(running)}")
+        return lines
+
+
+# ------------------------------------
+# Registry
+# ------------------------------------
+_metrics: List[Any] = []
+# Callables returning (name, type, help, [(labels dict, value), ...]) at scrape time
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]] = []
+
+def counter(name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+    m = Counter(name, help, labels)
+    _metrics.append(m)
+    return m
+
+def histogram(name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    m = Histogram(name, help, labels, buckets)
+    _metrics.append(m)
+    return m
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]):
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _metrics:
+        lines += m.render()
+    for fn in _collectors:
+        try:
+            samples = list(fn())
+        except Exception as e:
+            print(f"[Metrics] collector {getattr(fn, '__name__', fn)} failed: {e}")
+            continue
+        for name, kind, help, values in samples:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in values:
+                if value is None:
+                    continue
+                names = tuple(labels)
+                lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = histogram("findmyspot_http_request_duration_seconds",
+                            "Time to build the response, by endpoint.", ("endpoint", "method", "status"))
+STAGE_SECONDS = histogram("findmyspot_stage_duration_seconds", "Time spent in a named request stage.", ("stage",))
+UPSTREAM_SECONDS = histogram("findmyspot_upstream_request_duration_seconds",
+                             "Calls to external services.", ("service", "endpoint", "outcome"))
+DATA_LOAD_SECONDS = histogram("findmyspot_data_load_duration_seconds",
+                              "Dataset, snapshot, index and model load times.", ("dataset", "source"), LOAD_BUCKETS)
+SLOW_REQUESTS = counter("findmyspot_slow_requests_total", "Requests slower than METRICS_SLOW_REQUEST_MS.", ("endpoint",))
+
+
+# ------------------------------------
+# Spans
+# ------------------------------------
+_request_spans: ContextVar[Optional[Dict[str, float]]] = ContextVar("findmyspot_request_spans", default=None)
+
+def record_span(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans[stage] = spans.get(stage, 0.0) + seconds * 1000
+
+@contextmanager
+def span(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - t0)
+
+
+# ------------------------------------
+# Scrape-time gauges from the existing stores and caches
+# ------------------------------------
+def _store_samples():
+    from app.http_cache import response_cache
+    from app.parking.geocoding import geocoder
+    from app.parking.sensor_feed import sensor_store
+    from app.parking.live_updates import subscriptions
+    from app.parking.tile_pyramid import tile_store
+    from app.ml_model.ml_predictor import forecast_store
+    from app.parking.history import history_store
+    from app.parking.turnover import turnover_store
+    from app.memory import process_memory
+    from app.warmup import startup
+    from app.executor import get_geocode_executor
+
+    http = response_cache.stats()
+    geo = geocoder.stats()
+    yield ("findmyspot_cache_requests_total", "counter", "Cache lookups by cache and result.", [
+        ({"cache": "http_response", "result": "hit"}, http["hits"]),
+        ({"cache": "http_response", "result": "miss"}, http["misses"]),
+        ({"cache": "http_response", "result": "not_modified"}, http["not_modified"]),
+        ({"cache": "geocode", "result": "hit"}, geo["hits"]),
+        ({"cache": "geocode", "result": "prefix_hit"}, geo["prefix_hits"]),
+        ({"cache": "geocode", "result": "miss"}, geo["misses"]),
+    ])
+    yield ("findmyspot_cache_entries", "gauge", "Entries held per cache.", [
+        ({"cache": "http_response"}, http["entries"]),
+        ({"cache": "geocode"}, geo["entries"]),
+    ])
+    yield ("findmyspot_http_cache_bytes", "gauge", "Bytes held by the HTTP response cache.", [({}, http["bytes"])])
+    yield ("findmyspot_geocode_rejected_total", "counter", "Lookups refused because the geocode pool was saturated.",
+           [({}, get_geocode_executor().rejected)])
+
+    sensors = sensor_store.status()
+    if sensors.get("loaded"):
+        yield ("findmyspot_sensor_snapshot_version", "gauge", "Newest Lastupdated in the sensor snapshot (epoch seconds).",
+               [({}, sensors["version"])])
+        yield ("findmyspot_sensor_snapshot_age_seconds", "gauge", "Seconds since the sensor snapshot was swapped in.",
+               [({}, sensors["snapshot_age_s"])])
+        yield ("findmyspot_sensor_rows", "gauge", "Rows in the sensor snapshot.", [({}, sensors["rows"])])
+
+    table = forecast_store.current()
+    yield ("findmyspot_forecast_table_age_seconds", "gauge", "Age of the materialised forecast table.",
+           [({}, time.time() - table.built_at if table else None)])
+    yield ("findmyspot_stream_subscribers", "gauge", "Open /stream subscriptions.", [({}, len(subscriptions))])
+    yield ("findmyspot_tile_count_updates_total", "counter", "Tile counter updates by kind.", [
+        ({"kind": "incremental"}, tile_store.incremental_updates),
+        ({"kind": "rebuild"}, tile_store.rebuilds),
+    ])
+    history = history_store.status()
+    if history.get("loaded"):
+        yield ("findmyspot_history_events", "gauge", "Sensor status events folded into the hourly profiles.",
+               [({}, history["events"])])
+    turnover = turnover_store.status()
+    if turnover.get("loaded"):
+        yield ("findmyspot_turnover_stays", "gauge", "Stays measured by the turnover analytics, by outcome.",
+               [({"kind": "all"}, turnover["stays"]), ({"kind": "overstay"}, turnover["overstays"])])
+    status = startup.status()
+    yield ("findmyspot_ready", "gauge", "1 once warm-up has finished (/api/ready answers 200).", [({}, int(status["ready"]))])
+    yield ("findmyspot_startup_duration_seconds", "gauge", "Import and warm-up time by step.",
+           [({"phase": "import", "step": k}, v / 1000) for k, v in status["imports_ms"].items()] +
+           [({"phase": "warmup", "step": k}, v / 1000) for k, v in status["warmup_ms"].items()])
+    # Shared pages are the datasets inherited from a preloading master; private pages grow
+    # when workers copy them
+    yield ("findmyspot_process_memory_bytes", "gauge", "Resident memory of this worker by page kind.",
+           [({"kind": k}, v) for k, v in process_memory().items()])
+
+
+# ------------------------------------
+# Flask hooks
+# ------------------------------------
+def init_metrics(app: Flask):
+    if not Config.METRICS_ENABLED:
+        return
+    register_collector(_store_samples)
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_t0 = time.perf_counter()
+        g.metrics_token = _request_spans.set({})
+
+    @app.after_request
+    def _observe_request(resp: Response):
+        t0 = g.pop("metrics_t0", None)
+        token = g.pop("metrics_token", None)
+        if t0 is None:
+            return resp
+        elapsed = time.perf_counter() - t0
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=resp.status_code)
+        spans = _request_spans.get() or {}
+        if token is not None:
+            _request_spans.reset(token)
+        if elapsed * 1000 >= Config.METRICS_SLOW_REQUEST_MS:
+            SLOW_REQUESTS.inc(endpoint=endpoint)
+            if random.random() < Config.METRICS_SLOW_SAMPLE_RATE:
+                print("[SlowRequest] " + json.dumps({
+                    "endpoint": endpoint,
+                    "path": request.full_path.rstrip("?"),
+                    "status": resp.status_code,
+                    "ms": round(elapsed * 1000, 1),
+                    "stages_ms": {k: round(v, 1) for k, v in spans.items()},
+                }))
+        return resp
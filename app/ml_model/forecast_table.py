@@ -0,0 +1,168 @@
+# app/ml_model/forecast_table.py
+"""
+Materialised forecast table: predicted availability for every zone × day type × hour.
+
+The model's output only depends on (location code, weekday, hour), so the table is built by
+evaluating each distinct location code over the 168 hours of the week in one batched call,
+collapsing Mon–Fri into "weekday", and broadcasting to zones. Request handlers answer by
+direct indexing; the model is only invoked by the builder.
+"""
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from app.utils import local_now
+
+DAY_TYPES = ("weekday", "saturday", "sunday")
+_DAY_ROW = {"weekday": 0, "saturday": 1, "sunday": 2,
+            "monday": 0, "tuesday": 0, "wednesday": 0, "thursday": 0, "friday": 0}
+_NEXT_DAY_ROW = {0: 0, 1: 2, 2: 0}  # hours past midnight roll into the following day type
+
+
+def day_row(day_type: str) -> Optional[int]:
+    """Row of a day type in the table; None for "weekend" (averaged) or unknown labels."""
+    return _DAY_ROW.get((day_type or "").strip().lower())
+
+
+class ForecastTable:
+    def __init__(self, zone_ids: np.ndarray, code_rows: Dict[int, int],
+                 location_codes: Dict[str, int], values: np.ndarray, model_mtime: Optional[float]):
+        self.location_codes = location_codes  # location name → encoder code
+        self.zone_ids = zone_ids              # sorted int64
+        self.code_rows = code_rows            # location code → row of `values`
+        self.values = values                  # (n_codes, 3, 24) float32
+        self.model_mtime = model_mtime
+        self.built_at = time.time()
+        for arr in (self.zone_ids, self.values):
+            arr.flags.writeable = False
+
+    @classmethod
+    def build(cls, zone_map: Dict[str, str], location_codes: Dict[str, int],
+              predict_slots: Callable[[Sequence[str], Sequence[int], Sequence[int]], Optional[np.ndarray]],
+              model_mtime: Optional[float]) -> Optional["ForecastTable"]:
+        zone_ids = np.array(sorted(int(z) for z in zone_map if str(z).isdigit()), dtype=np.int64)
+        zone_codes = np.array([location_codes.get(zone_map[str(z)], 0) for z in zone_ids], dtype=np.int64)
+        codes = np.unique(np.append(zone_codes, 0))
+        code_loc = {c: next((loc for loc, v in location_codes.items() if v == c), "") for c in codes.tolist()}
+
+        # One call over codes × 7 days × 24 hours
+        n = len(codes)
+        week = predict_slots(
+            [code_loc[c] for c in np.repeat(codes, 168).tolist()],
+            np.tile(np.repeat(np.arange(7), 24), n),
+            np.tile(np.arange(24), 7 * n),
+        )
+        if week is None:
+            return None
+        week = week.reshape(n, 7, 24)
+        values = np.stack([week[:, :5].mean(axis=1), week[:, 5], week[:, 6]], axis=1).astype(np.float32)
+
+        code_rows = {int(c): i for i, c in enumerate(codes.tolist())}
+        return cls(zone_ids, code_rows, dict(location_codes), values, model_mtime)
+
+    def _grid(self, rows: np.ndarray, hours: Sequence[int], day_type: str) -> np.ndarray:
+        hours = np.asarray(hours, dtype=np.int64)
+        d = day_row(day_type)
+        if d is None:
+            key = (day_type or "").strip().lower()
+            if key == "weekend":
+                sat = self.values[rows, 1, hours % 24]
+                sun = self.values[rows, 2, hours % 24]
+                return ((sat + sun) / 2).astype(np.float64)
+            now = local_now().weekday()
+            d = 0 if now < 5 else (1 if now == 5 else 2)
+        # Hours beyond 23 move to the next day type (at most one day ahead)
+        days = np.where(hours >= 24, _NEXT_DAY_ROW[d], d)
+        return self.values[rows, days, hours % 24].astype(np.float64)
+
+    def for_locations(self, locations: Sequence[str], hours: Sequence[int], day_type: str) -> np.ndarray:
+        """Availability for each (locations[i], hours[i]) by direct indexing."""
+        default = self.code_rows.get(0, 0)
+        rows = np.array([self.code_rows.get(self.location_codes.get(loc, 0), default) for loc in locations], dtype=np.int64)
+        return self._grid(rows, hours, day_type)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "zones": int(len(self.zone_ids)),
+            "location_codes": int(len(self.code_rows)),
+            "shape": list(self.values.shape),
+            "built_at": datetime.fromtimestamp(self.built_at, timezone.utc).isoformat(),
+            "age_s": round(time.time() - self.built_at, 3),
+            "model_mtime": self.model_mtime,
+        }
+
+
+class ForecastStore:
+    """
+    Holds the current ForecastTable and rebuilds it off the request path, on a schedule or
+    when the model file changes. Swaps are single reference assignments.
+    """
+
+    def __init__(self, builder: Callable[[], Optional[ForecastTable]], model_path_fn: Callable[[], str]):
+        self._builder = builder
+        self._model_path_fn = model_path_fn
+        self._table: Optional[ForecastTable] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.last_error: Optional[str] = None
+
+    def current(self) -> Optional[ForecastTable]:
+        return self._table
+
+    def rebuild(self) -> bool:
+        with self._lock:
+            table = self._builder()
+            if table is None:
+                return False
+            self._table = table
+            return True
+
+    def _model_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self._model_path_fn())
+        except OSError:
+            return None
+
+    def needs_rebuild(self, max_age_s: float) -> bool:
+        table = self._table
+        if table is None:
+            return True
+        if table.model_mtime != self._model_mtime():
+            return True
+        return max_age_s > 0 and time.time() - table.built_at >= max_age_s
+
+    def _run(self, check_s: float, max_age_s: float):
+        while not self._stop.wait(check_s):
+            try:
+                if self.needs_rebuild(max_age_s):
+                    self.rebuild()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[Forecast] rebuild failed: {e}")
+
+    def start(self, check_s: float, max_age_s: float):
+        if check_s <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        self._stop.clear()
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, args=(check_s, max_age_s), name="forecast-rebuild", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the rebuild thread; with ``timeout``, also wait for a rebuild in progress to finish."""
+        self._stop.set()
+        if timeout is not None and self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        table = self._table
+        return {"built": table is not None, "last_error": self.last_error, **(table.info() if table else {})}
@@ -1,15 +1,31 @@
 import os
 import json
+import time
+import pickle
 import random
+import threading
 from datetime import datetime, timedelta
-from typing import Optional, Tuple, Dict, Any, List
+from functools import lru_cache
+from typing import Optional, Tuple, Dict, Any, List, Sequence
 from pathlib import Path
 
+import numpy as np
+
 from app.config.config import Config  # Paths
+from app.utils import local_now
+from app.metrics import DATA_LOAD_SECONDS, span
+from app.ml_model.forecast_table import ForecastTable, ForecastStore
 
 ZONE_MAP_PATH = Path(Config.ZONE_LOCATIONS_PATH)
+MODEL_PATH = Path(Config.ML_MODEL_PATH)
+
+DAY_INDEX = {
+    "monday": 0, "tuesday": 1, "wednesday": 2,
+    "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6
+}
 
 # Zone name loader
+@lru_cache(maxsize=1)
 def _load_zone_map() -> Dict[str, str]:
     try:
         with open(ZONE_MAP_PATH, "r") as f:
@@ -20,18 +36,205 @@ def _load_zone_map() -> Dict[str, str]:
 
 # Helper: get datetime
 def _next_datetime_for(day_type: str, hour: int) -> datetime:
-    now = datetime.now()
-    day_map = {
-        "monday": 0, "tuesday": 1, "wednesday": 2,
-        "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6
-    }
-    day = day_map.get(day_type.lower(), now.weekday())
+    now = local_now()
+    day = DAY_INDEX.get(day_type.lower(), now.weekday())
     days_ahead = (day - now.weekday()) % 7
     return (now + timedelta(days=days_ahead)).replace(hour=int(hour), minute=0, second=0, microsecond=0)
 
-# 🔹 Fake prediction generator
-def _fake_prediction() -> Dict[str, Any]:
-    availability = round(random.uniform(0.2, 0.95), 3)
+# Helper: which weekdays a day_type covers ("weekday" is averaged over Mon–Fri)
+def _day_indices(day_type: str) -> List[int]:
+    key = (day_type or "").strip().lower()
+    if key == "weekday":
+        return [0, 1, 2, 3, 4]
+    if key == "weekend":
+        return [5, 6]
+    if key in DAY_INDEX:
+        return [DAY_INDEX[key]]
+    return [local_now().weekday()]
+
+# ------------------------------------
+# LSTM model (loaded once per process)
+# ------------------------------------
+class _Attrs:
+    """Plain attribute holder used to unpickle the training-time preprocessor objects."""
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+# Training-time classes in the checkpoint: only their fitted attributes are needed, so they
+# are rebuilt as _Attrs and neither has to be importable here
+_CHECKPOINT_ATTR_CLASSES = {
+    ("__main__", "ParkingDataPreprocessor"),
+    ("sklearn.preprocessing._data", "MinMaxScaler"),
+}
+# Everything else the checkpoint may reference: tensors, state-dict containers, numpy arrays
+_CHECKPOINT_GLOBALS = {
+    ("collections", "OrderedDict"),
+    ("torch._utils", "_rebuild_tensor_v2"),
+    ("torch._utils", "_rebuild_parameter"),
+    ("_codecs", "encode"),
+    ("numpy", "dtype"),
+    ("numpy", "ndarray"),
+    ("numpy._core.multiarray", "_reconstruct"),
+    ("numpy._core.multiarray", "scalar"),
+    ("numpy.core.multiarray", "_reconstruct"),
+    ("numpy.core.multiarray", "scalar"),
+}
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    # Restricted: any global outside the two allow-lists above is refused, so a tampered
+    # checkpoint cannot import and call arbitrary code while loading.
+    def find_class(self, module, name):
+        if (module, name) in _CHECKPOINT_ATTR_CLASSES:
+            return _Attrs
+        if (module, name) in _CHECKPOINT_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"checkpoint references disallowed global {module}.{name}")
+
+class _PickleModule:
+    Unpickler = _CheckpointUnpickler
+    load = staticmethod(pickle.load)
+
+class LoadedModel:
+    def __init__(self, net, scale: np.ndarray, offset: np.ndarray, location_codes: Dict[str, int], torch_mod,
+                 mtime: Optional[float] = None):
+        self.mtime = mtime
+        self.net = net
+        self.scale = scale
+        self.offset = offset
+        self.location_codes = location_codes
+        self.torch = torch_mod
+
+_model: Optional[LoadedModel] = None
+_model_error: Optional[str] = None
+_model_lock = threading.Lock()
+
+def _build_net(torch_mod, config: Dict[str, Any]):
+    nn = torch_mod.nn
+
+    class ParkingLSTM(nn.Module):
+        def __init__(self, input_size: int, hidden_size: int, num_layers: int):
+            super().__init__()
+            self.lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True)
+            self.fc_layers = nn.Sequential(
+                nn.Linear(hidden_size, 16), nn.ReLU(), nn.Dropout(0.2), nn.Linear(16, 1), nn.Sigmoid()
+            )
+
+        def forward(self, x):
+            out, _ = self.lstm(x)
+            return self.fc_layers(out[:, -1, :])
+
+    return ParkingLSTM(config.get("input_size", 6), config.get("hidden_size", 32), config.get("num_layers", 2))
+
+def load_model(reload: bool = False) -> Optional[LoadedModel]:
+    """Load the LSTM checkpoint once; returns None (and records why) if it cannot be loaded."""
+    global _model, _model_error
+    if not reload and (_model is not None or _model_error is not None):
+        return _model
+    with _model_lock:
+        if not reload and (_model is not None or _model_error is not None):
+            return _model
+        t0 = time.perf_counter()
+        try:
+            mtime = os.path.getmtime(MODEL_PATH)
+            import torch  # heavy; only imported when the model is first needed
+            torch.set_num_threads(Config.ML_TORCH_THREADS)
+            ckpt = torch.load(MODEL_PATH, map_location="cpu", weights_only=False, pickle_module=_PickleModule)
+            net = _build_net(torch, ckpt.get("model_config", {}))
+            net.load_state_dict(ckpt["model_state_dict"])
+            net.eval()
+            prep = ckpt.get("preprocessor")
+            scaler = getattr(prep, "scaler", None)
+            _model = LoadedModel(
+                net,
+                np.asarray(getattr(scaler, "scale_", np.ones(6)), dtype=np.float64),
+                np.asarray(getattr(scaler, "min_", np.zeros(6)), dtype=np.float64),
+                dict(getattr(prep, "location_encoder", {}) or {}),
+                torch,
+                mtime,
+            )
+            _model_error = None
+            DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="model", source="checkpoint")
+        except Exception as e:
+            _model_error = str(e)
+            print(f"[Error] Failed to load model: {e}")
+        return _model
+
+def _features(model: LoadedModel, loc_codes: np.ndarray, weekdays: np.ndarray, hours: np.ndarray) -> np.ndarray:
+    """
+    Scaled LSTM input, shape (N, L, 6): for each slot, the L hours of the week ending at
+    (weekday, hour) encoded as [hour_sin, hour_cos, day_sin, day_cos, location_encoded, is_weekend].
+    """
+    seq_len = Config.ML_SEQUENCE_LENGTH
+    end = weekdays * 24 + hours
+    t = (end[:, None] - np.arange(seq_len - 1, -1, -1)[None, :]) % 168
+    h, d = t % 24, t // 24
+    feats = np.stack([
+        np.sin(2 * np.pi * h / 24), np.cos(2 * np.pi * h / 24),
+        np.sin(2 * np.pi * d / 7), np.cos(2 * np.pi * d / 7),
+        np.broadcast_to(loc_codes[:, None], t.shape).astype(np.float64),
+        (d >= 5).astype(np.float64),
+    ], axis=-1)
+    return (feats * model.scale + model.offset).astype(np.float32)
+
+def predict_slots(locations: Sequence[str], weekdays: Sequence[int], hours: Sequence[int]) -> Optional[np.ndarray]:
+    """
+    Predicted availability (0..1) for many (location, weekday, hour) slots in one batched
+    forward pass. Returns None when the model is unavailable.
+    """
+    model = load_model()
+    if model is None:
+        return None
+    if not len(hours):
+        return np.empty(0, dtype=np.float64)
+    # Locations the encoder never saw fall back to code 0 (the scaler maps it to 0 as well)
+    loc_codes = np.array([model.location_codes.get(loc, 0) for loc in locations], dtype=np.float64)
+    x = _features(model, loc_codes, np.asarray(weekdays, dtype=np.int64) % 7, np.asarray(hours, dtype=np.int64) % 24)
+    with model.torch.inference_mode():
+        out = model.net(model.torch.from_numpy(x))
+    return out.numpy().reshape(-1).astype(np.float64)
+
+def predict_availability(locations: Sequence[str], hours: Sequence[int], day_type: str) -> Optional[np.ndarray]:
+    """
+    Availability for each (location[i], hour[i]) under a day type, averaging over the weekdays
+    the day type covers. Hours >= 24 roll into the following day. One model call in total.
+    """
+    days = np.asarray(_day_indices(day_type), dtype=np.int64)
+    hours = np.asarray(hours, dtype=np.int64)
+    n, k = len(hours), len(days)
+    weekdays = (days[None, :] + hours[:, None] // 24).ravel()
+    preds = predict_slots(np.repeat(np.asarray(locations, dtype=object), k), weekdays, np.repeat(hours % 24, k))
+    if preds is None:
+        return None
+    return preds.reshape(n, k).mean(axis=1)
+
+# ------------------------------------
+# Forecast table (zones × day types × hours), rebuilt off the request path
+# ------------------------------------
+def _build_forecast_table() -> Optional[ForecastTable]:
+    model = load_model()
+    try:
+        if model is not None and model.mtime != os.path.getmtime(MODEL_PATH):
+            model = load_model(reload=True)  # checkpoint replaced on disk
+    except OSError:
+        pass
+    if model is None:
+        return None
+    _load_zone_map.cache_clear()
+    t0 = time.perf_counter()
+    table = ForecastTable.build(_load_zone_map(), model.location_codes, predict_slots, model.mtime)
+    DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="forecast_table", source="model")
+    return table
+
+forecast_store = ForecastStore(_build_forecast_table, lambda: str(MODEL_PATH))
+
+def start_forecasts():
+    """Materialise the forecast table now and keep it fresh in the background."""
+    forecast_store.rebuild()
+    forecast_store.start(Config.FORECAST_CHECK_SECONDS, Config.FORECAST_MAX_AGE_SECONDS)
+
+# 🔹 Prediction formatting
+def _format_prediction(availability: float) -> Dict[str, Any]:
+    availability = round(float(availability), 3)
     available_spots = int(availability * 100)
     status = (
         "🟢 Good" if availability >= 0.6 else
@@ -46,11 +249,37 @@ def _fake_prediction() -> Dict[str, Any]:
         "confidence_score": confidence
     }
 
+# 🔹 Fake prediction generator (only used when the model cannot be loaded)
+def _fake_prediction() -> Dict[str, Any]:
+    return _format_prediction(random.uniform(0.2, 0.95))
+
+def _predictions_for(locations: Sequence[str], hours: Sequence[int], day_type: str) -> List[Dict[str, Any]]:
+    table = forecast_store.current()
+    if table is not None:
+        with span("forecast_lookup"):
+            preds = table.for_locations(locations, hours, day_type)  # O(1) per slot, no model call
+    else:
+        with span("model_inference"):
+            preds = predict_availability(locations, hours, day_type)
+    if preds is None:
+        return [_fake_prediction() for _ in hours]
+    return [_format_prediction(p) for p in preds]
+
+def _hour_error(hour: Any) -> Optional[str]:
+    # Hours past 23 would silently roll into the next day in the table and the model features
+    try:
+        ok = 0 <= int(hour) <= 23
+    except (TypeError, ValueError):
+        ok = False
+    return None if ok else "Prediction failed: hour must be in 0..23"
+
 # Predict by location
 def predict_by_location(location_name: str, hour: int, day_type: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    err = _hour_error(hour)
+    if err:
+        return None, err
     try:
-        end_time = _next_datetime_for(day_type, int(hour))
-        base = _fake_prediction()
+        base = _predictions_for([location_name], [int(hour)], day_type)[0]
         return {
             "location": location_name,
             "hour": hour,
@@ -72,6 +301,30 @@ def predict_by_zone(zone_number: int, hour: int, day_type: str) -> Tuple[Optiona
         return None, f"Zone {zone_id} has no mapping in {ZONE_MAP_PATH.name}"
     return predict_by_location(loc, hour, day_type)
 
+# Predict many zones at one hour (single batched model call)
+def predict_zones(zone_ids: Sequence[int], hour: int, day_type: str) -> Dict[int, Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    zone_map = _load_zone_map()
+    results: Dict[int, Tuple[Optional[Dict[str, Any]], Optional[str]]] = {}
+    err = _hour_error(hour)
+    if err:
+        return {int(z): (None, err) for z in zone_ids}
+    mapped = []
+    for z in zone_ids:
+        loc = zone_map.get(str(int(z)))
+        if loc:
+            mapped.append((int(z), loc))
+        else:
+            results[int(z)] = (None, f"Zone {int(z)} has no mapping in {ZONE_MAP_PATH.name}")
+    if mapped:
+        try:
+            preds = _predictions_for([loc for _, loc in mapped], [int(hour)] * len(mapped), day_type)
+            for (z, loc), base in zip(mapped, preds):
+                results[z] = ({"location": loc, "hour": hour, "day_type": day_type.capitalize(), **base}, None)
+        except Exception as e:
+            for z, _ in mapped:
+                results[z] = (None, f"Prediction failed: {e}")
+    return results
+
 # Predict for multiple future hours
 def predict_many_by_zone(zone_number: int, hour: int, day_type: str, hours_ahead: int = 3) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
     zone_map = _load_zone_map()
@@ -84,11 +337,19 @@ def predict_many_by_zone(zone_number: int, hour: int, day_type: str, hours_ahead
     if not loc:
         return None, f"Zone {zone_id} has no mapping in {ZONE_MAP_PATH.name}"
 
+    err = _hour_error(hour)
+    if err:
+        return None, err
     start_dt = _next_datetime_for(day_type, int(hour))
+    offsets = list(range(max(int(hours_ahead), 0)))
+    try:
+        preds = _predictions_for([loc] * len(offsets), [int(hour) + i for i in offsets], day_type)
+    except Exception as e:
+        return None, f"Prediction failed: {e}"
+
     output = []
-    for i in range(hours_ahead):
+    for i, pred in zip(offsets, preds):
         end_time = start_dt + timedelta(hours=i)
-        pred = _fake_prediction()
         output.append({
             "Zone_Number": int(zone_number),
             "hour": end_time.hour,
@@ -101,11 +362,15 @@ def predict_many_by_zone(zone_number: int, hour: int, day_type: str, hours_ahead
 # Health check
 def health_check() -> Dict[str, Any]:
     zone_exists = os.path.exists(ZONE_MAP_PATH)
+    model = load_model()
     return {
         "zone_map_file": str(ZONE_MAP_PATH),
         "zone_map_exists": zone_exists,
-        "model_loaded": False,
-        "preprocessor_loaded": False,
-        "has_scaler": False,
-        "has_location_encoder": False
+        "model_file": str(MODEL_PATH),
+        "model_loaded": model is not None,
+        "model_error": _model_error,
+        "preprocessor_loaded": model is not None,
+        "has_scaler": model is not None,
+        "has_location_encoder": bool(model and model.location_codes),
+        "forecast_table": forecast_store.status()
     }
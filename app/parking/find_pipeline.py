@@ -0,0 +1,195 @@
+# app/parking/find_pipeline.py
+"""
+/find as overlapping stages with deadlines.
+
+    geocode ──────────┐
+    warm indexes ─────┴─► search (bays, legality, signs) ─► predictions
+
+While a LocationIQ round trip is in flight (on the dedicated geocode pool), the stage pool
+loads or refreshes the in-memory indexes the search needs. The search itself is in-memory
+and runs on the request thread, so it never queues behind other requests' lookups.
+
+- geocode: 504 on timeout, because there is nothing to search around; 503 when the
+  geocode pool is saturated
+- warm indexes: 503 on timeout
+- predictions: the bays are still returned, with ``prediction_error`` set and the stage
+  listed in ``partial``
+
+A worker thread therefore never stalls behind one slow upstream or a cold model load.
+
+/find_batch uses the same stages for many points. All addresses are geocoded concurrently
+under one shared deadline, the bays for every point come from one vectorised search, and
+predictions run once for the union of zones.
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config.config import Config
+from app.executor import StageBusy, StageTimeout, StageTimer, get_executor, get_geocode_executor
+from app.parking.sensor_feed import sensor_store
+from app.parking.parking_utils import (
+    liq_geocode, find_nearby_bays, find_nearby_bays_many, attach_predictions,
+    load_bay_index, load_join_graph, load_restriction_engine, load_sign_plates, load_zone_map
+)
+
+
+def _warm_indexes():
+    # Everything find_nearby_bays touches; no-ops once the caches are built
+    load_bay_index()
+    load_join_graph()
+    load_sign_plates()
+    load_restriction_engine()
+    load_zone_map()
+
+
+def _await_warm(warm, timer: StageTimer):
+    # Not started yet (the stage pool is busy): warm on this thread instead of queueing
+    if warm.cancel():
+        with timer.span("warm"):
+            _warm_indexes()
+    else:
+        timer.wait("warm", warm, Config.FIND_SEARCH_TIMEOUT_SECONDS)
+
+
+def find_with_deadlines(address: Optional[str], lat: Optional[float], lon: Optional[float], radius: int,
+                        at: Optional[datetime] = None, stay_min: Optional[int] = None,
+                        include_predictions: bool = True) -> Tuple[Dict[str, Any], int, StageTimer]:
+    """Returns (JSON body, HTTP status, stage timings)."""
+    timer = StageTimer()
+    warm = get_executor().submit(_warm_indexes)
+
+    if address and (lat is None or lon is None):
+        try:
+            match = timer.run("geocode", liq_geocode, address, timeout=Config.FIND_GEOCODE_TIMEOUT_SECONDS,
+                              pool=get_geocode_executor())
+        except StageTimeout as e:
+            return {"error": "Address lookup timed out", "details": str(e)}, 504, timer
+        except StageBusy as e:
+            return {"error": "Address lookup busy, retry later", "details": str(e)}, 503, timer
+        if not match:
+            return {"error": "Address not found"}, 404, timer
+        lat, lon = match["lat"], match["lon"]
+
+    if lat is None or lon is None:
+        return {"error": "Provide either address or lat & lon"}, 400, timer
+
+    try:
+        _await_warm(warm, timer)
+    except StageTimeout as e:
+        return {"error": "Search timed out", "details": str(e)}, 503, timer
+    with timer.span("search"):
+        result = find_nearby_bays(lat, lon, radius_m=radius, at=at, stay_min=stay_min)
+
+    partial: List[str] = []
+    if include_predictions and "zones" in result:
+        zone_ids = result["zones"]
+        try:
+            # Fresh dicts per attempt: a timed-out stage may still be writing to its own
+            result["zones"] = timer.run("predictions", attach_predictions, [{"zone": z} for z in zone_ids],
+                                        timeout=Config.FIND_PREDICT_TIMEOUT_SECONDS)
+        except StageTimeout:
+            result["zones"] = [{"zone": z, "prediction": None, "prediction_error": "Prediction timed out"}
+                               for z in zone_ids]
+            partial.append("predictions")
+
+    payload = {
+        "center": {"lat": lat, "lon": lon},
+        "radius_m": radius,
+        # Snapshot time, not wall clock: the body may be served from the HTTP cache
+        "data_as_of": sensor_store.current().as_of,
+        "result": result,
+    }
+    if partial:
+        payload["partial"] = partial
+    return payload, 200, timer
+
+
+def _geocode_points(points: Sequence[Dict[str, Any]], timer: StageTimer) -> List[Tuple[Optional[float], Optional[float], Optional[Dict[str, Any]]]]:
+    """(lat, lon, error) per point. Addresses resolve concurrently within one overall deadline."""
+    pool = get_geocode_executor()
+    futures = {}
+    busy = set()
+    for i, p in enumerate(points):
+        if p.get("address") and (p.get("lat") is None or p.get("lon") is None):
+            try:
+                futures[i] = pool.submit(liq_geocode, str(p["address"]))
+            except StageBusy:
+                busy.add(i)
+
+    out: List[Tuple[Optional[float], Optional[float], Optional[Dict[str, Any]]]] = []
+    deadline = time.monotonic() + Config.FIND_GEOCODE_TIMEOUT_SECONDS
+    for i, p in enumerate(points):
+        if i in busy:
+            out.append((None, None, {"error": "Address lookup busy, retry later", "status": 503}))
+            continue
+        if i not in futures:
+            out.append((p.get("lat"), p.get("lon"), None))
+            continue
+        try:
+            remaining = max(deadline - time.monotonic(), 0.001) if Config.FIND_GEOCODE_TIMEOUT_SECONDS > 0 else None
+            match = timer.wait("geocode", futures[i], remaining)
+        except StageTimeout:
+            out.append((None, None, {"error": "Address lookup timed out", "status": 504}))
+            continue
+        except Exception as e:
+            print(f"[FindBatch] geocode failed for point {i}: {e}")
+            out.append((None, None, {"error": "Address lookup failed", "status": 502}))
+            continue
+        if not match:
+            out.append((None, None, {"error": "Address not found", "status": 404}))
+        else:
+            out.append((match["lat"], match["lon"], None))
+    return out
+
+
+def find_batch_with_deadlines(points: Sequence[Dict[str, Any]], at: Optional[datetime] = None,
+                              stay_min: Optional[int] = None, include_predictions: bool = True
+                              ) -> Tuple[List[Dict[str, Any]], List[str], StageTimer]:
+    """
+    Points are dicts with lat/lon or address, plus an optional radius (validated by the
+    caller) and id. Returns (one entry per point, in input order; partial stages; timings).
+    """
+    timer = StageTimer()
+    warm = get_executor().submit(_warm_indexes)
+    located = _geocode_points(points, timer)
+
+    ok = [i for i, (lat, lon, err) in enumerate(located) if err is None and lat is not None and lon is not None]
+    _await_warm(warm, timer)
+    with timer.span("search"):
+        found = find_nearby_bays_many([located[i][0] for i in ok], [located[i][1] for i in ok],
+                                      [points[i].get("radius", 200) for i in ok], at=at, stay_min=stay_min)
+    results = dict(zip(ok, found))
+
+    # One prediction pass over the union of zones, shared by every point
+    partial: List[str] = []
+    predictions: Dict[str, Dict[str, Any]] = {}
+    if include_predictions:
+        zone_ids = list(dict.fromkeys(z for r in found for z in r.get("zones", [])))
+        if zone_ids:
+            try:
+                rows = timer.run("predictions", attach_predictions, [{"zone": z} for z in zone_ids],
+                                 timeout=Config.FIND_PREDICT_TIMEOUT_SECONDS)
+                predictions = dict(zip(zone_ids, rows))
+            except StageTimeout:
+                predictions = {z: {"zone": z, "prediction": None, "prediction_error": "Prediction timed out"}
+                               for z in zone_ids}
+                partial.append("predictions")
+
+    out: List[Dict[str, Any]] = []
+    for i, p in enumerate(points):
+        entry: Dict[str, Any] = {"index": i}
+        if p.get("id") is not None:
+            entry["id"] = p["id"]
+        lat, lon, err = located[i]
+        if err is not None:
+            entry.update(err)
+        elif lat is None or lon is None:
+            entry.update({"error": "Provide either address or lat & lon", "status": 400})
+        else:
+            result = results[i]
+            if predictions and "zones" in result:
+                result["zones"] = [dict(predictions[z]) for z in result["zones"]]
+            entry.update({"center": {"lat": lat, "lon": lon}, "radius_m": p.get("radius", 200), "result": result})
+        out.append(entry)
+    return out, partial, timer
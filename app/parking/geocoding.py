@@ -0,0 +1,282 @@
+# app/parking/geocoding.py
+"""
+Shared LocationIQ client.
+
+One pooled ``requests.Session`` per process. Responses are kept in a bounded LRU cache
+with a TTL, keyed on the normalised query and request params. The cache can optionally
+be persisted to disk across restarts. Identical in-flight queries share one upstream
+call. An autocomplete query can be answered from a cached shorter prefix when that
+prefix's result list was complete. ``base_url`` is configurable so the client can be
+pointed at a local stub server.
+"""
+import os
+import re
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable, Tuple
+
+from app.config.config import Config
+from app.metrics import UPSTREAM_SECONDS
+
+if TYPE_CHECKING:
+    import requests
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalise_query(q: str) -> str:
+    """Case- and whitespace-insensitive cache key for a free-text query."""
+    return _SPACES.sub(" ", (q or "").strip().lower())
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds (wall clock) after insertion."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, item[1]
+
+    def peek(self, key: str) -> Tuple[bool, Any]:
+        """Like get() but without touching LRU order or hit counters."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                return False, None
+            return True, item[1]
+
+    def put(self, key: str, value: Any, expires_at: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl if expires_at is None else expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[Tuple[str, float, Any]]:
+        now = time.time()
+        with self._lock:
+            return [(k, exp, v) for k, (exp, v) in self._data.items() if exp >= now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class LocationIQClient:
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 key_fn: Optional[Callable[[], str]] = None,
+                 timeout: Optional[float] = None,
+                 cache_size: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 cache_path: Optional[str] = None,
+                 min_prefix: int = 3):
+        self.base_url = (base_url or Config.LOCATIONIQ_BASE_URL).rstrip("/")
+        self._key_fn = key_fn or (lambda: os.getenv("LOCATIONIQ_API_KEY", Config.LOCATIONIQ_API_KEY))
+        self.timeout = Config.GEOCODE_TIMEOUT_SECONDS if timeout is None else timeout
+        self.cache = TTLCache(Config.GEOCODE_CACHE_SIZE if cache_size is None else cache_size,
+                              Config.GEOCODE_CACHE_TTL_SECONDS if ttl is None else ttl)
+        self.cache_path = Config.GEOCODE_CACHE_PATH if cache_path is None else cache_path
+        self.min_prefix = min_prefix
+        self.upstream_calls = 0
+        self.prefix_hits = 0
+
+        self._session: Optional["requests.Session"] = None
+        self._session_pid: Optional[int] = None
+        self._session_lock = threading.Lock()
+        self._inflight: Dict[str, _InFlight] = {}
+        self._inflight_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+
+        if self.cache_path:
+            self.load()
+            atexit.register(self.save)
+
+    # ------------------------------------
+    # HTTP
+    # ------------------------------------
+    @property
+    def session(self) -> "requests.Session":
+        # One pooled session per process (a forked worker must not share the parent's sockets).
+        # requests is imported here, off the import path: most lookups hit the local street index
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.GEOCODE_POOL_SIZE)
+                    s.mount("https://", adapter)
+                    s.mount("http://", adapter)
+                    self._session, self._session_pid = s, os.getpid()
+        return self._session
+
+    def _fetch(self, endpoint: str, params: Dict[str, Any]) -> Any:
+        self.upstream_calls += 1
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            r = self.session.get(f"{self.base_url}/{endpoint}", params={"key": self._key_fn(), **params},
+                                 timeout=self.timeout)
+            if r.status_code == 404:
+                outcome = "not_found"
+                return []  # LocationIQ answers "Unable to geocode" with a 404
+            r.raise_for_status()
+            body = r.json()
+            outcome = "ok"
+            return body
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - t0, service="locationiq", endpoint=endpoint, outcome=outcome)
+
+    def _coalesced(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once per key at a time; concurrent callers wait for and share its result."""
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    # ------------------------------------
+    # Cached queries
+    # ------------------------------------
+    @staticmethod
+    def _key(endpoint: str, q: str, params: Dict[str, Any]) -> str:
+        return f"{endpoint}|{q}|{json.dumps(params, sort_keys=True, default=str)}"
+
+    def query(self, endpoint: str, q: str, **params) -> List[Dict[str, Any]]:
+        """Raw LocationIQ rows for ``q`` (cached, coalesced)."""
+        norm = normalise_query(q)
+        if not norm:
+            return []
+        key = self._key(endpoint, norm, params)
+        found, rows = self.cache.get(key)
+        if found:
+            return rows
+
+        def fetch():
+            rows = self._fetch(endpoint, {"q": _SPACES.sub(" ", q.strip()), **params})
+            self.cache.put(key, rows)
+            self._mark_dirty()
+            return rows
+
+        return self._coalesced(key, fetch)
+
+    def _from_prefix(self, norm: str, params: Dict[str, Any], limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Answer from a cached shorter prefix whose result list was complete (< limit rows):
+        extending the query can only narrow it, so filtering those rows is exact enough.
+        """
+        tokens = norm.split(" ")
+        for end in range(len(norm) - 1, self.min_prefix - 1, -1):
+            found, rows = self.cache.peek(self._key("autocomplete", norm[:end].rstrip(), params))
+            if not found:
+                continue
+            if len(rows) >= limit:
+                return None  # the shorter prefix was truncated upstream; need a real call
+            self.prefix_hits += 1
+            return [r for r in rows
+                    if all(t in normalise_query(r.get("display_name", "")) for t in tokens)]
+        return None
+
+    def autocomplete(self, q: str, limit: int = 5, **params) -> List[Dict[str, Any]]:
+        norm = normalise_query(q)
+        if not norm:
+            return []
+        params = {"limit": limit, **params}
+        found, rows = self.cache.get(self._key("autocomplete", norm, params))
+        if found:
+            return rows
+        rows = self._from_prefix(norm, params, limit)
+        if rows is not None:
+            self.cache.put(self._key("autocomplete", norm, params), rows)
+            return rows
+        return self.query("autocomplete", q, **params)
+
+    def search(self, q: str, **params) -> List[Dict[str, Any]]:
+        return self.query("search", q, **params)
+
+    # ------------------------------------
+    # Disk persistence
+    # ------------------------------------
+    def _mark_dirty(self):
+        self._dirty = True
+        if self.cache_path and time.time() - self._last_save >= Config.GEOCODE_CACHE_SAVE_SECONDS:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, expires_at, value in entries:
+            if expires_at >= now:
+                self.cache.put(key, value, expires_at=expires_at)
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self.cache.items(), f)
+            os.replace(tmp, self.cache_path)
+            self._dirty = False
+            self._last_save = time.time()
+        except OSError as e:
+            print(f"[Geocoding] Could not persist cache to {self.cache_path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "prefix_hits": self.prefix_hits,
+            "upstream_calls": self.upstream_calls,
+        }
+
+
+# Process-wide client shared by the parking routes
+geocoder = LocationIQClient()
@@ -0,0 +1,521 @@
+# app/parking/history.py
+"""
+Sensor status history and the hourly occupancy profiles behind /api/parking/historical.
+
+Every sensor snapshot swap hands its changed rows to ``history_store.on_snapshot``. A
+row is an event when its ``Status_Timestamp`` moved past the last one seen for that bay.
+Events are appended to a columnar log under HISTORY_DIR, partitioned by local day and zone:
+
+    events/<YYYY-MM-DD>/zone-<Zone_Number>/kerbside.i8   int64
+                                           status.i1     int8 (STATUS_* codes)
+                                           ts.f8         float64, epoch seconds
+
+Files are only ever appended to, so a partition is read back with ``np.fromfile``.
+
+Profiles are time-weighted. A bay's status holds from one event to the next. Each such
+interval is split at local hour boundaries, and the pieces are binned with one
+``np.bincount`` into occupied and observed bay-seconds per (zone, day type, hour).
+Intervals are capped at HISTORY_MAX_INTERVAL_SECONDS, so a silent sensor does not
+stretch one reading across days. The totals and each bay's open (latest) status are
+updated with every batch, so a request reads 72 numbers per zone and never scans the log.
+They are checkpointed next to the log. ``flask history rebuild`` recomputes them from
+the log, for example after changing the time zone or the cap.
+
+Only one process writes the log: the first one to take the HISTORY_DIR lock. Other
+gunicorn workers fold the same feed into their own in-memory totals.
+"""
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+from flask.cli import AppGroup
+
+from app.config.config import Config
+from app.metrics import DATA_LOAD_SECONDS
+from app.parking.join_graph import STATUS_PRESENT, STATUS_UNOCCUPIED, lookup_sorted
+from app.parking.sensor_feed import sensor_store
+
+try:  # single-writer lock; without fcntl (Windows dev) every process writes
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+HISTORY_FORMAT = 1
+DAY_TYPES = ("Weekday", "Saturday", "Sunday")
+# Monday=0 … Sunday=6 → index into DAY_TYPES
+_DAY_TYPE_OF_WEEKDAY = np.array([0, 0, 0, 0, 0, 1, 2], dtype=np.int64)
+_COLUMNS = (("kerbside", "i8"), ("status", "i1"), ("ts", "f8"))
+_SLOTS = len(DAY_TYPES) * 24  # per zone: day type × hour
+
+
+def parse_day_type(text: Optional[str]) -> Optional[int]:
+    """Index into DAY_TYPES for 'weekday' / 'saturday' / 'sunday' (any case); None otherwise."""
+    key = (text or "").strip().lower()
+    for i, name in enumerate(DAY_TYPES):
+        if key == name.lower():
+            return i
+    return None
+
+
+# ------------------------------------
+# Local time
+# ------------------------------------
+def local_seconds(ts: np.ndarray) -> np.ndarray:
+    """Epoch seconds → seconds since 1970-01-01 00:00 local time (HISTORY_TIMEZONE)."""
+    ts = np.asarray(ts, dtype=np.float64)
+    if not len(ts):
+        return ts
+    utc = pd.DatetimeIndex(pd.to_datetime(ts, unit="s", utc=True))
+    offset = utc.tz_convert(Config.HISTORY_TIMEZONE).tz_localize(None).asi8 - utc.tz_localize(None).asi8
+    return ts + offset / 1e9
+
+def hour_slots(local_s: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(day type index, hour of day) for local seconds."""
+    hours = np.floor(local_s / 3600).astype(np.int64)
+    # 1970-01-01 was a Thursday (weekday 3)
+    return _DAY_TYPE_OF_WEEKDAY[(hours // 24 + 3) % 7], hours % 24
+
+def day_label(local_s: float) -> str:
+    return pd.Timestamp(float(local_s), unit="s").strftime("%Y-%m-%d")
+
+
+# ------------------------------------
+# Aggregates
+# ------------------------------------
+@dataclass(frozen=True)
+class HistoryState:
+    """Immutable totals plus each bay's open status; replaced as a whole on every batch."""
+    zone_keys: np.ndarray      # sorted int64 Zone_Number
+    occupied_s: np.ndarray     # (zones, 72) bay-seconds with a car present
+    observed_s: np.ndarray     # (zones, 72) bay-seconds with a known status
+    events: np.ndarray         # (zones, 72) status events starting in the slot
+    open_kerbside: np.ndarray  # sorted int64 KerbsideID
+    open_zone: np.ndarray
+    open_status: np.ndarray
+    open_ts: np.ndarray
+    total_events: int = 0
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+
+    @classmethod
+    def empty(cls) -> "HistoryState":
+        return cls(np.empty(0, np.int64), np.zeros((0, _SLOTS)), np.zeros((0, _SLOTS)), np.zeros((0, _SLOTS), np.int64),
+                   np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0, np.float64))
+
+
+def new_events(state: HistoryState, kerbside: np.ndarray, zone: np.ndarray, status: np.ndarray,
+               ts: np.ndarray) -> np.ndarray:
+    """Positions of the rows that are events: a finite timestamp past the bay's open one, first of duplicates."""
+    ok = np.isfinite(ts) & (kerbside >= 0)
+    pos = lookup_sorted(state.open_kerbside, kerbside)
+    known = pos >= 0
+    ok[known] &= ts[known] > state.open_ts[pos[known]]
+    rows = np.flatnonzero(ok)
+    order = rows[np.lexsort((ts[rows], kerbside[rows]))]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (kerbside[order][1:] != kerbside[order][:-1]) | (ts[order][1:] != ts[order][:-1])
+    return order[keep]
+
+
+def _split_hours(start: np.ndarray, end: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split local-time intervals at hour boundaries: (interval index, hour slot, seconds) per piece."""
+    first = np.floor(start / 3600).astype(np.int64)
+    pieces = np.maximum(np.ceil(end / 3600).astype(np.int64) - first, 1)
+    idx = np.repeat(np.arange(len(start)), pieces)
+    k = np.arange(len(idx)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    slot = first[idx] + k
+    seconds = np.minimum(end[idx], (slot + 1) * 3600.0) - np.maximum(start[idx], slot * 3600.0)
+    return idx, slot, np.maximum(seconds, 0.0)
+
+
+@dataclass(frozen=True)
+class Transitions:
+    """
+    A batch of events sorted by (bay, time), each with the status it ends: the bay's previous
+    event in the batch, else its open status. ``prev_ts`` is NaN for a bay seen for the first time.
+    """
+    kerbside: np.ndarray
+    zone: np.ndarray
+    status: np.ndarray
+    ts: np.ndarray
+    prev_zone: np.ndarray
+    prev_status: np.ndarray
+    prev_ts: np.ndarray
+    total_events: int  # events in the history once this batch is folded in
+
+
+def transitions(state: HistoryState, kerbside: np.ndarray, zone: np.ndarray, status: np.ndarray,
+                ts: np.ndarray) -> Transitions:
+    """Pair events, already filtered by ``new_events`` and sorted by (bay, time), with the status each one ends."""
+    pos = lookup_sorted(state.open_kerbside, kerbside)
+    same_bay = np.zeros(len(ts), dtype=bool)
+    same_bay[1:] = kerbside[1:] == kerbside[:-1]
+    first = ~same_bay
+
+    prev_ts = np.full(len(ts), np.nan)
+    prev_status = np.zeros(len(ts), dtype=np.int8)
+    prev_zone = np.full(len(ts), -1, dtype=np.int64)
+    prev_ts[1:][same_bay[1:]] = ts[:-1][same_bay[1:]]
+    prev_status[1:][same_bay[1:]] = status[:-1][same_bay[1:]]
+    prev_zone[1:][same_bay[1:]] = zone[:-1][same_bay[1:]]
+    opened = first & (pos >= 0)
+    prev_ts[opened] = state.open_ts[pos[opened]]
+    prev_status[opened] = state.open_status[pos[opened]]
+    prev_zone[opened] = state.open_zone[pos[opened]]
+    return Transitions(kerbside, zone, status, ts, prev_zone, prev_status, prev_ts, state.total_events + len(ts))
+
+
+def fold_events(state: HistoryState, batch: Transitions) -> HistoryState:
+    """
+    Add a batch to the totals: close the interval each event ends and leave each bay's
+    last event open.
+    """
+    kerbside, zone, status, ts = batch.kerbside, batch.zone, batch.status, batch.ts
+    prev_zone, prev_status, prev_ts = batch.prev_zone, batch.prev_status, batch.prev_ts
+    if not len(ts):
+        return state
+    closes = np.flatnonzero(np.isfinite(prev_ts) & (prev_zone >= 0)
+                            & np.isin(prev_status, (STATUS_PRESENT, STATUS_UNOCCUPIED)))
+    start = local_seconds(prev_ts[closes])
+    end = local_seconds(np.minimum(ts[closes], prev_ts[closes] + Config.HISTORY_MAX_INTERVAL_SECONDS))
+    idx, slot, seconds = _split_hours(start, end)
+    day_type, hour = hour_slots(slot * 3600.0)
+    piece_zone = prev_zone[closes][idx]
+    piece_present = prev_status[closes][idx] == STATUS_PRESENT
+    event_day_type, event_hour = hour_slots(local_seconds(ts))
+
+    zone_keys = np.union1d(state.zone_keys, np.concatenate([piece_zone, zone[zone >= 0]]))
+    grow = lookup_sorted(zone_keys, state.zone_keys)
+    size = len(zone_keys) * _SLOTS
+
+    def widen(old: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(zone_keys), _SLOTS), dtype=old.dtype)
+        out[grow] = old
+        return out
+
+    def binned(zones: np.ndarray, dts: np.ndarray, hours: np.ndarray, weights=None) -> np.ndarray:
+        flat = lookup_sorted(zone_keys, zones) * _SLOTS + dts * 24 + hours
+        return np.bincount(flat, weights, minlength=size).reshape(len(zone_keys), _SLOTS)
+
+    occupied = widen(state.occupied_s) + binned(piece_zone[piece_present], day_type[piece_present],
+                                                hour[piece_present], seconds[piece_present])
+    observed = widen(state.observed_s) + binned(piece_zone, day_type, hour, seconds)
+    zoned = zone >= 0
+    events = widen(state.events) + binned(zone[zoned], event_day_type[zoned], event_hour[zoned]).astype(np.int64)
+
+    # Each bay's last event becomes its open status
+    last = np.append(kerbside[1:] != kerbside[:-1], True)
+    keys = np.concatenate([state.open_kerbside, kerbside[last]])
+    order = np.argsort(keys, kind="stable")
+    # Stable sort puts a bay's new status after its old one: keep the last of each key
+    keep = np.append(keys[order][1:] != keys[order][:-1], True)
+    pick = order[keep]
+
+    def merged(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+        return np.concatenate([old, new[last]])[pick]
+
+    first_ts = float(np.min(ts)) if state.first_ts is None else min(state.first_ts, float(np.min(ts)))
+    last_ts = float(np.max(ts)) if state.last_ts is None else max(state.last_ts, float(np.max(ts)))
+    return HistoryState(zone_keys, occupied, observed, events, keys[pick], merged(state.open_zone, zone),
+                        merged(state.open_status, status), merged(state.open_ts, ts),
+                        batch.total_events, first_ts, last_ts)
+
+
+# ------------------------------------
+# Columnar log
+# ------------------------------------
+def _partition_dir(root: str, day: str, zone: int) -> str:
+    return os.path.join(root, "events", day, f"zone-{zone}" if zone >= 0 else "zone-none")
+
+def append_events(root: str, kerbside: np.ndarray, zone: np.ndarray, status: np.ndarray, ts: np.ndarray):
+    """Append events to their (local day, zone) partitions."""
+    local = local_seconds(ts)
+    days = np.floor(local / 86400).astype(np.int64)
+    groups = pd.DataFrame({"day": days, "zone": zone}).groupby(["day", "zone"], sort=True).indices
+    columns = {"kerbside": kerbside.astype(np.int64), "status": status.astype(np.int8), "ts": ts.astype(np.float64)}
+    for (day, z), rows in groups.items():
+        part = _partition_dir(root, day_label(day * 86400), int(z))
+        os.makedirs(part, exist_ok=True)
+        for name, ext in _COLUMNS:
+            with open(os.path.join(part, f"{name}.{ext}"), "ab") as f:
+                f.write(columns[name][rows].tobytes())
+
+def read_partition(part: str) -> Dict[str, np.ndarray]:
+    cols = {name: np.fromfile(os.path.join(part, f"{name}.{ext}"), dtype=np.dtype(ext))
+            if os.path.exists(os.path.join(part, f"{name}.{ext}")) else np.empty(0, np.dtype(ext))
+            for name, ext in _COLUMNS}
+    # An interrupted append can leave one column longer than the others
+    n = min(len(c) for c in cols.values())
+    return {name: c[:n] for name, c in cols.items()}
+
+def iter_partitions(root: str) -> Iterator[Tuple[str, int, str]]:
+    """(day, zone, path) for every partition, oldest day first."""
+    base = os.path.join(root, "events")
+    if not os.path.isdir(base):
+        return
+    for day in sorted(os.listdir(base)):
+        for name in sorted(os.listdir(os.path.join(base, day))):
+            if name.startswith("zone-"):
+                key = name[len("zone-"):]
+                yield day, int(key) if key.lstrip("-").isdigit() else -1, os.path.join(base, day, name)
+
+def read_log(root: str) -> Dict[str, np.ndarray]:
+    """Every logged event as columns (kerbside, zone, status, ts)."""
+    parts = []
+    for _, zone, path in iter_partitions(root):
+        cols = read_partition(path)
+        cols["zone"] = np.full(len(cols["ts"]), zone, dtype=np.int64)
+        parts.append(cols)
+    if not parts:
+        return {"kerbside": np.empty(0, np.int64), "zone": np.empty(0, np.int64),
+                "status": np.empty(0, np.int8), "ts": np.empty(0, np.float64)}
+    return {k: np.concatenate([p[k] for p in parts]) for k in ("kerbside", "zone", "status", "ts")}
+
+
+# ------------------------------------
+# Store
+# ------------------------------------
+def _snapshot_events(snap, rows: Optional[np.ndarray] = None):
+    rows = np.arange(len(snap.frame)) if rows is None else rows
+    index = snap.index
+    return index.kerbside[rows], index.zone[rows], index.status[rows], np.asarray(snap.status_ts)[rows]
+
+
+class HistoryStore:
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+        self._state: Optional[HistoryState] = None
+        self._lock = threading.Lock()
+        self._writer_fd: Optional[int] = None
+        self._writer_pid: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self._listeners: List[Callable[[Transitions], None]] = []
+
+    def add_listener(self, fn: Callable[[Transitions], None]):
+        """Call ``fn(batch)`` with every batch of new events, after it has been folded in and logged."""
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    @property
+    def root(self) -> str:
+        return self._root or Config.HISTORY_DIR
+
+    # ------------------------------------
+    # Writer lock and checkpoint
+    # ------------------------------------
+    def is_writer(self) -> bool:
+        """True in the process that appends to the log (takes the lock if it is free)."""
+        if self._writer_fd is not None and self._writer_pid == os.getpid():
+            return True
+        if fcntl is None:
+            return True
+        os.makedirs(self.root, exist_ok=True)
+        fd = os.open(os.path.join(self.root, "writer.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._writer_fd, self._writer_pid = fd, os.getpid()
+        return True
+
+    def release_writer(self):
+        """Drop the writer lock (before fork, so a worker can take it)."""
+        if self._writer_fd is not None and self._writer_pid == os.getpid():
+            os.close(self._writer_fd)
+        self._writer_fd = self._writer_pid = None
+
+    def _meta(self) -> Dict[str, Any]:
+        return {"format": HISTORY_FORMAT, "timezone": Config.HISTORY_TIMEZONE,
+                "max_interval_s": Config.HISTORY_MAX_INTERVAL_SECONDS}
+
+    def _write_meta(self, total_events: int):
+        # Written before an append: a crash between the two leaves a count the checkpoint
+        # doesn't match, so the next start rebuilds from the log
+        tmp = os.path.join(self.root, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({**self._meta(), "total_events": total_events}, f)
+        os.replace(tmp, os.path.join(self.root, "meta.json"))
+
+    def _save_checkpoint(self, state: HistoryState):
+        path = os.path.join(self.root, "checkpoint.npz")
+        tmp = path + ".tmp.npz"
+        meta = json.dumps({**self._meta(), "total_events": state.total_events,
+                           "first_ts": state.first_ts, "last_ts": state.last_ts})
+        np.savez(tmp, zone_keys=state.zone_keys, occupied_s=state.occupied_s, observed_s=state.observed_s,
+                 events=state.events, open_kerbside=state.open_kerbside, open_zone=state.open_zone,
+                 open_status=state.open_status, open_ts=state.open_ts, meta=meta)
+        os.replace(tmp, path)
+
+    def _commit(self, state: HistoryState):
+        os.makedirs(self.root, exist_ok=True)
+        self._write_meta(state.total_events)
+        self._save_checkpoint(state)
+
+    def _load_checkpoint(self) -> Optional[HistoryState]:
+        """The checkpoint, if it covers every logged event and matches the current settings."""
+        try:
+            with open(os.path.join(self.root, "meta.json")) as f:
+                log_meta = json.load(f)
+            with np.load(os.path.join(self.root, "checkpoint.npz")) as z:
+                meta = json.loads(str(z["meta"]))
+                if meta.get("total_events") != log_meta.get("total_events") or \
+                        any(meta.get(k) != v for k, v in self._meta().items()):
+                    return None
+                return HistoryState(*(z[k] for k in ("zone_keys", "occupied_s", "observed_s", "events", "open_kerbside",
+                                                    "open_zone", "open_status", "open_ts")),
+                                    total_events=int(meta["total_events"]), first_ts=meta["first_ts"],
+                                    last_ts=meta["last_ts"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # ------------------------------------
+    # Loading and ingest
+    # ------------------------------------
+    def rebuild(self) -> HistoryState:
+        """Recompute the totals from the whole log."""
+        t0 = time.perf_counter()
+        log = read_log(self.root)
+        state = HistoryState.empty()
+        rows = new_events(state, log["kerbside"], log["zone"], log["status"], log["ts"])
+        state = fold_events(state, transitions(state, *(log[k][rows] for k in ("kerbside", "zone", "status", "ts"))))
+        DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="history", source="rebuild")
+        return state
+
+    def current(self) -> HistoryState:
+        state = self._state
+        if state is not None:
+            return state
+        with self._lock:
+            if self._state is None:
+                t0 = time.perf_counter()
+                state = self._load_checkpoint()
+                if state is None:
+                    state = self.rebuild()
+                    if self.is_writer():
+                        self._commit(state)
+                else:
+                    DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="history", source="checkpoint")
+                self._state = state
+            return self._state
+
+    def ingest(self, kerbside: np.ndarray, zone: np.ndarray, status: np.ndarray, ts: np.ndarray) -> int:
+        """Log and fold the rows that are new events; returns how many were."""
+        self.current()
+        with self._lock:
+            state = self._state
+            rows = new_events(state, kerbside, zone, status, ts)
+            if not len(rows):
+                return 0
+            batch = transitions(state, kerbside[rows], zone[rows], status[rows], ts[rows])
+            nxt = fold_events(state, batch)
+            if self.is_writer():
+                self._write_meta(nxt.total_events)
+                append_events(self.root, batch.kerbside, batch.zone, batch.status, batch.ts)
+                self._save_checkpoint(nxt)
+            self._state = nxt  # atomic reference swap
+            # Still under the lock, so listeners see batches one at a time and in order
+            for fn in list(self._listeners):
+                try:
+                    fn(batch)
+                except Exception as e:
+                    print(f"[History] listener failed: {e}")
+            return len(rows)
+
+
+    def load(self):
+        """Warm-up: totals from the checkpoint (or the log), then the bays' current statuses."""
+        self.ingest(*_snapshot_events(sensor_store.current()))
+
+    def on_snapshot(self, prev, nxt):
+        """SensorStore listener: log the status changes carried by the new snapshot."""
+        try:
+            self.ingest(*_snapshot_events(nxt, nxt.changed))
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+
+    # ------------------------------------
+    # Queries
+    # ------------------------------------
+    def profile(self, zone: int, day_type: int, bays: int) -> Dict[str, Any]:
+        """Hourly occupancy of one zone on one day type; hours without data are null."""
+        state = self.current()
+        pos = lookup_sorted(state.zone_keys, [zone])[0]
+        cols = slice(day_type * 24, (day_type + 1) * 24)
+        if pos >= 0:
+            occupied, observed, events = state.occupied_s[pos, cols], state.observed_s[pos, cols], state.events[pos, cols]
+        else:
+            occupied, observed, events = np.zeros(24), np.zeros(24), np.zeros(24, np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            occupancy = occupied / observed
+        hours = []
+        for h, (occ, obs, n) in enumerate(zip(occupancy.tolist(), observed.tolist(), events.tolist())):
+            seen = obs > 0
+            hours.append({
+                "hour": h,
+                "occupancy": round(occ, 4) if seen else None,
+                "free_share": round(1 - occ, 4) if seen else None,
+                "avg_free_spots": round((1 - occ) * bays, 1) if seen else None,
+                "observed_bay_hours": round(obs / 3600, 2),
+                "events": int(n),
+            })
+        return {
+            "zone_number": zone,
+            "day_type": DAY_TYPES[day_type],
+            "bays": bays,
+            "timezone": Config.HISTORY_TIMEZONE,
+            "history_from": None if state.first_ts is None else pd.Timestamp(state.first_ts, unit="s", tz="UTC").isoformat(),
+            "history_to": None if state.last_ts is None else pd.Timestamp(state.last_ts, unit="s", tz="UTC").isoformat(),
+            "hours": hours,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        state = self._state
+        if state is None:
+            return {"loaded": False, "last_error": self.last_error}
+        return {
+            "loaded": True,
+            "events": state.total_events,
+            "zones": int(len(state.zone_keys)),
+            "bays": int(len(state.open_kerbside)),
+            "writer": self._writer_fd is not None and self._writer_pid == os.getpid(),
+            "last_error": self.last_error,
+        }
+
+
+# Process-wide store, fed by the sensor refresher
+history_store = HistoryStore()
+
+
+# ------------------------------------
+# CLI: flask history ...
+# ------------------------------------
+history_cli = AppGroup("history", help="Sensor status history.")
+
+@history_cli.command("rebuild")
+def history_rebuild_command():
+    """Recompute the hourly totals from the event log and rewrite the checkpoint."""
+    store = history_store
+    if not store.is_writer():
+        raise click.ClickException(f"another process holds {os.path.join(store.root, 'writer.lock')}")
+    state = store.rebuild()
+    store._commit(state)
+    click.echo(f"{state.total_events} events, {len(state.zone_keys)} zones, {len(state.open_kerbside)} bays")
+
+@history_cli.command("stats")
+def history_stats_command():
+    """Partitions and events per day in the log."""
+    per_day: Dict[str, Tuple[int, int]] = {}
+    for day, _, path in iter_partitions(history_store.root):
+        parts, events = per_day.get(day, (0, 0))
+        per_day[day] = (parts + 1, events + len(read_partition(path)["ts"]))
+    for day, (parts, events) in per_day.items():
+        click.echo(f"{day}  {parts:>6} zones  {events:>9} events")
@@ -0,0 +1,187 @@
+# app/parking/join_graph.py
+import json
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Sensor status codes (pre-normalised Status_Description)
+STATUS_UNKNOWN = 0
+STATUS_UNOCCUPIED = 1
+STATUS_PRESENT = 2
+
+# Largest key to_int_keys can produce; -1 marks a missing/unparseable id
+MAX_KEY = int(np.iinfo(np.int64).max)
+
+# Raw status values that mean "free" across sensor feed variants
+AVAILABLE_VALUES = {"free", "available", "vacant", "unoccupied", "0", "false"}
+
+
+def to_int_keys(values) -> np.ndarray:
+    """
+    Coerce an ID column (ints, floats like '7539.0', stray strings) to int64; unparseable → -1.
+    """
+    keys = pd.to_numeric(pd.Series(values), errors="coerce")
+    return keys.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def lookup_sorted(sorted_keys: np.ndarray, query) -> np.ndarray:
+    """
+    Position of each query key in a sorted unique key array; -1 where the key is absent.
+    """
+    query = np.asarray(query, dtype=np.int64)
+    if not len(sorted_keys):
+        return np.full(len(query), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_keys, query), len(sorted_keys) - 1)
+    return np.where(sorted_keys[pos] == query, pos, -1)
+
+
+def gather_ranges(offsets: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the CSR ranges offsets[i]:offsets[i+1] for every i in idx, without a Python loop.
+    """
+    idx = np.asarray(idx, dtype=np.int64)
+    starts = offsets[idx]
+    lens = offsets[idx + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # Each output slot = its range start + position within the range
+    shift = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+    return shift + np.arange(total, dtype=np.int64)
+
+
+class KeyIndex:
+    """
+    Sorted int64 key → row position lookup (vectorised binary search).
+    """
+
+    def __init__(self, keys: np.ndarray):
+        keys = np.asarray(keys, dtype=np.int64)
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        self.order.flags.writeable = False
+        self.keys.flags.writeable = False
+
+    def find(self, query) -> np.ndarray:
+        """Row positions for each query key; -1 where the key is absent."""
+        pos = lookup_sorted(self.keys, query)
+        return np.where(pos >= 0, self.order[pos], -1)
+
+
+class SensorIndex:
+    """
+    Integer-keyed view over the sensor table: KerbsideID → sensor row, Zone_Number → row
+    slice (CSR), int status codes and pre-serialised JSON rows, so per-request code never
+    touches string columns.
+    """
+
+    def __init__(self, sensors_df: pd.DataFrame):
+        self.kerbside = to_int_keys(sensors_df["KerbsideID"])
+        self.by_kerbside = KeyIndex(self.kerbside)
+        self.zone = to_int_keys(sensors_df["Zone_Number"])
+        # Zones filled in by app/parking/zone_imputation.py rather than reported by the feed
+        if "Zone_Imputed" in sensors_df.columns:
+            self.zone_imputed = sensors_df["Zone_Imputed"].fillna(False).to_numpy(dtype=bool)
+        else:
+            self.zone_imputed = np.zeros(len(self.zone), dtype=bool)
+        self.lat = sensors_df["Latitude"].to_numpy(dtype=np.float64)
+        self.lon = sensors_df["Longitude"].to_numpy(dtype=np.float64)
+
+        raw_status = sensors_df["Status_Description"]
+        status = raw_status.astype(str).str.strip().str.lower().to_numpy()
+        self.status = np.full(len(status), STATUS_UNKNOWN, dtype=np.int8)
+        self.status[np.isin(status, list(AVAILABLE_VALUES))] = STATUS_UNOCCUPIED
+        self.status[status == "present"] = STATUS_PRESENT
+
+        # Zone_Number → contiguous slice of zone_rows; unzoned rows (-1) are left out
+        zoned = np.flatnonzero(self.zone >= 0)
+        self.zone_rows = zoned[np.argsort(self.zone[zoned], kind="stable")]
+        self.zone_keys, starts = np.unique(self.zone[self.zone_rows], return_index=True)
+        self.zone_offsets = np.append(starts, len(self.zone_rows)).astype(np.int64)
+
+        # One JSON object per row, in the /realtime item shape (sorted keys, like jsonify);
+        # rows in an imputed zone say so
+        labels = {v: json.dumps(v) for v in raw_status.dropna().unique()}
+        status_json = [labels.get(v, "null") for v in raw_status.where(raw_status.notna(), None)]
+        imputed_json = ',"zone_imputed":true'
+        self.row_json = np.array([
+            f'{{"lat":{_num(a)},"lon":{_num(b)},"status":{st}{imputed_json if imp else ""}}}'
+            for a, b, st, imp in zip(self.lat.tolist(), self.lon.tolist(), status_json, self.zone_imputed.tolist())
+        ], dtype=object)
+
+        for arr in (self.kerbside, self.zone, self.zone_imputed, self.lat, self.lon, self.status,
+                    self.zone_rows, self.zone_keys, self.zone_offsets, self.row_json):
+            arr.flags.writeable = False
+
+    def rows_for_zone(self, zone: int) -> np.ndarray:
+        """Sensor rows for one Zone_Number (empty if unknown or not a valid zone key)."""
+        if not 0 <= zone <= MAX_KEY:
+            return np.empty(0, dtype=np.int64)
+        pos = lookup_sorted(self.zone_keys, [zone])[0]
+        if pos < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.zone_rows[self.zone_offsets[pos]:self.zone_offsets[pos + 1]]
+
+
+def _num(x: float) -> str:
+    return repr(x) if x == x else "null"
+
+
+class JoinGraph:
+    """
+    Immutable bay → road segment → parking zone → sign-plate lookup, built once per data snapshot.
+
+    Segments and zones are dictionary-encoded to dense codes; segment → zones and
+    zone → sign plates are CSR offset arrays, so resolving a set of bays is a few array
+    gathers with no merges and no dtype conversion on the shared DataFrames.
+    """
+
+    def __init__(self, bays_df: pd.DataFrame, zone_links_df: pd.DataFrame, sign_df: pd.DataFrame):
+        # Bays: row → kerbside id / segment id
+        self.bay_kerbside = to_int_keys(bays_df["KerbsideID"])
+        bay_segment = to_int_keys(bays_df["RoadSegmentID"])
+
+        # Dictionary-encode zones across links and plates
+        link_zone = to_int_keys(zone_links_df["ParkingZone"])
+        link_segment = to_int_keys(zone_links_df["Segment_ID"])
+        ok = (link_zone >= 0) & (link_segment >= 0)
+        link_zone, link_segment = link_zone[ok], link_segment[ok]
+        plate_zone = to_int_keys(sign_df["ParkingZone"])
+        self.zone_ids = np.unique(np.concatenate([link_zone, plate_zone]))
+        self.zone_ids = self.zone_ids[self.zone_ids >= 0]
+
+        # Segment → zone codes (CSR)
+        self.segment_ids, seg_code = np.unique(link_segment, return_inverse=True)
+        order = np.lexsort((link_zone, seg_code))
+        self.segment_zone = np.searchsorted(self.zone_ids, link_zone[order]).astype(np.int32)
+        self.segment_offsets = np.searchsorted(seg_code[order], np.arange(len(self.segment_ids) + 1))
+
+        # Bay row → segment code (-1 when the segment has no zone link)
+        self.bay_segment_code = lookup_sorted(self.segment_ids, bay_segment)
+
+        # Zone code → sign plate rows (CSR over plates sorted by zone)
+        valid = plate_zone >= 0
+        plate_code = np.full(len(plate_zone), len(self.zone_ids), dtype=np.int64)
+        plate_code[valid] = np.searchsorted(self.zone_ids, plate_zone[valid])
+        self.plate_rows = np.argsort(plate_code, kind="stable")
+        self.zone_plate_offsets = np.searchsorted(plate_code[self.plate_rows], np.arange(len(self.zone_ids) + 1))
+
+        for arr in (self.bay_kerbside, self.zone_ids, self.segment_ids, self.segment_zone,
+                    self.segment_offsets, self.bay_segment_code, self.plate_rows, self.zone_plate_offsets):
+            arr.flags.writeable = False
+
+    def zone_codes_for_bays(self, bay_rows: np.ndarray) -> np.ndarray:
+        """Unique zone codes linked to the road segments of the given bay rows."""
+        seg = self.bay_segment_code[np.asarray(bay_rows, dtype=np.int64)]
+        seg = np.unique(seg[seg >= 0])
+        return np.unique(self.segment_zone[gather_ranges(self.segment_offsets, seg)])
+
+    def plate_rows_for_zones(self, zone_codes: np.ndarray) -> np.ndarray:
+        """Sign plate row positions (into the sign plate table) for the given zone codes."""
+        return self.plate_rows[gather_ranges(self.zone_plate_offsets, zone_codes)]
+
+    def resolve(self, bay_rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Zone ids and sign plate rows for a set of bay rows."""
+        codes = self.zone_codes_for_bays(bay_rows)
+        return self.zone_ids[codes], self.plate_rows_for_zones(codes)
@@ -0,0 +1,233 @@
+# app/parking/live_updates.py
+"""
+Live occupancy push for map viewports (Server-Sent Events).
+
+A client subscribes to a bounding box and/or a set of zones. Each time the sensor store
+swaps in a new snapshot, only the rows that changed are matched against subscriptions:
+
+- zone subscriptions: zone number → subscribers
+- bounding boxes: a coarse lat/lon cell grid → subscribers whose box overlaps the cell
+
+Publishing therefore costs O(changed rows × subscribers per cell), not
+O(subscribers × bays). Every subscriber has a small bounded queue. A subscriber that
+falls behind is told to resync and is sent a fresh full view; it never blocks the
+refresher.
+"""
+import json
+import math
+import queue
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config.config import Config
+from app.parking.join_graph import STATUS_PRESENT, STATUS_UNOCCUPIED
+
+# Subscription grid cell size in degrees (~550 m north-south in Melbourne)
+CELL_DEG = 0.005
+# Boxes spanning more cells than this are matched by a direct scan instead
+MAX_CELLS_PER_BOX = 4096
+
+_STATUS_LABEL = {STATUS_UNOCCUPIED: "Unoccupied", STATUS_PRESENT: "Present"}
+
+
+def _cell(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    return np.floor(np.asarray(lat) / CELL_DEG).astype(np.int64), np.floor(np.asarray(lon) / CELL_DEG).astype(np.int64)
+
+
+@dataclass(eq=False)
+class Subscription:
+    bbox: Optional[Tuple[float, float, float, float]]   # (min_lon, min_lat, max_lon, max_lat)
+    zones: Set[int]
+    events: "queue.Queue[Dict[str, Any]]" = field(default_factory=lambda: queue.Queue(maxsize=Config.STREAM_QUEUE_SIZE))
+    id: int = 0
+    resync: bool = False
+
+    def rows_of_interest(self, lat: np.ndarray, lon: np.ndarray, zone: np.ndarray) -> np.ndarray:
+        """Boolean mask over sensor rows inside the box or one of the zones."""
+        hit = np.zeros(len(lat), dtype=bool)
+        if self.bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = self.bbox
+            hit |= (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        if self.zones:
+            hit |= np.isin(zone, list(self.zones))
+        return hit
+
+    def offer(self, event: Dict[str, Any]):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.resync = True  # the stream sends a full view instead of the missed deltas
+
+
+class SubscriptionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subs: Dict[int, Subscription] = {}
+        self._by_zone: Dict[int, Set[int]] = {}
+        self._by_cell: Dict[Tuple[int, int], Set[int]] = {}
+        self._wide: Set[int] = set()  # boxes too large for the cell grid
+        self.published = 0
+
+    @staticmethod
+    def _box_cells(bbox) -> Optional[List[Tuple[int, int]]]:
+        # Clamped to the globe and counted in Python ints, so no box can overflow the cell count
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox)
+        if not all(math.isfinite(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+            return None
+        (y0, y1), (x0, x1) = _cell([min(max(min_lat, -90.0), 90.0), min(max(max_lat, -90.0), 90.0)],
+                                   [min(max(min_lon, -180.0), 180.0), min(max(max_lon, -180.0), 180.0)])
+        y0, y1, x0, x1 = int(y0), int(y1), int(x0), int(x1)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > MAX_CELLS_PER_BOX:
+            return None
+        return [(y, x) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def subscribe(self, bbox=None, zones=(), limit: Optional[int] = None) -> Optional[Subscription]:
+        """Register a subscription; None when ``limit`` subscriptions are already open."""
+        sub = Subscription(bbox=bbox, zones={int(z) for z in zones})
+        cells = self._box_cells(bbox) if bbox is not None else None  # outside the lock publish() takes
+        with self._lock:
+            if limit is not None and len(self._subs) >= limit:
+                return None
+            sub.id = next(self._ids)
+            self._subs[sub.id] = sub
+            for z in sub.zones:
+                self._by_zone.setdefault(z, set()).add(sub.id)
+            if bbox is not None:
+                if cells is None:
+                    self._wide.add(sub.id)
+                else:
+                    for c in cells:
+                        self._by_cell.setdefault(c, set()).add(sub.id)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        cells = self._box_cells(sub.bbox) if sub.bbox is not None else None
+        with self._lock:
+            if self._subs.pop(sub.id, None) is None:
+                return
+            for z in sub.zones:
+                ids = self._by_zone.get(z)
+                if ids is not None:
+                    ids.discard(sub.id)
+                    if not ids:
+                        del self._by_zone[z]
+            self._wide.discard(sub.id)
+            if sub.bbox is not None:
+                for c in cells or []:
+                    ids = self._by_cell.get(c)
+                    if ids is not None:
+                        ids.discard(sub.id)
+                        if not ids:
+                            del self._by_cell[c]
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    def publish(self, prev, nxt):
+        """SensorStore listener: push changed rows to matching subscribers."""
+        if not self._subs or prev is None:
+            return
+        rows = status_changes(prev, nxt)
+        if not len(rows):
+            return
+        idx = nxt.index
+        lat, lon, zone = idx.lat[rows], idx.lon[rows], idx.zone[rows]
+        cy, cx = _cell(lat, lon)
+
+        # Candidate subscribers per changed row, via the zone and cell maps
+        with self._lock:
+            wanted: Dict[int, List[int]] = {}
+            for i, (z, y, x) in enumerate(zip(zone.tolist(), cy.tolist(), cx.tolist())):
+                for sid in self._by_zone.get(z, ()):
+                    wanted.setdefault(sid, []).append(i)
+                for sid in self._by_cell.get((y, x), ()):
+                    wanted.setdefault(sid, []).append(i)
+            for sid in self._wide:
+                wanted.setdefault(sid, []).extend(range(len(rows)))
+            targets = [(self._subs[sid], cand) for sid, cand in wanted.items() if sid in self._subs]
+
+        for sub, cand in targets:
+            cand = np.unique(np.asarray(cand, dtype=np.int64))
+            # Cells are coarser than the box: keep exact matches only
+            cand = cand[sub.rows_of_interest(lat[cand], lon[cand], zone[cand])]
+            if len(cand):
+                sub.offer({"event": "delta", "version": nxt.version, "prev_version": prev.version,
+                           "changes": rows_json(nxt, rows[cand])})
+                self.published += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"subscribers": len(self._subs), "zone_keys": len(self._by_zone),
+                    "cells": len(self._by_cell), "wide_boxes": len(self._wide), "events_published": self.published}
+
+
+def status_changes(prev, nxt) -> np.ndarray:
+    """Rows of ``nxt`` that are new, or whose status differs from ``prev``."""
+    changed = np.asarray(nxt.changed, dtype=np.int64)
+    old = changed < len(prev.index.status)
+    moved = np.ones(len(changed), dtype=bool)
+    moved[old] = prev.index.status[changed[old]] != nxt.index.status[changed[old]]
+    return changed[moved]
+
+
+def rows_json(snap, rows: np.ndarray) -> List[Dict[str, Any]]:
+    idx = snap.index
+    return [{
+        "kerbside_id": str(k),
+        "lat": float(a),
+        "lon": float(b),
+        "status": _STATUS_LABEL.get(s, "Unknown"),
+        "zone": str(z) if z >= 0 else None,
+    } for k, a, b, s, z in zip(idx.kerbside[rows].tolist(), idx.lat[rows].tolist(), idx.lon[rows].tolist(),
+                               idx.status[rows].tolist(), idx.zone[rows].tolist())]
+
+
+def full_view(sub: Subscription, snap) -> Dict[str, Any]:
+    idx = snap.index
+    rows = np.flatnonzero(sub.rows_of_interest(idx.lat, idx.lon, idx.zone))
+    return {"event": "snapshot", "version": snap.version, "bays": rows_json(snap, rows)}
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    name = event.pop("event")
+    return f"event: {name}\nid: {event['version']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+def event_stream(sub: Subscription, store, last_version: Optional[int] = None,
+                 registry: Optional[SubscriptionRegistry] = None) -> Iterator[str]:
+    """
+    SSE body: a full view first (skipped when the client already holds the current
+    version), then deltas as they are published. Keep-alive comments are sent while
+    idle, and the stream ends after STREAM_MAX_SECONDS so that clients reconnect with
+    Last-Event-ID.
+    """
+    registry = registry or subscriptions
+    try:
+        yield f"retry: {int(Config.STREAM_RETRY_MS)}\n\n"
+        snap = store.current()
+        if last_version != snap.version:
+            yield _sse(full_view(sub, snap))
+        ticks = max(int(math.ceil(Config.STREAM_MAX_SECONDS / Config.STREAM_KEEPALIVE_SECONDS)), 1)
+        for _ in range(ticks):
+            if sub.resync:
+                sub.resync = False
+                while not sub.events.empty():
+                    sub.events.get_nowait()
+                yield _sse(full_view(sub, store.current()))
+            try:
+                event = sub.events.get(timeout=Config.STREAM_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event)
+    finally:
+        registry.unsubscribe(sub)
+
+
+# Process-wide registry, fed by sensor_store listeners
+subscriptions = SubscriptionRegistry()
@@ -1,15 +1,33 @@
 # app/parking/parking_routes.py
-import requests
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from datetime import datetime
-import pandas as pd
-from geopy.distance import geodesic
 
-from app.parking.parking_utils import (
-    liq_autocomplete, liq_geocode, find_nearby_bays, attach_predictions
-)
-from app.utils import as_bool
+from app.parking.parking_utils import local_autocomplete, liq_geocode, realtime_zone_json, nearest_free_bays
+from app.parking.find_pipeline import find_with_deadlines, find_batch_with_deadlines
+from app.executor import StageBusy, StageTimeout, StageTimer, get_geocode_executor
+from app.utils import as_bool, local_now
 from app.config.config import Config
+from app.parking.sensor_feed import sensor_store
+from app.parking.live_updates import subscriptions, event_stream
+from app.parking.tile_pyramid import tile_payload
+from app.parking.geocoding import geocoder
+from app.parking.restrictions import parse_stay
+from app.parking.history import history_store, parse_day_type
+from app.parking.turnover import turnover_store
+from app.parking.join_graph import MAX_KEY
+
+def parse_at(text: str) -> datetime:
+    """ISO datetime (with an offset, or Melbourne time without one), or HH:MM meaning today in Melbourne."""
+    text = text.strip()
+    if len(text) <= 5 and ":" in text:
+        h, m = (int(p) for p in text.split(":"))
+        return local_now().replace(hour=h, minute=m, second=0, microsecond=0)
+    return datetime.fromisoformat(text)
+
+def valid_key(value: int) -> bool:
+    """Zone_Number / KerbsideID query values: non-negative and within int64."""
+    return 0 <= value <= MAX_KEY
 
 # legacy model endpoints preserved
 from app.ml_model.ml_predictor import (
@@ -37,21 +55,32 @@ def autocomplete():
         "bottom": -37.8260  # min latitude (South)
     }
 
-    # LocationIQ Autocomplete API URL with bounding box + normalization
-    url = (
-        f"https://api.locationiq.com/v1/autocomplete"
-        f"?key={Config.LOCATIONIQ_API_KEY}"
-        f"&q={query}"
-        f"&format=json"
-        f"&bounded=1"
-        f"&viewbox={bbox['left']},{bbox['top']},{bbox['right']},{bbox['bottom']}"
-        f"&normalizecity=1"
-    )
-
+    # Offline street index first; only misses go to LocationIQ
+    local = [
+        r0 for r0 in local_autocomplete(query, limit=10)
+        if bbox["bottom"] <= r0["lat"] <= bbox["top"] and bbox["left"] <= r0["lon"] <= bbox["right"]
+    ]
+    if local:
+        return jsonify([{
+            "display_name": r0["display_name"],
+            "lat": str(r0["lat"]),
+            "lon": str(r0["lon"]),
+            "road": r0["road"],
+            "house_number": "",
+            "postcode": "",
+            "suburb": "",
+        } for r0 in local])
+
+    # LocationIQ Autocomplete API (pooled + cached client) with bounding box + normalization
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        suggestions = response.json()
+        suggestions = geocoder.autocomplete(
+            query,
+            limit=10,
+            format="json",
+            bounded=1,
+            viewbox=f"{bbox['left']},{bbox['top']},{bbox['right']},{bbox['bottom']}",
+            normalizecity=1,
+        )
 
         # Filter out only the essential info (you can expand this as needed)
         simplified_results = []
@@ -68,13 +97,13 @@ def autocomplete():
 
         return jsonify(simplified_results)
 
-    except requests.exceptions.RequestException as e:
+    except OSError as e:  # requests' RequestException is an OSError; requests itself loads on first use
         print(f"[LocationIQ Error] {e}")
         return jsonify({
             "error": "Failed to fetch autocomplete results",
             "details": str(e)
         }), 500
-    
+
 @parking_bp.get("/geocode")
 def api_geocode():
     q = request.args.get("q", "", type=str)
@@ -96,95 +125,316 @@ def api_find_nearby():
     lon = request.args.get("lon", type=float)
     radius = request.args.get("radius", default=200, type=int)
     include_predictions = as_bool(request.args.get("include_predictions"), default=True)
+    if not 0 < radius <= Config.FIND_BATCH_MAX_RADIUS_M:
+        return jsonify({"error": f"radius must be between 1 and {Config.FIND_BATCH_MAX_RADIUS_M:g} m"}), 400
+
+    # Optional legality filter: at=<ISO datetime or HH:MM today>, stay=<minutes | 90m | 2h>
+    at_raw = request.args.get("at", type=str)
+    stay_raw = request.args.get("stay", type=str)
+    at, stay_min = None, None
+    try:
+        if at_raw:
+            at = parse_at(at_raw)
+        if stay_raw or at_raw:
+            stay_min = parse_stay(stay_raw) if stay_raw else 1
+    except ValueError as e:
+        return jsonify({"error": f"Invalid at/stay: {e}"}), 400
+
+    try:
+        # Geocoding overlaps index warm-up; each stage has a deadline (see find_pipeline.py)
+        payload, status, timer = find_with_deadlines(address, lat, lon, radius, at=at, stay_min=stay_min,
+                                                     include_predictions=include_predictions)
+    except Exception as e:
+        return jsonify({"error": f"search failed: {e}"}), 500
 
+    with timer.span("serialize"):
+        resp = jsonify(payload)
+    resp.status_code = status
+    resp.headers["Server-Timing"] = timer.header()
+    if "partial" in payload:
+        resp.headers["Cache-Control"] = "no-store"  # keep degraded answers out of the HTTP cache
+    return resp
+
+@parking_bp.get("/nearest")
+def api_nearest_free():
+    """
+    The k closest free bays: /api/parking/nearest?lat=..&lon=..&k=5&radius=500
+    Optional: address instead of lat/lon, at/stay as for /find, rank=prediction to
+    favour zones that usually have space.
+    """
+    address = request.args.get("address", type=str)
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    k = request.args.get("k", default=5, type=int)
+    radius = request.args.get("radius", default=500, type=int)
+    rank = request.args.get("rank", default="distance", type=str).lower()
+    if not 1 <= k <= Config.NEAREST_MAX_K:
+        return jsonify({"error": f"k must be between 1 and {Config.NEAREST_MAX_K}"}), 400
+    if not 0 < radius <= Config.NEAREST_MAX_RADIUS_M:
+        return jsonify({"error": f"radius must be between 1 and {Config.NEAREST_MAX_RADIUS_M:g} m"}), 400
+    if rank not in ("distance", "prediction"):
+        return jsonify({"error": "rank must be 'distance' or 'prediction'"}), 400
+
+    at_raw = request.args.get("at", type=str)
+    stay_raw = request.args.get("stay", type=str)
+    at, stay_min = None, None
+    try:
+        if at_raw:
+            at = parse_at(at_raw)
+        if stay_raw or at_raw:
+            stay_min = parse_stay(stay_raw) if stay_raw else 1
+    except ValueError as e:
+        return jsonify({"error": f"Invalid at/stay: {e}"}), 400
+
+    timer = StageTimer()
     if address and (lat is None or lon is None):
-        match = liq_geocode(address)
+        try:
+            match = timer.run("geocode", liq_geocode, address, timeout=Config.FIND_GEOCODE_TIMEOUT_SECONDS,
+                              pool=get_geocode_executor())
+        except StageTimeout as e:
+            return jsonify({"error": "Address lookup timed out", "details": str(e)}), 504
+        except StageBusy as e:
+            return jsonify({"error": "Address lookup busy, retry later", "details": str(e)}), 503
         if not match:
             return jsonify({"error": "Address not found"}), 404
         lat, lon = match["lat"], match["lon"]
-
     if lat is None or lon is None:
         return jsonify({"error": "Provide either address or lat & lon"}), 400
 
     try:
-        result = find_nearby_bays(lat, lon, radius=radius / 1000.0)  # result is a dict
-        if include_predictions and "zones" in result:
-            zones = [{"zone": z} for z in result["zones"]]
-            result["zones"] = attach_predictions(zones)
-        payload = {
-            "center": {"lat": lat, "lon": lon},
-            "radius_m": radius,
-            "generated_at": datetime.utcnow().isoformat() + "Z",
-            "result": result
-        }
-        return jsonify(payload), 200
+        items = nearest_free_bays(lat, lon, k=k, radius_m=radius, at=at, stay_min=stay_min, rank=rank)
+    except Exception as e:
+        return jsonify({"error": f"search failed: {e}"}), 500
+    resp = jsonify({
+        "center": {"lat": lat, "lon": lon},
+        "radius_m": radius,
+        "k": k,
+        "rank": rank,
+        "data_as_of": sensor_store.current().as_of,
+        "count": len(items),
+        "items": items,
+    })
+    if timer.durations:
+        resp.headers["Server-Timing"] = timer.header()
+    return resp
+
+def _batch_point(raw) -> dict:
+    """Validate one /find_batch point; raises ValueError with a client-facing message."""
+    if not isinstance(raw, dict):
+        raise ValueError("each point must be an object")
+    point = {"id": raw.get("id"), "address": raw.get("address")}
+    for key in ("lat", "lon"):
+        point[key] = float(raw[key]) if raw.get(key) is not None else None
+    point["radius"] = int(raw.get("radius", 200))
+    if not 0 < point["radius"] <= Config.FIND_BATCH_MAX_RADIUS_M:
+        raise ValueError(f"radius must be between 1 and {Config.FIND_BATCH_MAX_RADIUS_M:g} m")
+    if not point["address"] and (point["lat"] is None or point["lon"] is None):
+        raise ValueError("provide either address or lat & lon")
+    return point
+
+@parking_bp.post("/find_batch")
+def api_find_batch():
+    """
+    Many /find searches in one request, e.g. stops along a route:
+
+        {"points": [{"lat": -37.81, "lon": 144.96, "radius": 150, "id": "a"},
+                    {"address": "Queen Street"}],
+         "at": "18:00", "stay": "2h", "include_predictions": true}
+
+    One entry per point, in order. Add ?format=ndjson (or Accept: application/x-ndjson)
+    to stream one JSON line per point instead.
+    """
+    body = request.get_json(silent=True) or {}
+    raw_points = body.get("points")
+    if not isinstance(raw_points, list) or not raw_points:
+        return jsonify({"error": "Body must contain a non-empty 'points' list"}), 400
+    if len(raw_points) > Config.FIND_BATCH_MAX_POINTS:
+        return jsonify({"error": f"At most {Config.FIND_BATCH_MAX_POINTS} points per batch"}), 400
+    try:
+        points = [_batch_point(p) for p in raw_points]
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid point: {e}"}), 400
+
+    at_raw, stay_raw = body.get("at"), body.get("stay")
+    at, stay_min = None, None
+    try:
+        if at_raw:
+            at = parse_at(str(at_raw))
+        if stay_raw or at_raw:
+            stay_min = parse_stay(str(stay_raw)) if stay_raw else 1
+    except ValueError as e:
+        return jsonify({"error": f"Invalid at/stay: {e}"}), 400
+
+    try:
+        results, partial, timer = find_batch_with_deadlines(
+            points, at=at, stay_min=stay_min, include_predictions=as_bool(body.get("include_predictions"), default=True))
+    except StageTimeout as e:
+        return jsonify({"error": "Search timed out", "details": str(e)}), 503
     except Exception as e:
         return jsonify({"error": f"search failed: {e}"}), 500
 
+    data_as_of = sensor_store.current().as_of
+    ndjson = (request.args.get("format") == "ndjson"
+              or request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson")
+    if ndjson:
+        def lines():
+            for entry in results:
+                entry["data_as_of"] = data_as_of
+                if partial:
+                    entry["partial"] = partial
+                yield json.dumps(entry) + "\n"
+        resp = Response(lines(), mimetype="application/x-ndjson")
+    else:
+        payload = {"data_as_of": data_as_of, "count": len(results), "results": results}
+        if partial:
+            payload["partial"] = partial
+        resp = jsonify(payload)
+    resp.headers["Server-Timing"] = timer.header()
+    return resp
+
+@parking_bp.get("/snapshot")
+def api_snapshot_status():
+    """
+    Live sensor snapshot version and age, for staleness alerting.
+    """
+    return jsonify(sensor_store.status()), 200
+
+@parking_bp.get("/stream")
+def api_stream():
+    """
+    Server-sent occupancy updates for a map viewport:
+    /api/parking/stream?bbox=min_lon,min_lat,max_lon,max_lat and/or ?zones=7514,7550
+
+    Sends a "snapshot" event with every bay in view, then "delta" events holding only the
+    bays whose status changed, each with the snapshot version as its event id. Reconnects
+    with Last-Event-ID (or ?since=) at the current version skip the full view.
+    """
+    bbox = None
+    zones = []
+    try:
+        if request.args.get("bbox"):
+            parts = [float(p) for p in request.args["bbox"].split(",")]
+            if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+                raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+            # Comparisons with NaN are always false, so the range check also rejects it
+            if not (-180 <= parts[0] <= 180 and -180 <= parts[2] <= 180
+                    and -90 <= parts[1] <= 90 and -90 <= parts[3] <= 90):
+                raise ValueError("bbox must be finite, within -180..180 lon and -90..90 lat")
+            bbox = tuple(parts)
+        if request.args.get("zones"):
+            zones = [int(z) for z in request.args["zones"].split(",") if z.strip()]
+        since = request.headers.get("Last-Event-ID") or request.args.get("since")
+        since = int(since) if since else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid stream parameters: {e}"}), 400
+    if bbox is None and not zones:
+        return jsonify({"error": "Provide bbox and/or zones"}), 400
+    if len(zones) > Config.STREAM_MAX_ZONES:
+        return jsonify({"error": f"At most {Config.STREAM_MAX_ZONES} zones per stream"}), 400
+
+    sub = subscriptions.subscribe(bbox=bbox, zones=zones, limit=Config.STREAM_MAX_SUBSCRIBERS)
+    if sub is None:
+        # Every stream pins a worker thread; past the limit, clients back off and retry
+        resp = jsonify({"error": "Too many open streams, retry later"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(max(Config.STREAM_RETRY_MS // 1000, 1))
+        return resp
+    resp = Response(stream_with_context(event_stream(sub, sensor_store, last_version=since)),
+                    mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"  # let nginx/Render proxies pass events through
+    return resp
+
+@parking_bp.get("/tiles/<int:z>/<int:x>/<int:y>")
+def api_occupancy_tile(z: int, x: int, y: int):
+    """
+    Occupancy for one slippy-map tile (the Leaflet {z}/{x}/{y} scheme). Zoomed out it
+    returns clusters (centroid, bays, free, occupied) a few levels below the tile; from
+    TILE_BAYS_ZOOM in, individual bays. Rows are arrays in the order given by "fields".
+    """
+    if not 0 <= z <= 24 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "Tile out of range"}), 400
+    try:
+        return jsonify(tile_payload(z, x, y, sensor_store.current())), 200
+    except Exception as e:
+        return jsonify({"error": f"tile failed: {e}"}), 500
+
 # ---------- Legacy endpoints (kept so nothing breaks) ----------
 
 @parking_bp.get("/realtime")
 def api_realtime_by_zone():
     """
     Legacy: /api/parking/realtime?zone_number=1234&only_available=true
-    We aggregate sensor rows that match the zone* column if present.
+    Served from the shared live sensor snapshot (Zone_Number → row-slice index).
     """
-    import pandas as pd
-    import os
-
     zone_number = request.args.get("zone_number", type=int)
     only_available = as_bool(request.args.get("only_available"), default=False)
 
     if zone_number is None:
         return jsonify({"error": "Missing 'zone_number' parameter"}), 400
+    if not valid_key(zone_number):
+        return jsonify({"error": "zone_number must be a non-negative integer"}), 400
 
     try:
-        file_path = Config.BAY_SENSORS_DATA
-        if not os.path.exists(file_path):
-            return jsonify({"error": f"Sensor data file not found: {file_path}"}), 500
-
-        df = pd.read_csv(file_path) if file_path.lower().endswith(".csv") else pd.read_excel(file_path)
-        df.columns = df.columns.str.strip().str.lower()
-
-        zone_col = next((c for c in ["zone_number", "zone", "zoneid", "zone_id", "zonenumber"] if c in df.columns), None)
-        lat_col = next((c for c in ["latitude", "lat"] if c in df.columns), None)
-        lon_col = next((c for c in ["longitude", "lon", "lng"] if c in df.columns), None)
-        status_col = next((c for c in ["status_description", "status", "occupancy", "available", "is_occupied", "current_status"] if c in df.columns), None)
-
-        if not zone_col:
-            return jsonify({"zone_number": zone_number, "items": [], "note": "No valid zone column found"}), 200
-
-        rows = df[df[zone_col] == zone_number].copy()
-        if rows.empty:
-            return jsonify({"zone_number": zone_number, "items": []}), 200
-
-        if only_available and status_col:
-            ok_vals = {"free", "available", "vacant", "unoccupied", "0", "false"}  # "Unoccupied" → available
-            rows = rows[rows[status_col].astype(str).str.lower().isin(ok_vals)]
-
-        items = []
-        for _, r in rows.iterrows():
-            items.append({
-                "lat": float(r[lat_col]) if lat_col and not pd.isna(r[lat_col]) else None,
-                "lon": float(r[lon_col]) if lon_col and not pd.isna(r[lon_col]) else None,
-                "status": r[status_col] if status_col and not pd.isna(r[status_col]) else None
-            })
-
-        return jsonify({
-            "zone_number": zone_number,
-            "count": len(items),
-            "items": items
-        }), 200
-
+        body = realtime_zone_json(zone_number, only_available)
+        return Response(body, status=200, mimetype="application/json")
     except Exception as e:
         return jsonify({"error": f"realtime failed: {e}"}), 500
+
+@parking_bp.get("/historical")
+def api_historical():
+    """
+    /api/parking/historical?zone_number=7539&day_type=Weekday
+    Hourly occupancy of a zone from the sensor status history (Weekday, Saturday or Sunday).
+    """
+    zone_number = request.args.get("zone_number", type=int)
+    day_type = parse_day_type(request.args.get("day_type", type=str, default="weekday"))
+    if zone_number is None:
+        return jsonify({"error": "missing zone_number"}), 400
+    if not valid_key(zone_number):
+        return jsonify({"error": "zone_number must be a non-negative integer"}), 400
+    if day_type is None:
+        return jsonify({"error": "day_type must be Weekday, Saturday or Sunday"}), 400
+    if not Config.HISTORY_ENABLED:
+        return jsonify({"error": "history is disabled (HISTORY_ENABLED=0)"}), 503
+
+    bays = len(sensor_store.current().index.rows_for_zone(zone_number))
+    return jsonify(history_store.profile(zone_number, day_type, bays)), 200
+
+@parking_bp.get("/turnover")
+def api_turnover():
+    """
+    /api/parking/turnover?zone_number=7539&day_type=Weekday  or  /api/parking/turnover?kerbside_id=22774
+    Dwell-time quantiles, turnover and overstays from the sensor status history; for a zone,
+    also arrivals per hour on the given day type.
+    """
+    zone_number = request.args.get("zone_number", type=int)
+    kerbside_id = request.args.get("kerbside_id", type=int)
+    day_type = parse_day_type(request.args.get("day_type", type=str, default="weekday"))
+    if zone_number is None and kerbside_id is None:
+        return jsonify({"error": "missing zone_number or kerbside_id"}), 400
+    if not all(valid_key(v) for v in (zone_number, kerbside_id) if v is not None):
+        return jsonify({"error": "zone_number and kerbside_id must be non-negative integers"}), 400
+    if day_type is None:
+        return jsonify({"error": "day_type must be Weekday, Saturday or Sunday"}), 400
+    if not Config.HISTORY_ENABLED:
+        return jsonify({"error": "history is disabled (HISTORY_ENABLED=0)"}), 503
+
+    if kerbside_id is not None:
+        data = turnover_store.bay_summary(kerbside_id)
+        if data is None:
+            return jsonify({"error": f"no status history for kerbside_id {kerbside_id}"}), 404
+        return jsonify(data), 200
+    bays = len(sensor_store.current().index.rows_for_zone(zone_number))
+    return jsonify(turnover_store.zone_summary(zone_number, day_type, bays)), 200
+
 @parking_bp.get("/predict")
 def api_predict_by_zone():
     """
     Legacy: /api/parking/predict?zone_number=1234&hour=17&day_type=weekday
     """
     zone_number = request.args.get("zone_number", type=int)
-    hour = request.args.get("hour", type=int, default=datetime.now().hour)
+    hour = request.args.get("hour", type=int, default=local_now().hour)
     day_type = request.args.get("day_type", type=str, default="weekday")
     if zone_number is None:
         return jsonify({"error": "missing zone_number"}), 400
@@ -197,7 +447,7 @@ def api_predict_by_zone():
 @parking_bp.get("/predict_many")
 def api_predict_many():
     zone_number = request.args.get("zone_number", type=int)
-    hour = request.args.get("hour", type=int, default=datetime.now().hour)
+    hour = request.args.get("hour", type=int, default=local_now().hour)
     day_type = request.args.get("day_type", type=str, default="weekday")
     hours_ahead = request.args.get("hours_ahead", type=int, default=3)
     if zone_number is None:
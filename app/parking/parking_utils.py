@@ -1,40 +1,38 @@
-import os
 import json
+import time
 from functools import lru_cache
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
 import pandas as pd
 import numpy as np
-import requests
 
 from app.config.config import Config
-from app.utils import haversine_m
+from app.memory import compact_frame
+from app.metrics import record_span, span
+from app.utils import haversine_m, local_now
+from app.repository import get_repository
+from app.parking.spatial_index import BayGridIndex
+from app.parking.join_graph import JoinGraph, SensorIndex, STATUS_UNOCCUPIED, STATUS_PRESENT
+from app.parking.sensor_feed import sensor_store
+from app.parking.geocoding import geocoder
+from app.parking.street_index import StreetIndex
+from app.parking.restrictions import RestrictionEngine
 
 # ------------------------------------
 # LocationIQ Autocomplete + Geocode
 # ------------------------------------
-LIQ_AUTOCOMPLETE_URL = "https://us1.locationiq.com/v1/autocomplete"
-LIQ_SEARCH_URL = "https://us1.locationiq.com/v1/search"
-
-def _liq_key() -> str:
-    return os.getenv("LOCATIONIQ_API_KEY", Config.LOCATIONIQ_API_KEY)
+def local_autocomplete(q: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Street/segment suggestions from the offline index (empty when disabled or no match)."""
+    if not Config.STREET_INDEX_ENABLED:
+        return []
+    return load_street_index().search(q, limit=limit)
 
 def liq_autocomplete(q: str, limit: int = 5) -> List[Dict[str, Any]]:
-    if not q:
-        return []
-    params = {
-        "key": _liq_key(),
-        "q": q,
-        "limit": limit,
-        "countrycodes": "au",
-        "dedupe": 1,
-        "normalizeaddress": 1,
-        "format": "json"
-    }
-    r = requests.get(LIQ_AUTOCOMPLETE_URL, params=params, timeout=8)
-    r.raise_for_status()
-    rows = r.json()
+    local = local_autocomplete(q, limit)
+    if local:
+        return [{k: r0[k] for k in ("display_name", "lat", "lon", "type")} for r0 in local]
+    rows = geocoder.autocomplete(q, limit=limit, countrycodes="au", dedupe=1, normalizeaddress=1, format="json")
     return [
         {
             "display_name": r0.get("display_name"),
@@ -46,19 +44,11 @@ def liq_autocomplete(q: str, limit: int = 5) -> List[Dict[str, Any]]:
     ]
 
 def liq_geocode(q: str) -> Optional[Dict[str, Any]]:
-    if not q:
-        return None
-    params = {
-        "key": _liq_key(),
-        "q": q,
-        "countrycodes": "au",
-        "limit": 1,
-        "format": "json",
-        "normalizeaddress": 1
-    }
-    r = requests.get(LIQ_SEARCH_URL, params=params, timeout=8)
-    r.raise_for_status()
-    js = r.json()
+    if Config.STREET_INDEX_ENABLED:
+        local = load_street_index().lookup(q)
+        if local:
+            return {k: local[k] for k in ("display_name", "lat", "lon", "type")}
+    js = geocoder.search(q, countrycodes="au", limit=1, format="json", normalizeaddress=1)
     if not js:
         return None
     top = js[0]
@@ -70,31 +60,50 @@ def liq_geocode(q: str) -> Optional[Dict[str, Any]]:
     }
 
 # ------------------------------------
-# Load data files
+# Load data (flat files or database, see app/repository.py), compacted by app/memory.py
 # ------------------------------------
-@lru_cache(maxsize=1)
 def load_sensors() -> pd.DataFrame:
-    df = pd.read_csv(Config.BAY_SENSORS_DATA)
-    df.columns = df.columns.str.strip()
-    return df
+    # Current live snapshot; swapped atomically by the background refresher
+    return sensor_store.current().frame
 
 @lru_cache(maxsize=1)
 def load_bays() -> pd.DataFrame:
-    df = pd.read_excel(Config.PARKING_BAYS_DATA)
-    df.columns = df.columns.str.strip()
-    return df
+    return compact_frame(get_repository().bays())
+
+@lru_cache(maxsize=1)
+def load_bay_index() -> BayGridIndex:
+    # Built once per process from the cached bay table; row positions map back to load_bays()
+    bays_df = load_bays()
+    return BayGridIndex(bays_df["Latitude"].to_numpy(), bays_df["Longitude"].to_numpy())
 
 @lru_cache(maxsize=1)
 def load_zone_links() -> pd.DataFrame:
-    df = pd.read_csv(Config.PARKING_ZONES_DATA)
-    df.columns = df.columns.str.strip()
-    return df
+    return compact_frame(get_repository().zone_links())
 
 @lru_cache(maxsize=1)
 def load_sign_plates() -> pd.DataFrame:
-    df = pd.read_csv(Config.SIGN_PLATES_DATA)
-    df.columns = df.columns.str.strip()
-    return df
+    return compact_frame(get_repository().sign_plates())
+
+@lru_cache(maxsize=1)
+def load_join_graph() -> JoinGraph:
+    return JoinGraph(load_bays(), load_zone_links(), load_sign_plates())
+
+@lru_cache(maxsize=1)
+def load_restriction_engine() -> RestrictionEngine:
+    # Bay → zone from the sensor feed (zone assignments do not change between refreshes).
+    # Imputed zones are left out: the bay's own segment links are a better guide to its signs
+    graph, sensor_idx = load_join_graph(), load_sensor_index()
+    rows = sensor_idx.by_kerbside.find(graph.bay_kerbside)
+    safe = np.maximum(rows, 0)
+    bay_zone = np.where((rows >= 0) & ~sensor_idx.zone_imputed[safe], sensor_idx.zone[safe], -1)
+    return RestrictionEngine(graph, load_sign_plates(), bay_zone)
+
+@lru_cache(maxsize=1)
+def load_street_index() -> StreetIndex:
+    return StreetIndex.build(load_zone_links(), load_bays(), load_zone_map())
+
+def load_sensor_index() -> SensorIndex:
+    return sensor_store.current().index
 
 @lru_cache(maxsize=1)
 def load_zone_map() -> Dict[str, str]:
@@ -104,102 +113,197 @@ def load_zone_map() -> Dict[str, str]:
     except Exception:
         return {}
 
-# ------------------------------------
-# English description formatter
-# ------------------------------------
-def generate_signplate_descriptions(df: pd.DataFrame) -> List[str]:
-    descriptions = []
-    for _, row in df.iterrows():
-        days = row.get("Days", "")
-        start = row.get("StartTime", "")
-        end = row.get("EndTime", "")
-        duration = row.get("Duration", "")
-        permit = row.get("Permit", "")
-
-        sentence = f"You can park here on {days}"
-        if start and end:
-            sentence += f" from {start} to {end}"
-        if duration:
-            sentence += f" for {duration.lower()}"
-        if permit and permit.strip().lower() != "none":
-            sentence += f" with permit {permit}"
-        descriptions.append(sentence)
-    return descriptions
-
 # ------------------------------------
 # Main Logic: Find bays near lat/lon
 # ------------------------------------
-def find_nearby_bays(lat: float, lon: float, radius: float = 0.001):
-    bays_df = load_bays()
-    sensors_df = load_sensors()
+def find_nearby_bays(lat: float, lon: float, radius_m: float = 200.0,
+                     at: Optional[datetime] = None, stay_min: Optional[int] = None):
+    """
+    Nearby bays with occupancy, zones and sign plates. With ``stay_min``, only bays where a
+    general vehicle may legally park from ``at`` (default now) for that long are kept.
+    """
+    return find_nearby_bays_many([lat], [lon], [radius_m], at=at, stay_min=stay_min)[0]
+
+def find_nearby_bays_many(lats, lons, radii, at: Optional[datetime] = None,
+                          stay_min: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    ``find_nearby_bays`` for many points at once. The radius search, legality check and
+    sensor lookup run as one vectorised pass over all points. Sign plate records are
+    built once per distinct zone and shared between the points that see it.
+    """
     sign_df = load_sign_plates()
-    zone_links_df = load_zone_links()
-
-    # Filter bays using bounding box radius
-    nearby_bays = bays_df[
-        (np.abs(bays_df["Latitude"] - lat) < radius) &
-        (np.abs(bays_df["Longitude"] - lon) < radius)
-    ]
-
-    if nearby_bays.empty:
-        return {"error": "No bays found near given coordinates."}
-
-    kerbside_ids = nearby_bays["KerbsideID"].astype(str).tolist()
-    sensors_df["KerbsideID"] = sensors_df["KerbsideID"].astype(str)
-
-    match_sensors = sensors_df[sensors_df["KerbsideID"].isin(kerbside_ids)]
-    zone_numbers = match_sensors["Zone_Number"].astype(str).unique().tolist()
-
-    # Count occupancy
-    available = (match_sensors["Status_Description"].str.lower() == "unoccupied").sum()
-    occupied = (match_sensors["Status_Description"].str.lower() == "present").sum()
-
-    # Map KerbsideID → RoadSegmentID → Segment_ID → ParkingZone
-    bays_df["KerbsideID"] = bays_df["KerbsideID"].astype(str)
-    zone_links_df["Segment_ID"] = zone_links_df["Segment_ID"].astype(str)
-    sign_df["ParkingZone"] = sign_df["ParkingZone"].astype(str)
+    graph = load_join_graph()
+    n = len(lats)
+
+    # (point, bay row) pairs within a true haversine radius, nearest first per point
+    with span("radius_query"):
+        owner, positions, _ = load_bay_index().query_radius_many(lats, lons, radii)
+        in_radius = np.bincount(owner, minlength=n)
+
+    excluded = None
+    if stay_min is not None:
+        with span("legality"):
+            at = at or local_now()
+            legal = load_restriction_engine().legal_bays(positions, at, stay_min)
+            excluded = np.bincount(owner[~legal], minlength=n)
+            owner, positions = owner[legal], positions[legal]
+
+    # KerbsideID → sensor rows for every pair (gather over the integer-keyed sensor index)
+    with span("sensor_join"):
+        sensor_idx = load_sensor_index()
+        pair_sensor = sensor_idx.by_kerbside.find(graph.bay_kerbside[positions])
+
+    # Map KerbsideID → RoadSegmentID → ParkingZone → sign plates, once per distinct zone
+    with span("sign_plates"):
+        engine = load_restriction_engine()
+        all_codes = graph.zone_codes_for_bays(positions)
+        plate_counts = graph.zone_plate_offsets[all_codes + 1] - graph.zone_plate_offsets[all_codes]
+        records = sign_df.iloc[graph.plate_rows_for_zones(all_codes)].to_dict(orient="records")
+        ends = np.cumsum(plate_counts).tolist()
+        zone_records = {c: records[e - k:e] for c, k, e in zip(all_codes.tolist(), plate_counts.tolist(), ends)}
+
+    t0 = time.perf_counter()
+    bounds = np.searchsorted(owner, np.arange(n + 1))
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        if not in_radius[i]:
+            out.append({"error": "No bays found near given coordinates."})
+            continue
+        lo, hi = bounds[i], bounds[i + 1]
+        sensor_rows = pair_sensor[lo:hi]
+        sensor_rows = pd.unique(sensor_rows[sensor_rows >= 0])
+        zone_numbers = pd.unique(sensor_idx.zone[sensor_rows])
+        zone_numbers = zone_numbers[zone_numbers >= 0]
+        # Zones known only through imputation (no bay in range reports them itself)
+        reported = sensor_idx.zone[sensor_rows[~sensor_idx.zone_imputed[sensor_rows]]]
+        imputed_zones = np.setdiff1d(zone_numbers, reported)
+
+        # Count occupancy
+        status = sensor_idx.status[sensor_rows]
+        codes = graph.zone_codes_for_bays(positions[lo:hi]).tolist()
+
+        result = {
+            "bays_found": int(hi - lo),
+            "available_bays": int(np.count_nonzero(status == STATUS_UNOCCUPIED)),
+            "occupied_bays": int(np.count_nonzero(status == STATUS_PRESENT)),
+            "zones": [str(z) for z in zone_numbers],
+            "imputed_zones": [str(z) for z in imputed_zones],
+            "restrictions": [r for c in codes for r in zone_records[c]],
+            "restrictions_pretty": engine.descriptions_for_zones(codes),
+        }
+        if excluded is not None:
+            result["legal_filter"] = {
+                "at": at.isoformat(timespec="minutes"),
+                "stay_min": int(stay_min),
+                "bays_in_radius": int(in_radius[i]),
+                "bays_excluded": int(excluded[i]),
+            }
+        out.append(result)
+    record_span("assemble", time.perf_counter() - t0)
+    return out
 
-    matching_segments = bays_df[bays_df["KerbsideID"].isin(kerbside_ids)][["KerbsideID", "RoadSegmentID"]]
-    matching_segments["RoadSegmentID"] = matching_segments["RoadSegmentID"].astype(str)
 
-    matched_zones = pd.merge(
-        matching_segments,
-        zone_links_df[["Segment_ID", "ParkingZone"]],
-        left_on="RoadSegmentID",
-        right_on="Segment_ID",
-        how="left"
-    )
+# ------------------------------------
+# Nearest free bays
+# ------------------------------------
+# Bay row → sensor row for the current sensor snapshot (rebuilt when the snapshot is swapped)
+_bay_sensor_cache: Dict[str, Any] = {"snapshot": None, "rows": None}
+
+def bay_sensor_rows() -> np.ndarray:
+    snap = sensor_store.current()
+    if _bay_sensor_cache["snapshot"] is not snap:
+        rows = snap.index.by_kerbside.find(load_join_graph().bay_kerbside)
+        rows.flags.writeable = False
+        _bay_sensor_cache.update(snapshot=snap, rows=rows)
+    return _bay_sensor_cache["rows"]
+
+def nearest_free_bays(lat: float, lon: float, k: int = 5, radius_m: float = 500.0,
+                      at: Optional[datetime] = None, stay_min: Optional[int] = None,
+                      rank: str = "distance") -> List[Dict[str, Any]]:
+    """
+    The k closest bays whose sensor reports them free, nearest first. With ``stay_min``,
+    only bays where that stay is legal are considered. ``rank="prediction"`` takes a
+    wider pool of nearest free bays and re-orders it by
+    ``distance × (2 − predicted availability)`` of each bay's zone. A bay in a zone
+    that is usually full counts as up to twice as far away.
+    """
+    sensor_idx = load_sensor_index()
+    rows = bay_sensor_rows()
+    safe = np.maximum(rows, 0)
+    free = (rows >= 0) & (sensor_idx.status[safe] == STATUS_UNOCCUPIED)
+    if stay_min is not None:
+        free &= load_restriction_engine().legal_bays(np.arange(len(rows)), at or local_now(), stay_min)
+
+    pool = k * Config.NEAREST_RERANK_POOL if rank == "prediction" else k
+    positions, dist = load_bay_index().query_knn(lat, lon, pool, radius_m, mask=free)
+    if not len(positions):
+        return []
 
-    matched_zones = matched_zones.dropna(subset=["ParkingZone"])
-    matched_zone_ids = matched_zones["ParkingZone"].unique().astype(str).tolist()
+    bays_df = load_bays()
+    zones = sensor_idx.zone[rows[positions]]
+    imputed = sensor_idx.zone_imputed[rows[positions]]
+    items = [{
+        "kerbside_id": str(kerbside),
+        "lat": float(b_lat),
+        "lon": float(b_lon),
+        "distance_m": round(float(d), 1),
+        "zone": str(z) if z >= 0 else None,
+        "zone_imputed": bool(imp),
+        "street": desc if isinstance(desc, str) else None,
+    } for kerbside, b_lat, b_lon, d, z, imp, desc in zip(
+        load_join_graph().bay_kerbside[positions].tolist(), bays_df["Latitude"].to_numpy()[positions].tolist(),
+        bays_df["Longitude"].to_numpy()[positions].tolist(), dist.tolist(), zones.tolist(), imputed.tolist(),
+        bays_df["RoadSegmentDescription"].to_numpy()[positions].tolist())]
+
+    if rank == "prediction":
+        from app.ml_model.ml_predictor import predict_zones
+        preds = predict_zones([z for z in pd.unique(zones) if z >= 0], local_now().hour, _now_day_type())
+        score = []
+        for item, z, d in zip(items, zones.tolist(), dist.tolist()):
+            block = preds.get(z, (None, None))[0] if z >= 0 else None
+            p = block.get("predicted_availability") if block else None
+            item["predicted_availability"] = p
+            # Zones without a prediction are scored as 50% available
+            score.append(d * (2.0 - (p if p is not None else 0.5)))
+            item["score"] = round(score[-1], 1)
+        best = np.argsort(np.asarray(score), kind="stable")[:k]
+        items = [items[i] for i in best.tolist()]
+    return items
 
-    matching_signs = sign_df[sign_df["ParkingZone"].astype(str).isin(matched_zone_ids)]
 
-    return {
-        "bays_found": int(len(nearby_bays)),
-        "available_bays": int(available),
-        "occupied_bays": int(occupied),
-        "zones": [str(z) for z in zone_numbers],
-        "restrictions": matching_signs.to_dict(orient="records"),
-        "restrictions_pretty": generate_signplate_descriptions(matching_signs)
-    }
+# ------------------------------------
+# Realtime sensor rows by zone
+# ------------------------------------
+def realtime_zone_json(zone_number: int, only_available: bool = False) -> str:
+    """
+    JSON body for /realtime, served from the live snapshot's zone index: a row-slice lookup
+    plus a join of pre-serialised rows (no CSV read, no per-row formatting).
+    """
+    idx = load_sensor_index()
+    rows = idx.rows_for_zone(zone_number)
+    if not len(rows):
+        return '{"items":[],"zone_number":%d}' % zone_number
+    if only_available:
+        rows = rows[idx.status[rows] == STATUS_UNOCCUPIED]
+    return '{"count":%d,"items":[%s],"zone_number":%d}' % (len(rows), ",".join(idx.row_json[rows]), zone_number)
 
 
 # ------------------------------------
 # Prediction Model Integration
 # ------------------------------------
 def _now_day_type() -> str:
-    wd = datetime.now().weekday()
+    wd = local_now().weekday()
     return "saturday" if wd == 5 else "sunday" if wd == 6 else "weekday"
 
 def attach_predictions(bays: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    from app.ml_model.ml_predictor import predict_by_zone
+    from app.ml_model.ml_predictor import predict_zones
     zone_map = load_zone_map()
-    hour_now = datetime.now().hour
+    hour_now = local_now().hour
     day_type = _now_day_type()
 
+    # Validate zones first, then run one batched prediction for all of them
+    valid: Dict[int, List[Dict[str, Any]]] = {}
     for b in bays:
-        pred_block, err = None, None
         z = b.get("zone") or b.get("zone_number") or b.get("ZoneNumber")
 
         # Skip if zone is None or NaN
@@ -215,19 +319,23 @@ def attach_predictions(bays: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             b["prediction_error"] = f"Invalid zone format: {z}"
             continue
 
-        try:
-            # Try prediction
-            pred_block, err = predict_by_zone(zone_id, hour_now, day_type)
+        # Fallback to string version if zone not in zone_map
+        b["zone"] = str(zone_id)
+        b["zone_name"] = zone_map.get(str(zone_id), f"Zone {zone_id}")
+        valid.setdefault(zone_id, []).append(b)
 
-            # Fallback to string version if zone not in zone_map
-            zone_name = zone_map.get(str(zone_id), f"Zone {zone_id}")
-            b["zone"] = str(zone_id)
-            b["zone_name"] = zone_name
+    if not valid:
+        return bays
 
-        except Exception as e:
-            pred_block, err = None, str(e)
-
-        b["prediction"] = pred_block
-        b["prediction_error"] = err
+    try:
+        results = predict_zones(list(valid), hour_now, day_type)
+    except Exception as e:
+        results = {z: (None, str(e)) for z in valid}
+
+    for zone_id, group in valid.items():
+        pred_block, err = results.get(zone_id, (None, "No prediction"))
+        for b in group:
+            b["prediction"] = pred_block
+            b["prediction_error"] = err
 
     return bays
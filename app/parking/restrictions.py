@@ -0,0 +1,217 @@
+# app/parking/restrictions.py
+"""
+Compiled parking restrictions.
+
+Sign plates are compiled once per data snapshot into a minute-of-week limit per parking
+zone (the strictest plate in force, or "unrestricted"). A bay uses its own zone from the
+sensor feed when known, otherwise the strictest of the zones linked to its road segment.
+Identical weekly limits share one profile. Each profile stores one packed 10080-bit bitmap
+per max-stay tier (0 = no general parking, 15, 30, 60, ... minutes). "Can I park at T for S
+minutes" is then a few bit gathers per tier, vectorised over all profiles, instead of
+parsing plates per request.
+
+A stay [T, T+S) is legal when no restricted period inside it (a run of minutes under the
+same limit L, clipped to the stay) lasts longer than L minutes; L = 0 forbids parking.
+"""
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.parking.join_graph import JoinGraph, to_int_keys, lookup_sorted
+from app.utils import to_local
+
+MINUTES_PER_DAY = 1440
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+UNRESTRICTED = np.iinfo(np.uint16).max
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+_DAY_INDEX = {d.lower(): i for i, d in enumerate(DAY_NAMES)}
+_TIMED = re.compile(r"^(MP|FP|DP)?(\d+)P$")
+_LOADING = re.compile(r"^LZ(\d+)$")
+
+
+def parse_days(text: str) -> List[int]:
+    """'Mon-Fri' → [0..4], 'Sat' → [5], 'Fri-Mon' wraps; unknown → []."""
+    days: List[int] = []
+    for part in str(text or "").split(","):
+        ends = [_DAY_INDEX.get(p.strip()[:3].lower()) for p in part.split("-")]
+        if not ends or any(e is None for e in ends):
+            continue
+        first, last = ends[0], ends[-1]
+        days.extend((first + k) % 7 for k in range((last - first) % 7 + 1))
+    return sorted(set(days))
+
+
+def parse_clock(text: str) -> Optional[int]:
+    """'7:30:00' → 450 minutes after midnight; '23:59' is treated as end of day."""
+    try:
+        parts = [int(p) for p in str(text).strip().split(":")]
+    except ValueError:
+        return None
+    minutes = parts[0] * 60 + (parts[1] if len(parts) > 1 else 0)
+    return MINUTES_PER_DAY if minutes >= MINUTES_PER_DAY - 1 else minutes
+
+
+def parse_display(code: str) -> Tuple[int, str]:
+    """Restriction_Display code → (max stay in minutes for the general public, label)."""
+    code = str(code or "").strip().upper()
+    m = _TIMED.match(code)
+    if m:
+        prefix, hours = m.group(1), int(m.group(2))
+        if prefix == "DP":
+            return 0, f"Disabled permit holders only ({hours}P)"
+        kind = {"MP": "metered parking", "FP": "free parking"}.get(prefix, "parking")
+        return hours * 60, f"{hours} hour {kind}"
+    m = _LOADING.match(code)
+    if m:
+        return 0, f"Loading zone ({m.group(1)} min)"
+    if code == "FP15":
+        return 15, "15 minute free parking"
+    if code == "QP":
+        return 15, "15 minute parking"
+    if code == "HP":
+        return 30, "30 minute parking"
+    if code == "PP":
+        return 0, "Permit holders only"
+    return 0, f"Restricted ({code or 'unknown'})"
+
+
+def parse_stay(text: str) -> int:
+    """'90', '90m', '2h', '1.5h' → minutes. Raises ValueError on anything else."""
+    s = str(text).strip().lower()
+    if s.endswith("h"):
+        minutes = float(s[:-1]) * 60
+    else:
+        minutes = float(s[:-1] if s.endswith("m") else s)
+    if not 0 < minutes <= MINUTES_PER_WEEK:
+        raise ValueError(f"stay out of range: {text}")
+    return int(round(minutes))
+
+
+def minute_of_week(at: datetime) -> int:
+    """Minute of the Melbourne week (Monday 00:00 = 0); sign-plate times are local wall-clock times."""
+    at = to_local(at)
+    return at.weekday() * MINUTES_PER_DAY + at.hour * 60 + at.minute
+
+
+def _fmt_clock(minutes: int) -> str:
+    if minutes >= MINUTES_PER_DAY:
+        return "midnight"
+    h, m = divmod(minutes, 60)
+    return f"{h % 12 or 12}:{m:02d}{'am' if h < 12 else 'pm'}"
+
+
+def describe_plates(sign_df: pd.DataFrame) -> List[str]:
+    """One English sentence per sign plate row, e.g. '2 hour metered parking, Mon-Fri 7:30am-6:30pm'."""
+    labels = {c: parse_display(c)[1] for c in sign_df["Restriction_Display"].dropna().unique()}
+    out = []
+    for code, days, start, finish in zip(sign_df["Restriction_Display"], sign_df["Restriction_Days"],
+                                         sign_df["Time_Restrictions_Start"], sign_df["Time_Restrictions_Finish"]):
+        s, f = parse_clock(start), parse_clock(finish)
+        when = f"{_fmt_clock(s)}-{_fmt_clock(f)}" if s is not None and f is not None else ""
+        out.append(f"{labels.get(code, parse_display(code)[1])}, {days} {when}".strip())
+    return out
+
+
+class RestrictionEngine:
+    def __init__(self, graph: JoinGraph, sign_df: pd.DataFrame, bay_zone: Optional[np.ndarray] = None):
+        n_zones = len(graph.zone_ids)
+
+        # 1. Minute-of-week limit per zone code (strictest plate wins)
+        zone_limits = np.full((n_zones, MINUTES_PER_WEEK), UNRESTRICTED, dtype=np.uint16)
+        plate_zone = to_int_keys(sign_df["ParkingZone"])
+        plate_code = np.searchsorted(graph.zone_ids, plate_zone)
+        sentences = describe_plates(sign_df)
+        self.zone_descriptions: List[List[str]] = [[] for _ in range(n_zones)]
+        for row, (zone, code, days, start, finish, display) in enumerate(zip(
+                plate_zone, plate_code, sign_df["Restriction_Days"], sign_df["Time_Restrictions_Start"],
+                sign_df["Time_Restrictions_Finish"], sign_df["Restriction_Display"])):
+            if zone < 0 or code >= n_zones or graph.zone_ids[code] != zone:
+                continue
+            self.zone_descriptions[code].append(sentences[row])
+            s, f = parse_clock(start), parse_clock(finish)
+            if s is None or f is None:
+                continue
+            limit = parse_display(display)[0]
+            length = (f - s) % MINUTES_PER_DAY or MINUTES_PER_DAY  # finish <= start runs past midnight
+            for d in parse_days(days):
+                lo = d * MINUTES_PER_DAY + s
+                hi = lo + length
+                week = zone_limits[code]
+                # Contiguous minute range; a Sunday-night window wraps to Monday
+                np.minimum(week[lo:min(hi, MINUTES_PER_WEEK)], limit, out=week[lo:min(hi, MINUTES_PER_WEEK)])
+                if hi > MINUTES_PER_WEEK:
+                    np.minimum(week[:hi - MINUTES_PER_WEEK], limit, out=week[:hi - MINUTES_PER_WEEK])
+
+        # 2. Segment limit = strictest of its zones (used when a bay's own zone is unknown)
+        if len(graph.segment_ids):
+            seg_limits = np.minimum.reduceat(zone_limits[graph.segment_zone], graph.segment_offsets[:-1], axis=0)
+        else:
+            seg_limits = np.empty((0, MINUTES_PER_WEEK), dtype=np.uint16)
+
+        # 3. Dedupe identical weeks (zones and segments together) into profiles
+        rows = np.concatenate([zone_limits, seg_limits])
+        seen: dict = {}
+        row_profile = np.array([seen.setdefault(r.tobytes(), len(seen)) for r in rows], dtype=np.int64)
+        first = {p: i for i, p in reversed(list(enumerate(row_profile.tolist())))}
+        profiles = rows[[first[p] for p in range(len(seen))]] if seen else rows
+        zone_profile, segment_profile = row_profile[:n_zones], row_profile[n_zones:]
+        self.zone_ids = graph.zone_ids
+        self.zone_profile = zone_profile.astype(np.int64)
+
+        # Bay → profile: its own zone (from the sensor feed) when known, else its segment's
+        # zones; -1 when neither is linked (restrictions unknown)
+        bay_profile = np.where(graph.bay_segment_code >= 0,
+                               segment_profile[np.maximum(graph.bay_segment_code, 0)] if len(segment_profile) else -1, -1)
+        if bay_zone is not None:
+            pos = lookup_sorted(graph.zone_ids, bay_zone)
+            bay_profile = np.where(pos >= 0, zone_profile[np.maximum(pos, 0)] if n_zones else -1, bay_profile)
+        self.bay_profile = bay_profile.astype(np.int64)
+
+        # 4. Tiers (distinct max-stay limits) and one packed weekly bitmap per profile × tier
+        self.tiers = np.unique(profiles[profiles != UNRESTRICTED]).astype(np.int64)
+        self.bitmaps = np.packbits(profiles[:, None, :] == self.tiers[None, :, None].astype(np.uint16), axis=-1)
+        self.n_profiles = len(profiles)
+
+        for arr in (self.bay_profile, self.zone_profile, self.tiers, self.bitmaps):
+            arr.flags.writeable = False
+
+    def legal_profiles(self, at_minute: int, stay_minutes: int) -> np.ndarray:
+        """Boolean per profile: may a general vehicle park from at_minute for stay_minutes?"""
+        ok = np.ones(self.n_profiles, dtype=bool)
+        idx = (at_minute + np.arange(stay_minutes)) % MINUTES_PER_WEEK
+        for t, limit in enumerate(self.tiers.tolist()):
+            if limit >= stay_minutes:
+                break
+            bits = (self.bitmaps[:, t, idx >> 3] >> (7 - (idx & 7))) & 1
+            # Violation: limit + 1 consecutive minutes under this tier inside the stay
+            run = limit + 1
+            counts = np.zeros((self.n_profiles, stay_minutes + 1), dtype=np.int32)
+            np.cumsum(bits, axis=1, out=counts[:, 1:])
+            ok &= ~((counts[:, run:] - counts[:, :-run]) == run).any(axis=1)
+        return ok
+
+    def zone_limits_at(self, zones: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+        """Max stay (minutes) in force per (Zone_Number, minute of week); UNRESTRICTED for unknown zones."""
+        pos = lookup_sorted(self.zone_ids, zones)
+        out = np.full(len(pos), UNRESTRICTED, dtype=np.int64)
+        known = np.flatnonzero(pos >= 0)
+        idx = np.asarray(minutes, dtype=np.int64)[known] % MINUTES_PER_WEEK
+        prof = self.zone_profile[pos[known]]
+        # A minute is under exactly one tier, or none (unrestricted)
+        for t in range(len(self.tiers)):
+            bit = (self.bitmaps[prof, t, idx >> 3] >> (7 - (idx & 7))) & 1
+            out[known[bit == 1]] = self.tiers[t]
+        return out
+
+    def legal_bays(self, bay_rows: np.ndarray, at: datetime, stay_minutes: int) -> np.ndarray:
+        """Boolean per bay row; bays with unknown restrictions are never reported legal."""
+        ok = self.legal_profiles(minute_of_week(at), stay_minutes)
+        prof = self.bay_profile[np.asarray(bay_rows, dtype=np.int64)]
+        return (prof >= 0) & ok[np.maximum(prof, 0)]
+
+    def descriptions_for_zones(self, zone_codes: np.ndarray) -> List[str]:
+        return [s for c in np.asarray(zone_codes).tolist() for s in self.zone_descriptions[c]]
@@ -0,0 +1,254 @@
+# app/parking/sensor_feed.py
+"""
+Live sensor snapshot store.
+
+The sensor table is held as an immutable ``SensorSnapshot`` (frame + derived index). A
+background thread polls the repository's change token for the sensor table (file mtime or
+newest database timestamp), ingests only rows whose ``Lastupdated`` moved past the current
+snapshot, builds the next snapshot off the request path and swaps it in
+with a single reference assignment. Request code grabs ``sensor_store.current()`` once and
+never observes a half-built frame or blocks on a reload.
+"""
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config.config import Config
+from app.memory import compact_frame
+from app.metrics import DATA_LOAD_SECONDS
+from app.repository import Repository, get_repository
+from app.parking.join_graph import SensorIndex, to_int_keys
+from app.parking.zone_imputation import IMPUTED_COLUMN, impute_sensor_zones
+
+
+@dataclass(frozen=True)
+class SensorSnapshot:
+    frame: pd.DataFrame
+    index: SensorIndex
+    version: int                 # newest Lastupdated (epoch seconds) – identical across workers
+    loaded_at: float             # wall clock of the swap
+    source_token: Any           # repository change token the frame was read at
+    updated_ts: np.ndarray       # per-row Lastupdated, epoch seconds (NaN if unparseable)
+    status_ts: np.ndarray        # per-row Status_Timestamp, epoch seconds
+    changed: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))  # rows changed vs previous
+
+    @property
+    def as_of(self) -> str:
+        """``version`` as ISO-8601 UTC: the sensor data time reported in (cacheable) responses."""
+        return datetime.fromtimestamp(self.version, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _epoch_seconds(values) -> np.ndarray:
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Parse each distinct timestamp once; code -1 (missing) picks the trailing NaN
+        parsed = np.append(_epoch_seconds(values.cat.categories.to_numpy(dtype=object)), np.nan)
+        return parsed[values.cat.codes.to_numpy()]
+    ts = pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+    out = ts.array.asi8.astype(np.float64) / 1e9
+    out[ts.isna().to_numpy()] = np.nan
+    return out
+
+
+def _build_snapshot(frame: pd.DataFrame, source_token: Any, changed: Optional[np.ndarray] = None) -> SensorSnapshot:
+    frame = frame.reset_index(drop=True)
+    if Config.ZONE_IMPUTE_ENABLED and "Zone_Number" in frame.columns:
+        frame = impute_sensor_zones(frame)
+    frame = compact_frame(frame)
+    updated_ts = _epoch_seconds(frame["Lastupdated"]) if "Lastupdated" in frame.columns else np.full(len(frame), np.nan)
+    status_ts = _epoch_seconds(frame["Status_Timestamp"]) if "Status_Timestamp" in frame.columns else np.full(len(frame), np.nan)
+    newest = np.nanmax(updated_ts) if np.isfinite(updated_ts).any() else time.time()
+    for arr in (updated_ts, status_ts):
+        arr.flags.writeable = False
+    return SensorSnapshot(
+        frame=frame,
+        index=SensorIndex(frame),
+        version=int(newest),
+        loaded_at=time.time(),
+        source_token=source_token,
+        updated_ts=updated_ts,
+        status_ts=status_ts,
+        changed=np.arange(len(frame), dtype=np.int64) if changed is None else changed,
+    )
+
+
+def _fit_column(frame: pd.DataFrame, col: str, values: np.ndarray) -> np.ndarray:
+    """
+    Make ``values`` assignable to the compacted column ``frame[col]``: new categories are
+    added, and numbers are cast to the narrow dtype, or the column is widened if they don't fit.
+    """
+    dtype = frame[col].dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        new = pd.Index(pd.unique(values)).dropna().difference(dtype.categories)
+        if len(new):
+            frame[col] = frame[col].cat.add_categories(new)
+    elif dtype.kind in "iuf" and values.dtype.kind in "iuf" and values.dtype != dtype:
+        cast = values.astype(dtype)
+        if np.array_equal(cast, values, equal_nan=dtype.kind == "f"):
+            return cast
+        frame[col] = frame[col].astype(np.result_type(dtype, values.dtype))
+    return values
+
+
+def merge_sensor_rows(prev: SensorSnapshot, incoming: pd.DataFrame, source_token: Any) -> Optional[SensorSnapshot]:
+    """
+    Upsert rows from a fresh read of the feed (or only its recent rows) into the previous snapshot.
+
+    Only rows updated after the previous snapshot's newest ``Lastupdated`` are considered, and
+    an existing bay is replaced only if its ``Status_Timestamp`` advanced. Returns None when
+    nothing changed.
+    """
+    incoming = incoming.reset_index(drop=True)
+    if not len(incoming):
+        return None
+    in_updated = _epoch_seconds(incoming["Lastupdated"])
+    fresh = np.flatnonzero(~(in_updated <= prev.version))  # NaN timestamps are treated as new
+    if not len(fresh):
+        return None
+
+    cand = incoming.iloc[fresh]
+    cand_status_ts = _epoch_seconds(cand["Status_Timestamp"])
+    rows = prev.index.by_kerbside.find(to_int_keys(cand["KerbsideID"]))
+
+    existing = rows >= 0
+    advanced = existing.copy()
+    advanced[existing] = ~(cand_status_ts[existing] <= prev.status_ts[rows[existing]])
+    added = ~existing
+    if not advanced.any() and not added.any():
+        return None
+
+    frame = prev.frame.copy()
+    cand = cand[frame.columns.intersection(cand.columns)]
+    if advanced.any():
+        # Column by column so numeric columns keep their dtype
+        for col in cand.columns:
+            values = _fit_column(frame, col, cand[col].to_numpy()[advanced])
+            frame.iloc[rows[advanced], frame.columns.get_loc(col)] = values
+        if IMPUTED_COLUMN in frame.columns:
+            # Replaced rows carry the feed's own zone again; _build_snapshot re-imputes if empty
+            frame.iloc[rows[advanced], frame.columns.get_loc(IMPUTED_COLUMN)] = False
+    changed = rows[advanced]
+    if added.any():
+        changed = np.concatenate([changed, np.arange(len(frame), len(frame) + int(added.sum()))])
+        frame = pd.concat([frame, cand[added]], ignore_index=True)
+        if IMPUTED_COLUMN in frame.columns:
+            frame[IMPUTED_COLUMN] = frame[IMPUTED_COLUMN].fillna(False).astype(bool)
+    return _build_snapshot(frame, source_token, changed=changed.astype(np.int64))
+
+
+class SensorStore:
+    def __init__(self, repo_fn: Callable[[], Repository] = get_repository):
+        self._repo_fn = repo_fn
+        self._snapshot: Optional[SensorSnapshot] = None
+        self._lock = threading.Lock()          # serialises loads/refreshes, never held by readers
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.last_error: Optional[str] = None
+        self.last_check: Optional[float] = None
+        self._listeners: List[Callable[[Optional[SensorSnapshot], SensorSnapshot], None]] = []
+
+    def add_listener(self, fn: Callable[[Optional[SensorSnapshot], SensorSnapshot], None]):
+        """Call ``fn(prev, nxt)`` after every swap made by refresh(), outside the store lock."""
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    def _notify(self, prev: Optional[SensorSnapshot], nxt: SensorSnapshot):
+        for fn in list(self._listeners):
+            try:
+                fn(prev, nxt)
+            except Exception as e:
+                print(f"[SensorFeed] listener failed: {e}")
+
+    def current(self) -> SensorSnapshot:
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        with self._lock:
+            if self._snapshot is None:
+                t0 = time.perf_counter()
+                repo = self._repo_fn()
+                token = repo.token("sensors")
+                self._snapshot = _build_snapshot(repo.sensors(), token)
+                DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="sensors", source="full")
+            return self._snapshot
+
+    def refresh(self) -> bool:
+        """Ingest changed rows if the source moved on; returns True when a new snapshot was swapped in."""
+        t0 = time.perf_counter()
+        with self._lock:
+            self.last_check = time.time()
+            repo = self._repo_fn()
+            token = repo.token("sensors")
+            prev = self._snapshot
+            if prev is None:
+                nxt = _build_snapshot(repo.sensors(), token)
+            elif token == prev.source_token:
+                return False
+            else:
+                # Databases return only rows past the snapshot's version; flat files return everything
+                nxt = merge_sensor_rows(prev, repo.sensors_since(prev.version), token)
+                if nxt is None:
+                    return False
+            self._snapshot = nxt  # atomic reference swap
+        DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="sensors", source="full" if prev is None else "incremental")
+        self._notify(prev, nxt)
+        return True
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[SensorFeed] refresh failed: {e}")
+
+    def start(self, interval: Optional[float] = None):
+        """Start the refresher thread (once per process; safe to call again after fork)."""
+        interval = Config.SENSOR_REFRESH_SECONDS if interval is None else interval
+        if interval <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        self._stop.clear()
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="sensor-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the refresher; with ``timeout``, also wait for a refresh in progress to finish."""
+        self._stop.set()
+        if timeout is not None and self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        now = time.time()
+        if snap is None:
+            return {"loaded": False, "last_error": self.last_error}
+        return {
+            "loaded": True,
+            "version": snap.version,
+            "rows": int(len(snap.frame)),
+            "changed_rows": int(len(snap.changed)),
+            "zones_imputed": int(np.count_nonzero(snap.index.zone_imputed)),
+            "loaded_at": datetime.fromtimestamp(snap.loaded_at, timezone.utc).isoformat(),
+            "snapshot_age_s": round(now - snap.loaded_at, 3),
+            "data_updated_at": datetime.fromtimestamp(snap.version, timezone.utc).isoformat(),
+            "data_age_s": round(now - snap.version, 3),
+            "refresh_interval_s": Config.SENSOR_REFRESH_SECONDS,
+            "refresher_running": bool(self._thread and self._thread.is_alive() and self._thread_pid == os.getpid()),
+            "last_check": datetime.fromtimestamp(self.last_check, timezone.utc).isoformat() if self.last_check else None,
+            "last_error": self.last_error,
+        }
+
+
+# Process-wide store shared by the parking routes
+sensor_store = SensorStore()
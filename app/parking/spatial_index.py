@@ -0,0 +1,165 @@
+# app/parking/spatial_index.py
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.utils import haversine_m_np
+from app.parking.join_graph import gather_ranges
+
+M_PER_DEG_LAT = math.pi / 180.0 * 6371000.0
+
+
+class BayGridIndex:
+    """
+    Grid bucket index over bay coordinates.
+
+    Points are projected onto a local equirectangular plane (metres) and bucketed into
+    square cells. Members of a cell are stored contiguously (CSR layout: sorted cell keys
+    + offsets into a permutation of row positions), so a radius query only touches the
+    cells overlapping the search circle instead of the whole table.
+    """
+
+    def __init__(self, lat, lon, cell_m: float = 100.0):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_m = float(cell_m)
+
+        rows = np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lon))
+        self.size = int(len(rows))
+
+        # Projection origin: the data centroid keeps the lon scale accurate city-wide
+        self.lat0 = float(self.lat[rows].mean()) if self.size else 0.0
+        self.lon0 = float(self.lon[rows].mean()) if self.size else 0.0
+        self.m_per_deg_lon = M_PER_DEG_LAT * math.cos(math.radians(self.lat0))
+
+        keys = self._cell_keys(self.lat[rows], self.lon[rows])
+        order = np.argsort(keys, kind="stable")
+        self.rows = rows[order]
+        self.cell_keys, starts = np.unique(keys[order], return_index=True)
+        self.offsets = np.append(starts, len(rows)).astype(np.int64)
+        # Occupied cell extent: queries never walk cells outside it
+        cx, cy = self._cell_xy(self.lat[rows], self.lon[rows])
+        self.cx_min, self.cx_max = (int(cx.min()), int(cx.max())) if self.size else (0, -1)
+        self.cy_min, self.cy_max = (int(cy.min()), int(cy.max())) if self.size else (0, -1)
+
+    # ---- internals ----
+    def _cell_xy(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        cx = np.floor((np.asarray(lon) - self.lon0) * self.m_per_deg_lon / self.cell_m).astype(np.int64)
+        cy = np.floor((np.asarray(lat) - self.lat0) * M_PER_DEG_LAT / self.cell_m).astype(np.int64)
+        return cx, cy
+
+    def _cell_keys(self, lat, lon) -> np.ndarray:
+        cx, cy = self._cell_xy(lat, lon)
+        # 2^31 offset keeps both halves non-negative so the key is monotonic in (cy, cx)
+        return ((cy + (1 << 31)) << 32) | (cx + (1 << 31))
+
+    def _box(self, lat: float, lon: float, radius_m: float) -> Tuple[int, int, int, int]:
+        """Cell range (cx_lo, cy_lo, cx_hi, cy_hi) of the circle's bounding box."""
+        # Degree extents use the query latitude (not lat0) so the box never under-covers
+        dlat = radius_m / M_PER_DEG_LAT
+        dlon = radius_m / (M_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        cx_lo, cy_lo = self._cell_xy(lat - dlat, lon - dlon)
+        cx_hi, cy_hi = self._cell_xy(lat + dlat, lon + dlon)
+        return int(cx_lo), int(cy_lo), int(cx_hi), int(cy_hi)
+
+    def _covers_all(self, lat: float, lon: float, radius_m: float) -> bool:
+        cx_lo, cy_lo, cx_hi, cy_hi = self._box(lat, lon, radius_m)
+        return cx_lo <= self.cx_min and cy_lo <= self.cy_min and cx_hi >= self.cx_max and cy_hi >= self.cy_max
+
+    def _candidates(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        """Row positions of every point in the cells overlapping the circle's bounding box."""
+        if not self.size:
+            return np.empty(0, dtype=np.int64)
+        cx_lo, cy_lo, cx_hi, cy_hi = self._box(lat, lon, radius_m)
+
+        cxs = np.arange(max(int(cx_lo), self.cx_min), min(int(cx_hi), self.cx_max) + 1, dtype=np.int64)
+        cys = np.arange(max(int(cy_lo), self.cy_min), min(int(cy_hi), self.cy_max) + 1, dtype=np.int64)
+        wanted = (((cys[:, None] + (1 << 31)) << 32) | (cxs[None, :] + (1 << 31))).ravel()
+
+        pos = np.searchsorted(self.cell_keys, wanted)
+        hit = pos < len(self.cell_keys)
+        hit[hit] = self.cell_keys[pos[hit]] == wanted[hit]
+        pos = pos[hit]
+        if not len(pos):
+            return np.empty(0, dtype=np.int64)
+        starts, ends = self.offsets[pos], self.offsets[pos + 1]
+        return np.concatenate([self.rows[s:e] for s, e in zip(starts, ends)])
+
+    # ---- queries ----
+    def query_radius(self, lat: float, lon: float, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row positions, distances in metres) of points within a true haversine radius,
+        sorted by distance.
+        """
+        cand = self._candidates(lat, lon, radius_m)
+        if not len(cand):
+            return cand, np.empty(0, dtype=np.float64)
+        dist = haversine_m_np(lat, lon, self.lat[cand], self.lon[cand])
+        keep = dist <= radius_m
+        cand, dist = cand[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return cand[order], dist[order]
+
+    def query_radius_many(self, lat, lon, radius_m) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Batched radius query (``radius_m`` scalar or one per query). Returns flat
+        (query position, row position, distance in metres) triples, sorted by query then
+        distance. Every query expands to the same block of neighbouring cells, so the whole
+        batch is a handful of array operations.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        radius = np.broadcast_to(np.asarray(radius_m, dtype=np.float64), lat.shape)
+        empty = np.empty(0, dtype=np.int64)
+        queries = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon) & (radius >= 0))
+        if not self.size or not len(queries):
+            return empty, empty, np.empty(0, dtype=np.float64)
+
+        cx, cy = self._cell_xy(lat[queries], lon[queries])
+        # Block size from the largest radius, with a 1% margin for the planar projection
+        reach = int(math.ceil(radius[queries].max() * 1.01 / self.cell_m))
+        steps = np.arange(-reach, reach + 1, dtype=np.int64)
+        dy, dx = (a.ravel() for a in np.meshgrid(steps, steps, indexing="ij"))
+        wanted = (((cy[:, None] + dy + (1 << 31)) << 32) | (cx[:, None] + dx + (1 << 31))).ravel()
+        owner = np.repeat(queries, len(dy))
+
+        pos = np.searchsorted(self.cell_keys, wanted)
+        hit = pos < len(self.cell_keys)
+        hit[hit] = self.cell_keys[pos[hit]] == wanted[hit]
+        owner, pos = owner[hit], pos[hit]
+        slots = gather_ranges(self.offsets, pos)
+        owner = np.repeat(owner, self.offsets[pos + 1] - self.offsets[pos])
+        rows = self.rows[slots]
+
+        dist = haversine_m_np(lat[owner], lon[owner], self.lat[rows], self.lon[rows])
+        keep = dist <= radius[owner]
+        owner, rows, dist = owner[keep], rows[keep], dist[keep]
+        order = np.lexsort((dist, owner))
+        return owner[order], rows[order], dist[order]
+
+    def query_knn(self, lat: float, lon: float, k: int, radius_m: float,
+                  mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest points within ``radius_m`` (only rows where ``mask`` is True, if given),
+        nearest first. The search box starts at one cell and doubles until it holds k hits
+        or covers every occupied cell, so a small k stays cheap however large the radius.
+        The top k are picked with a partial sort.
+        """
+        reach = self.cell_m
+        while True:
+            reach = min(reach, radius_m)
+            cand = self._candidates(lat, lon, reach)
+            if mask is not None:
+                cand = cand[mask[cand]]
+            dist = haversine_m_np(lat, lon, self.lat[cand], self.lon[cand])
+            keep = dist <= reach
+            cand, dist = cand[keep], dist[keep]
+            if len(cand) >= k or reach >= radius_m or self._covers_all(lat, lon, reach):
+                break
+            reach *= 2
+        if len(cand) > k:
+            top = np.argpartition(dist, k - 1)[:k]
+            cand, dist = cand[top], dist[top]
+        order = np.argsort(dist, kind="stable")
+        return cand[order], dist[order]
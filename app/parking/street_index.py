@@ -0,0 +1,205 @@
+# app/parking/street_index.py
+"""
+Offline street/segment name index for the CBD, built from the zone-link and bay datasets.
+
+Every street (OnStreet/StreetFrom/StreetTo) and every zone location label
+("Queen Street (Flinders Lane-Collins Street)") becomes an entry with a representative
+coordinate: the median of the bays on its road segments. Names are indexed by every word
+start in one sorted array, so "lons" finds "Little Lonsdale Street" with two binary
+searches. Prefixes with no exact hit fall back to a bounded edit-distance scan.
+"""
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.parking.join_graph import to_int_keys, lookup_sorted
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+ABBREVIATIONS = {
+    "st": "street", "rd": "road", "ave": "avenue", "av": "avenue", "pl": "place", "ln": "lane",
+    "pde": "parade", "tce": "terrace", "cres": "crescent", "hwy": "highway", "sq": "square",
+    "bvd": "boulevard", "blvd": "boulevard", "dr": "drive", "cl": "close", "ct": "court",
+}
+# Trailing locality tokens that do not help pick a CBD street
+_LOCALITY = {"melbourne", "vic", "victoria", "3000", "australia", "cbd", "au"}
+
+
+def normalise_name(text: str, expand_last: bool = True) -> str:
+    tokens = _SPACES.sub(" ", _NON_WORD.sub(" ", (text or "").lower())).strip().split(" ")
+    last = len(tokens) - 1
+    return " ".join(
+        ABBREVIATIONS.get(t, t) if (expand_last or i < last) else t for i, t in enumerate(tokens)
+    ).strip()
+
+
+def _within_distance(a: str, b: str, max_d: int) -> bool:
+    """Levenshtein(a, b) <= max_d, with early exit once a row exceeds the bound."""
+    if abs(len(a) - len(b)) > max_d:
+        return False
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+        if min(cur) > max_d:
+            return False
+        prev = cur
+    return prev[-1] <= max_d
+
+
+class StreetIndex:
+    def __init__(self, names: List[str], kinds: List[str], lat: np.ndarray, lon: np.ndarray, weight: np.ndarray):
+        self.names = names            # display names
+        self.kinds = kinds            # "street" or "segment"
+        self.is_segment = np.array([k == "segment" for k in kinds], dtype=np.int8)
+        self.lat = lat
+        self.lon = lon
+        self.weight = weight          # number of bays behind the coordinate (ranking)
+        self.norm = [normalise_name(n) for n in names]
+        self.by_norm = {n: i for i, n in enumerate(self.norm)}
+
+        # One key per word start: key = normalised name from that word onwards
+        keys, ids, word_pos = [], [], []
+        for i, n in enumerate(self.norm):
+            for w, m in enumerate(re.finditer(r"(?:^| )([^ ])", n)):
+                keys.append(n[m.start(1):])
+                ids.append(i)
+                word_pos.append(w)
+        order = np.argsort(np.array(keys, dtype=object).astype(str), kind="stable")
+        self.keys = np.array(keys, dtype=str)[order]
+        self.key_entry = np.array(ids, dtype=np.int64)[order]
+        self.key_word = np.array(word_pos, dtype=np.int64)[order]
+        for arr in (self.is_segment, self.lat, self.lon, self.weight, self.keys, self.key_entry, self.key_word):
+            arr.flags.writeable = False
+
+    @classmethod
+    def build(cls, zone_links_df: pd.DataFrame, bays_df: pd.DataFrame, zone_map: Dict[str, str]) -> "StreetIndex":
+        # Bay coordinates grouped by road segment (CSR over bays sorted by segment)
+        bay_seg = to_int_keys(bays_df["RoadSegmentID"])
+        bay_lat = bays_df["Latitude"].to_numpy(dtype=np.float64)
+        bay_lon = bays_df["Longitude"].to_numpy(dtype=np.float64)
+        ok = (bay_seg >= 0) & np.isfinite(bay_lat) & np.isfinite(bay_lon)
+        bay_seg, bay_lat, bay_lon = bay_seg[ok], bay_lat[ok], bay_lon[ok]
+        order = np.argsort(bay_seg, kind="stable")
+        seg_keys, starts = np.unique(bay_seg[order], return_index=True)
+        seg_offsets = np.append(starts, len(order))
+
+        def bays_for_segments(segments) -> np.ndarray:
+            pos = lookup_sorted(seg_keys, np.unique(to_int_keys(segments)))
+            pos = pos[pos >= 0]
+            if not len(pos):
+                return np.empty(0, dtype=np.int64)
+            return np.concatenate([order[seg_offsets[p]:seg_offsets[p + 1]] for p in pos])
+
+        links = zone_links_df.dropna(subset=["OnStreet"])
+        entries: List[Tuple[str, str, np.ndarray]] = []
+
+        # Streets: bays on segments where the street is OnStreet, else where it bounds a segment
+        on_street = links.groupby(links["OnStreet"].str.strip())["Segment_ID"].apply(list).to_dict()
+        crossing: Dict[str, List] = {}
+        for col in ("StreetFrom", "StreetTo"):
+            for name, segs in links.dropna(subset=[col]).groupby(links[col].str.strip())["Segment_ID"]:
+                crossing.setdefault(name, []).extend(segs.tolist())
+        for name in sorted(set(on_street) | set(crossing)):
+            rows = bays_for_segments(on_street.get(name, []))
+            if not len(rows):
+                rows = bays_for_segments(crossing.get(name, []))
+            entries.append((name, "street", rows))
+
+        # Zone location labels: bays on the segments linked to any zone with that label
+        zone_segments = links.groupby(to_int_keys(links["ParkingZone"]))["Segment_ID"].apply(list).to_dict()
+        label_segments: Dict[str, List] = {}
+        for zone, label in zone_map.items():
+            if str(zone).isdigit() and label:
+                label_segments.setdefault(label.strip(), []).extend(zone_segments.get(int(zone), []))
+        for label in sorted(label_segments):
+            entries.append((label, "segment", bays_for_segments(label_segments[label])))
+
+        entries = [(n, k, r) for n, k, r in entries if len(r)]
+        return cls(
+            [n for n, _, _ in entries],
+            [k for _, k, _ in entries],
+            np.array([np.median(bay_lat[r]) for _, _, r in entries], dtype=np.float64),
+            np.array([np.median(bay_lon[r]) for _, _, r in entries], dtype=np.float64),
+            np.array([len(r) for _, _, r in entries], dtype=np.int64),
+        )
+
+    # ------------------------------------
+    # Lookups
+    # ------------------------------------
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        lo = int(np.searchsorted(self.keys, prefix, side="left"))
+        hi = int(np.searchsorted(self.keys, prefix + "\uffff", side="left"))
+        return lo, hi
+
+    def _fuzzy_keys(self, prefix: str) -> np.ndarray:
+        """Key positions whose leading len(prefix) chars are within a small edit distance."""
+        max_d = 1 if len(prefix) < 7 else 2
+        lo, hi = self._prefix_range(prefix[0])  # typos in the first letter are rare; keeps the scan small
+        n = len(prefix)
+        # Compare against key prefixes one shorter/longer too, so insertions and deletions match;
+        # many keys share a prefix, so each distinct one is scored once
+        verdict: Dict[str, bool] = {}
+        hits = []
+        for k in range(lo, hi):
+            key = self.keys[k]
+            for m in (n, n - 1, n + 1):
+                head = key[:m]
+                ok = verdict.get(head)
+                if ok is None:
+                    ok = verdict[head] = _within_distance(prefix, head, max_d)
+                if ok:
+                    hits.append(k)
+                    break
+        return np.array(hits, dtype=np.int64)
+
+    def search(self, query: str, limit: int = 5, fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """Entries whose name (from any word on) starts with the query, best first."""
+        prefix = normalise_name(query, expand_last=False)
+        if len(prefix) < 2:
+            return []
+        lo, hi = self._prefix_range(prefix)
+        pos = np.arange(lo, hi, dtype=np.int64)
+        if not len(pos) and fuzzy and len(prefix) >= 4:
+            pos = self._fuzzy_keys(prefix)
+        if not len(pos):
+            return []
+
+        entry, word = self.key_entry[pos], self.key_word[pos]
+        # Rank: match at the name start, streets before segments, then by bay count
+        rank = np.lexsort((-self.weight[entry], self.is_segment[entry], word > 0))
+        out, seen = [], set()
+        for e in entry[rank].tolist():
+            if e in seen:
+                continue
+            seen.add(e)
+            out.append(self.entry(e))
+            if len(out) >= limit:
+                break
+        return out
+
+    def lookup(self, address: str) -> Optional[Dict[str, Any]]:
+        """
+        Exact street/segment match for a geocode query ("Queen St, Melbourne VIC").
+        Queries with a house number return None: the street's median coordinate is too coarse.
+        """
+        tokens = normalise_name(address).split(" ")
+        while tokens and tokens[-1] in _LOCALITY:
+            tokens.pop()
+        if not tokens or tokens[0][:1].isdigit():
+            return None
+        i = self.by_norm.get(" ".join(tokens))
+        return self.entry(i) if i is not None else None
+
+    def entry(self, i: int) -> Dict[str, Any]:
+        return {
+            "display_name": f"{self.names[i]}, Melbourne VIC",
+            "lat": float(self.lat[i]),
+            "lon": float(self.lon[i]),
+            "type": self.kinds[i],
+            "road": self.names[i].split(" (")[0],
+        }
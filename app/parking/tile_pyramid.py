@@ -0,0 +1,263 @@
+# app/parking/tile_pyramid.py
+"""
+Occupancy tiles for the map: a quadtree pyramid over bay positions in Web Mercator
+(slippy map) tile coordinates.
+
+Every bay gets a Morton (quadkey) code at TILE_MAX_ZOOM. Once the bays are sorted by
+that code, every tile at every zoom is a contiguous run of rows, and a tile's children
+at any deeper level are a contiguous run of nodes. The geometry (node keys, row
+offsets, centroids, bay counts) is built once from the bay table. Only the free and
+occupied counters depend on the sensor snapshot. A new snapshot updates them
+incrementally, in O(changed bays × levels).
+
+A tile request returns the nodes TILE_CLUSTER_DEPTH levels below it (at most
+4^depth clusters), and individual bays once zoomed in to TILE_BAYS_ZOOM.
+"""
+import math
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.config.config import Config
+from app.parking.join_graph import STATUS_PRESENT, STATUS_UNKNOWN, STATUS_UNOCCUPIED, gather_ranges
+from app.parking.live_updates import status_changes
+from app.parking.parking_utils import load_bays, load_join_graph
+
+_STATUS_LABEL = {STATUS_UNOCCUPIED: "Unoccupied", STATUS_PRESENT: "Present"}
+
+
+# ------------------------------------
+# Tile maths
+# ------------------------------------
+def mercator_xy(lat, lon):
+    """Web Mercator position in [0, 1) tile units at zoom 0."""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0
+    return np.clip(x, 0.0, np.nextafter(1.0, 0)), np.clip(y, 0.0, np.nextafter(1.0, 0))
+
+
+def tile_latlon(z: int, x: float, y: float):
+    """Lat/lon of a tile corner (fractional x/y give points inside the tile)."""
+    n = 2.0 ** z
+    lon = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, lon
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton(x, y) -> np.ndarray:
+    """Quadkey as an integer: x and y bits interleaved (y in the higher bit of each pair)."""
+    return (_spread_bits(np.asarray(x)) | (_spread_bits(np.asarray(y)) << np.uint64(1))).astype(np.int64)
+
+
+# ------------------------------------
+# Pyramid geometry (from the bay table, built once)
+# ------------------------------------
+@dataclass(frozen=True)
+class Level:
+    zoom: int
+    keys: np.ndarray       # sorted Morton codes of non-empty nodes at this zoom
+    offsets: np.ndarray    # CSR into TileGeometry.order; node i = order[offsets[i]:offsets[i+1]]
+    node_of: np.ndarray    # int32 node per bay row
+    lat: np.ndarray        # float32 centroid per node
+    lon: np.ndarray
+    bays: np.ndarray       # int32 bays per node
+
+
+class TileGeometry:
+    def __init__(self, lat, lon, max_zoom: int, min_zoom: int):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.max_zoom = int(max_zoom)
+        self.min_zoom = int(min_zoom)
+        self.size = len(lat)
+        self.lat, self.lon = lat, lon
+
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        self.mx, self.my = mercator_xy(lat[valid], lon[valid])
+        scale = float(1 << self.max_zoom)
+        codes = morton(np.floor(self.mx * scale).astype(np.int64), np.floor(self.my * scale).astype(np.int64))
+        sort = np.argsort(codes, kind="stable")
+        self.order = valid[sort]            # bay rows in quadkey order
+        self.codes = codes[sort]
+        self.mx, self.my = self.mx[sort], self.my[sort]
+
+        self.levels: Dict[int, Level] = {}
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            keys_z = self.codes >> (2 * (self.max_zoom - z))
+            keys, starts, inverse = np.unique(keys_z, return_index=True, return_inverse=True)
+            node_of = np.full(self.size, -1, dtype=np.int32)
+            node_of[self.order] = inverse.ravel()
+            counts = np.diff(np.append(starts, len(self.order)))
+            self.levels[z] = Level(
+                zoom=z,
+                keys=keys,
+                offsets=np.append(starts, len(self.order)).astype(np.int64),
+                node_of=node_of,
+                lat=(np.bincount(inverse.ravel(), weights=lat[self.order]) / counts).astype(np.float32),
+                lon=(np.bincount(inverse.ravel(), weights=lon[self.order]) / counts).astype(np.float32),
+                bays=counts.astype(np.int32),
+            )
+
+    def node_range(self, level: Level, z: int, x: int, y: int):
+        """Slice of ``level`` nodes under tile (z, x, y); z must not exceed level.zoom."""
+        shift = 2 * (level.zoom - z)
+        code = int(morton(np.array([x]), np.array([y]))[0])
+        lo, hi = np.searchsorted(level.keys, [code << shift, (code + 1) << shift])
+        return int(lo), int(hi)
+
+    def rows_in_tile(self, z: int, x: int, y: int) -> np.ndarray:
+        """Positions in ``order`` of the bays inside tile (z, x, y), at any zoom."""
+        anchor = min(z, self.max_zoom)
+        level = self.levels[max(anchor, self.min_zoom)]
+        lo, hi = self.node_range(level, anchor, x >> (z - anchor), y >> (z - anchor))
+        pos = np.arange(level.offsets[lo], level.offsets[hi])
+        if z > self.max_zoom:
+            n = float(1 << z)
+            pos = pos[(np.floor(self.mx[pos] * n) == x) & (np.floor(self.my[pos] * n) == y)]
+        return pos
+
+
+# ------------------------------------
+# Occupancy counters (per sensor snapshot)
+# ------------------------------------
+@dataclass(frozen=True)
+class TileCounts:
+    snapshot: Any                  # SensorSnapshot the counters reflect
+    bay_sensor: np.ndarray         # sensor row per bay row (-1 = no sensor)
+    sensor_order: np.ndarray       # argsort(bay_sensor): bays grouped by sensor row
+    status: np.ndarray             # int8 status per bay row (STATUS_UNKNOWN without a sensor)
+    free: Dict[int, np.ndarray]    # zoom → int32 free bays per node
+    occupied: Dict[int, np.ndarray]
+
+
+def build_counts(geometry: TileGeometry, bay_sensor: np.ndarray, snap) -> TileCounts:
+    status = np.full(geometry.size, STATUS_UNKNOWN, dtype=np.int8)
+    paired = bay_sensor >= 0
+    status[paired] = snap.index.status[bay_sensor[paired]]
+    free, occupied = {}, {}
+    for z, level in geometry.levels.items():
+        placed = level.node_of >= 0
+        nodes = len(level.keys)
+        free[z] = np.bincount(level.node_of[placed], weights=status[placed] == STATUS_UNOCCUPIED, minlength=nodes).astype(np.int32)
+        occupied[z] = np.bincount(level.node_of[placed], weights=status[placed] == STATUS_PRESENT, minlength=nodes).astype(np.int32)
+    return TileCounts(snap, bay_sensor, np.argsort(bay_sensor, kind="stable"), status, free, occupied)
+
+
+def update_counts(geometry: TileGeometry, counts: TileCounts, snap) -> TileCounts:
+    """
+    Counters for ``snap`` derived from ``counts``, which must have been built for the
+    snapshot directly before it with the same sensor rows. Only the bays whose sensor
+    changed status are touched.
+    """
+    bay_sensor, sensor_order = counts.bay_sensor, counts.sensor_order
+    changed = status_changes(counts.snapshot, snap)
+    # Bays paired with each changed sensor row: equal runs of the sorted pairing
+    bounds = np.empty(2 * len(changed), dtype=np.int64)
+    bounds[0::2] = np.searchsorted(bay_sensor, changed, sorter=sensor_order)
+    bounds[1::2] = np.searchsorted(bay_sensor, changed, side="right", sorter=sensor_order)
+    bays = sensor_order[gather_ranges(bounds, np.arange(0, len(bounds), 2))]
+
+    status = counts.status.copy()
+    old = status[bays]
+    new = snap.index.status[bay_sensor[bays]]
+    status[bays] = new
+    free, occupied = {}, {}
+    for z, level in geometry.levels.items():
+        free[z] = counts.free[z].copy()
+        occupied[z] = counts.occupied[z].copy()
+        if not len(bays):
+            continue
+        nodes = level.node_of[bays]
+        placed = nodes >= 0
+        nodes, o, n = nodes[placed], old[placed], new[placed]
+        np.add.at(free[z], nodes, (n == STATUS_UNOCCUPIED).astype(np.int32) - (o == STATUS_UNOCCUPIED))
+        np.add.at(occupied[z], nodes, (n == STATUS_PRESENT).astype(np.int32) - (o == STATUS_PRESENT))
+    return TileCounts(snap, bay_sensor, sensor_order, status, free, occupied)
+
+
+@lru_cache(maxsize=1)
+def load_tile_geometry() -> TileGeometry:
+    bays_df = load_bays()
+    return TileGeometry(bays_df["Latitude"].to_numpy(), bays_df["Longitude"].to_numpy(),
+                        max_zoom=Config.TILE_MAX_ZOOM, min_zoom=Config.TILE_MIN_ZOOM)
+
+
+class TileStore:
+    """Tile counters for the current sensor snapshot, kept in step by a SensorStore listener."""
+
+    def __init__(self):
+        self._counts: Optional[TileCounts] = None
+        self._lock = threading.Lock()
+        self.incremental_updates = 0
+        self.rebuilds = 0
+
+    def current(self, snap) -> TileCounts:
+        counts = self._counts
+        if counts is not None and counts.snapshot is snap:
+            return counts
+        with self._lock:
+            if self._counts is None or self._counts.snapshot is not snap:
+                bay_sensor = snap.index.by_kerbside.find(load_join_graph().bay_kerbside)
+                self._counts = build_counts(load_tile_geometry(), bay_sensor, snap)
+                self.rebuilds += 1
+            return self._counts
+
+    def on_snapshot(self, prev, nxt):
+        """SensorStore listener: step built counters forward; new sensor rows mean a rebuild on next use."""
+        with self._lock:
+            counts = self._counts
+            if counts is None or counts.snapshot is not prev or len(prev.frame) != len(nxt.frame):
+                return
+            self._counts = update_counts(load_tile_geometry(), counts, nxt)
+            self.incremental_updates += 1
+
+
+# ------------------------------------
+# Tile payloads
+# ------------------------------------
+def tile_payload(z: int, x: int, y: int, snap) -> Dict[str, Any]:
+    geometry = load_tile_geometry()
+    counts = tile_store.current(snap)
+    out: Dict[str, Any] = {"z": z, "x": x, "y": y, "version": snap.version}
+
+    if z >= Config.TILE_BAYS_ZOOM:
+        pos = geometry.rows_in_tile(z, x, y)
+        rows = geometry.order[pos]
+        kerbside = load_join_graph().bay_kerbside[rows]
+        out.update(kind="bays", fields=["kerbside_id", "lat", "lon", "status"], rows=[
+            [str(k) if k >= 0 else None, round(a, 6), round(b, 6), _STATUS_LABEL.get(s, "Unknown")]
+            for k, a, b, s in zip(kerbside.tolist(), geometry.lat[rows].tolist(), geometry.lon[rows].tolist(),
+                                  counts.status[rows].tolist())
+        ])
+        return out
+
+    zoom = min(max(z + Config.TILE_CLUSTER_DEPTH, geometry.min_zoom), geometry.max_zoom)
+    level = geometry.levels[zoom]
+    if z > zoom:
+        # Deeper than the pyramid (only when TILE_BAYS_ZOOM > TILE_MAX_ZOOM): the enclosing leaf node
+        lo, hi = geometry.node_range(level, zoom, x >> (z - zoom), y >> (z - zoom))
+    else:
+        lo, hi = geometry.node_range(level, z, x, y)
+    free, occupied = counts.free[zoom][lo:hi], counts.occupied[zoom][lo:hi]
+    out.update(kind="clusters", level=zoom, fields=["lat", "lon", "bays", "free", "occupied"], rows=[
+        [round(a, 6), round(b, 6), n, f, o]
+        for a, b, n, f, o in zip(level.lat[lo:hi].astype(np.float64).tolist(), level.lon[lo:hi].astype(np.float64).tolist(),
+                                 level.bays[lo:hi].tolist(), free.tolist(), occupied.tolist())
+    ])
+    return out
+
+
+# Process-wide counters shared by the tile route
+tile_store = TileStore()
@@ -0,0 +1,335 @@
+# app/parking/turnover.py
+"""
+Turnover, dwell-time and overstay analytics over the sensor status history.
+
+``history_store`` hands each batch of new status events to ``turnover_store.on_batch``.
+Each event comes paired with the status it ends (``Transitions`` in app/parking/history.py).
+
+- a stay is a Present status ended by the bay's next event. Its dwell time goes into a
+  log-bucket histogram per bay and per zone: DWELL_BUCKETS_PER_DOUBLING buckets for each
+  doubling from one minute to a week, so a quantile read back is within about 9%
+- an arrival is a change to Present. Arrivals are counted per zone, day type and local
+  hour. /turnover divides them by the observed bay-hours of the hourly profiles
+- a stay is an overstay when the zone's sign plates set a time limit at arrival, the
+  car stayed longer, and the same limit still applied when its time ran out. Loading
+  zones and permit-only plates (no general parking) are not judged
+
+Stays longer than HISTORY_MAX_INTERVAL_SECONDS are counted as discarded rather than
+measured, like the gaps the hourly profiles skip. Memory is one histogram and a row of
+counters per bay and per zone, however long the history grows. The totals are
+checkpointed next to the history's. When they don't match it (first start, or after
+``flask history rebuild``), they are replayed once from the event log.
+"""
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.config.config import Config
+from app.metrics import DATA_LOAD_SECONDS
+from app.parking.history import (DAY_TYPES, HistoryState, HistoryStore, Transitions, history_store, hour_slots,
+                                 local_seconds, new_events, read_log, transitions)
+from app.parking.join_graph import STATUS_PRESENT, STATUS_UNOCCUPIED, lookup_sorted
+from app.parking.restrictions import MINUTES_PER_DAY, MINUTES_PER_WEEK, UNRESTRICTED
+
+DWELL_BUCKETS_PER_DOUBLING = 4
+# Bucket 0 is under a minute; the last one is open-ended (a week and over)
+DWELL_BUCKETS = DWELL_BUCKETS_PER_DOUBLING * int(np.ceil(np.log2(MINUTES_PER_WEEK))) + 2
+QUANTILES = (0.5, 0.9, 0.99)
+# Per bay and per zone counters, in column order
+COUNTERS = ("stays", "timed_stays", "overstays", "discarded_stays", "arrivals", "dwell_s", "observed_s")
+_COL = {name: i for i, name in enumerate(COUNTERS)}
+_SLOTS = len(DAY_TYPES) * 24
+
+
+# ------------------------------------
+# Dwell histograms
+# ------------------------------------
+def dwell_bucket(minutes: np.ndarray) -> np.ndarray:
+    minutes = np.asarray(minutes, dtype=np.float64)
+    b = np.floor(np.log2(np.maximum(minutes, 1.0)) * DWELL_BUCKETS_PER_DOUBLING).astype(np.int64) + 1
+    return np.where(minutes < 1.0, 0, np.minimum(b, DWELL_BUCKETS - 1))
+
+def bucket_minutes(bucket: np.ndarray) -> np.ndarray:
+    """Representative dwell of a bucket: its geometric midpoint (30 s for bucket 0)."""
+    bucket = np.asarray(bucket, dtype=np.float64)
+    return np.where(bucket == 0, 0.5, 2.0 ** ((bucket - 0.5) / DWELL_BUCKETS_PER_DOUBLING))
+
+def dwell_quantiles(counts: np.ndarray, qs: Sequence[float] = QUANTILES) -> Dict[str, Optional[float]]:
+    cum = np.cumsum(counts)
+    n = int(cum[-1]) if len(cum) else 0
+    out: Dict[str, Optional[float]] = {}
+    for q in qs:
+        key = f"p{round(q * 100):d}"
+        if not n:
+            out[key] = None
+            continue
+        b = int(np.searchsorted(cum, max(np.ceil(q * n), 1), side="left"))
+        out[key] = round(float(bucket_minutes(b)), 1)
+    return out
+
+
+# ------------------------------------
+# Totals
+# ------------------------------------
+@dataclass(frozen=True)
+class TurnoverState:
+    """Immutable per-zone and per-bay totals; replaced as a whole on every batch."""
+    zone_keys: np.ndarray      # sorted int64 Zone_Number
+    zone_dwell: np.ndarray     # (zones, DWELL_BUCKETS) int64 stays per dwell bucket
+    zone_arrivals: np.ndarray  # (zones, 72) int64 arrivals per day type × hour
+    zone_totals: np.ndarray    # (zones, len(COUNTERS)) float64
+    bay_keys: np.ndarray       # sorted int64 KerbsideID
+    bay_zone: np.ndarray       # zone of the bay's latest event
+    bay_dwell: np.ndarray      # (bays, DWELL_BUCKETS) int32
+    bay_totals: np.ndarray     # (bays, len(COUNTERS)) float64
+    total_events: int = 0      # history events folded in
+
+    @classmethod
+    def empty(cls) -> "TurnoverState":
+        k = len(COUNTERS)
+        return cls(np.empty(0, np.int64), np.zeros((0, DWELL_BUCKETS), np.int64), np.zeros((0, _SLOTS), np.int64),
+                   np.zeros((0, k)), np.empty(0, np.int64), np.empty(0, np.int64),
+                   np.zeros((0, DWELL_BUCKETS), np.int32), np.zeros((0, k)))
+
+
+def _grown(keys: np.ndarray, new_keys: np.ndarray, *arrays: np.ndarray):
+    """Union of ``keys`` and ``new_keys``, with each array's rows moved to the new positions."""
+    union = np.union1d(keys, new_keys)
+    rows = lookup_sorted(union, keys)
+    out = []
+    for a in arrays:
+        grown = np.zeros((len(union),) + a.shape[1:], dtype=a.dtype)
+        grown[rows] = a
+        out.append(grown)
+    return union, out
+
+
+def _minute_of_week(ts: np.ndarray) -> np.ndarray:
+    minutes = np.floor(local_seconds(ts) / 60).astype(np.int64)
+    # 1970-01-01 was a Thursday (weekday 3)
+    return ((minutes // MINUTES_PER_DAY + 3) % 7) * MINUTES_PER_DAY + minutes % MINUTES_PER_DAY
+
+
+def overstays(zone: np.ndarray, start: np.ndarray, dwell_s: np.ndarray, engine) -> np.ndarray:
+    """(timed, overstayed) per stay: a time limit applied at arrival, and the stay broke it."""
+    arrive = _minute_of_week(start)
+    limit = engine.zone_limits_at(zone, arrive)
+    timed = (limit > 0) & (limit < UNRESTRICTED)
+    over = np.zeros(len(zone), dtype=bool)
+    late = np.flatnonzero(timed & (dwell_s > limit * 60))
+    if len(late):
+        # Still under the same limit when the time ran out (not a stay that outlasted the restriction)
+        over[late] = engine.zone_limits_at(zone[late], arrive[late] + limit[late]) == limit[late]
+    return np.stack([timed, over])
+
+
+def fold_turnover(state: TurnoverState, batch: Transitions, engine) -> TurnoverState:
+    """Add a history batch to the totals."""
+    known = np.isfinite(batch.prev_ts) & np.isin(batch.prev_status, (STATUS_PRESENT, STATUS_UNOCCUPIED))
+    length = np.where(known, batch.ts - batch.prev_ts, 0.0)
+    stay = known & (batch.prev_status == STATUS_PRESENT)
+    measured = stay & (length <= Config.HISTORY_MAX_INTERVAL_SECONDS)
+    arrival = known & (batch.status == STATUS_PRESENT) & (batch.prev_status != STATUS_PRESENT)
+
+    m = np.flatnonzero(measured)
+    timed, over = overstays(batch.prev_zone[m], batch.prev_ts[m], length[m], engine) if len(m) else \
+        (np.zeros(0, bool), np.zeros(0, bool))
+    values = np.zeros((len(batch.ts), len(COUNTERS)))
+    values[m, _COL["stays"]] = 1
+    values[m, _COL["timed_stays"]] = timed
+    values[m, _COL["overstays"]] = over
+    values[m, _COL["dwell_s"]] = length[m]
+    values[stay & ~measured, _COL["discarded_stays"]] = 1
+    values[arrival, _COL["arrivals"]] = 1
+    values[:, _COL["observed_s"]] = np.minimum(length, Config.HISTORY_MAX_INTERVAL_SECONDS)
+    buckets = dwell_bucket(length[m] / 60)
+
+    # A stay or gap belongs to the zone the bay was in when it began; an arrival to its new zone
+    zone_of = np.where(known, batch.prev_zone, batch.zone)
+    zoned = zone_of >= 0
+    zone_keys, (zone_dwell, zone_arrivals, zone_totals) = _grown(
+        state.zone_keys, np.concatenate([zone_of[zoned], batch.zone[arrival & (batch.zone >= 0)]]),
+        state.zone_dwell, state.zone_arrivals, state.zone_totals)
+    zpos = lookup_sorted(zone_keys, zone_of)
+    # Arrivals go to the arrival's zone, by the hour it happened
+    values_zone = values.copy()
+    values_zone[:, _COL["arrivals"]] = 0
+    np.add.at(zone_totals, zpos[zoned], values_zone[zoned])
+    mz = m[zoned[m]]
+    np.add.at(zone_dwell, (zpos[mz], dwell_bucket(length[mz] / 60)), 1)
+    a = np.flatnonzero(arrival & (batch.zone >= 0))
+    apos = lookup_sorted(zone_keys, batch.zone[a])
+    day_type, hour = hour_slots(local_seconds(batch.ts[a]))
+    np.add.at(zone_arrivals, (apos, day_type * 24 + hour), 1)
+    np.add.at(zone_totals[:, _COL["arrivals"]], apos, 1)
+
+    bay_keys, (bay_zone, bay_dwell, bay_totals) = _grown(
+        state.bay_keys, batch.kerbside, state.bay_zone, state.bay_dwell, state.bay_totals)
+    bpos = lookup_sorted(bay_keys, batch.kerbside)
+    np.add.at(bay_totals, bpos, values)
+    np.add.at(bay_dwell, (bpos[m], buckets), 1)
+    # Events are sorted by (bay, time): the last one per bay carries its current zone
+    fresh = ~np.isin(bay_keys, state.bay_keys)
+    bay_zone[fresh] = -1
+    bay_zone[bpos] = batch.zone
+    return TurnoverState(zone_keys, zone_dwell, zone_arrivals, zone_totals, bay_keys, bay_zone, bay_dwell,
+                         bay_totals, batch.total_events)
+
+
+# ------------------------------------
+# Store
+# ------------------------------------
+def _summary(totals: np.ndarray, dwell: np.ndarray) -> Dict[str, Any]:
+    t = dict(zip(COUNTERS, totals.tolist()))
+    stays, timed = int(t["stays"]), int(t["timed_stays"])
+    observed_h = t["observed_s"] / 3600
+    return {
+        "stays": stays,
+        "dwell_minutes": {"mean": round(t["dwell_s"] / stays / 60, 1) if stays else None, **dwell_quantiles(dwell)},
+        "arrivals": int(t["arrivals"]),
+        "observed_bay_hours": round(observed_h, 2),
+        "turnover_per_bay_hour": round(t["arrivals"] / observed_h, 4) if observed_h else None,
+        "timed_stays": timed,
+        "overstays": int(t["overstays"]),
+        "overstay_share": round(t["overstays"] / timed, 4) if timed else None,
+        "discarded_stays": int(t["discarded_stays"]),
+    }
+
+
+class TurnoverStore:
+    def __init__(self, history: HistoryStore = history_store):
+        self._history = history
+        self._state: Optional[TurnoverState] = None
+        self._lock = threading.Lock()
+        self.last_error: Optional[str] = None
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self._history.root, "turnover.npz")
+
+    def _engine(self):
+        from app.parking.parking_utils import load_restriction_engine
+        return load_restriction_engine()
+
+    def _save(self, state: TurnoverState):
+        tmp = self._path + ".tmp.npz"
+        meta = json.dumps({"total_events": state.total_events, "buckets": DWELL_BUCKETS, "counters": COUNTERS,
+                           "max_interval_s": Config.HISTORY_MAX_INTERVAL_SECONDS, "timezone": Config.HISTORY_TIMEZONE})
+        np.savez(tmp, **{k: getattr(state, k) for k in ("zone_keys", "zone_dwell", "zone_arrivals", "zone_totals",
+                                                        "bay_keys", "bay_zone", "bay_dwell", "bay_totals")}, meta=meta)
+        os.replace(tmp, self._path)
+
+    def _load(self, total_events: int) -> Optional[TurnoverState]:
+        try:
+            with np.load(self._path) as z:
+                meta = json.loads(str(z["meta"]))
+                if meta != {"total_events": total_events, "buckets": DWELL_BUCKETS, "counters": list(COUNTERS),
+                            "max_interval_s": Config.HISTORY_MAX_INTERVAL_SECONDS, "timezone": Config.HISTORY_TIMEZONE}:
+                    return None
+                return TurnoverState(*(z[k] for k in ("zone_keys", "zone_dwell", "zone_arrivals", "zone_totals",
+                                                      "bay_keys", "bay_zone", "bay_dwell", "bay_totals")),
+                                     total_events=total_events)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def replay(self) -> TurnoverState:
+        """Recompute the totals from the history's event log in one pass."""
+        t0 = time.perf_counter()
+        log = read_log(self._history.root)
+        empty = HistoryState.empty()
+        rows = new_events(empty, log["kerbside"], log["zone"], log["status"], log["ts"])
+        batch = transitions(empty, *(log[k][rows] for k in ("kerbside", "zone", "status", "ts")))
+        state = fold_turnover(TurnoverState.empty(), batch, self._engine())
+        DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="turnover", source="rebuild")
+        return state
+
+    def _current_locked(self) -> TurnoverState:
+        if self._state is None:
+            t0 = time.perf_counter()
+            total = self._history.current().total_events
+            state = self._load(total)
+            if state is None:
+                state = self.replay()
+                if self._history.is_writer():
+                    self._save(state)
+            else:
+                DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset="turnover", source="checkpoint")
+            self._state = state
+        return self._state
+
+    def current(self) -> TurnoverState:
+        state = self._state
+        if state is not None:
+            return state
+        self._history.current()  # outside our lock: on_batch holds the history lock while it waits for ours
+        with self._lock:
+            return self._current_locked()
+
+    def on_batch(self, batch: Transitions):
+        """HistoryStore listener: fold one batch of events (a batch already replayed from the log is skipped)."""
+        with self._lock:
+            try:
+                state = self._current_locked()
+                if state.total_events >= batch.total_events:
+                    return
+                nxt = fold_turnover(state, batch, self._engine())
+                if self._history.is_writer():
+                    self._save(nxt)
+                self._state = nxt  # atomic reference swap
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+
+    # ------------------------------------
+    # Queries
+    # ------------------------------------
+    def zone_summary(self, zone: int, day_type: int, bays: int) -> Dict[str, Any]:
+        """Dwell, turnover and overstays for one zone, with arrivals per hour on one day type."""
+        state = self.current()
+        pos = lookup_sorted(state.zone_keys, [zone])[0]
+        cols = slice(day_type * 24, (day_type + 1) * 24)
+        if pos >= 0:
+            totals, dwell, arrivals = state.zone_totals[pos], state.zone_dwell[pos], state.zone_arrivals[pos, cols]
+        else:
+            totals, dwell, arrivals = np.zeros(len(COUNTERS)), np.zeros(DWELL_BUCKETS, np.int64), np.zeros(24, np.int64)
+        history = self._history.current()
+        hpos = lookup_sorted(history.zone_keys, [zone])[0]
+        observed = history.observed_s[hpos, cols] / 3600 if hpos >= 0 else np.zeros(24)
+        return {
+            "zone_number": zone,
+            "bays": bays,
+            **_summary(totals, dwell),
+            "day_type": DAY_TYPES[day_type],
+            "hours": [{"hour": h, "arrivals": int(n), "turnover_per_bay_hour": round(n / obs, 4) if obs else None}
+                      for h, (n, obs) in enumerate(zip(arrivals.tolist(), observed.tolist()))],
+        }
+
+    def bay_summary(self, kerbside: int) -> Optional[Dict[str, Any]]:
+        """Dwell, turnover and overstays for one bay; None if it has no events."""
+        state = self.current()
+        pos = lookup_sorted(state.bay_keys, [kerbside])[0]
+        if pos < 0:
+            return None
+        zone = int(state.bay_zone[pos])
+        return {"kerbside_id": kerbside, "zone_number": zone if zone >= 0 else None,
+                **_summary(state.bay_totals[pos], state.bay_dwell[pos])}
+
+    def status(self) -> Dict[str, Any]:
+        state = self._state
+        if state is None:
+            return {"loaded": False, "last_error": self.last_error}
+        totals = state.zone_totals.sum(axis=0) if len(state.zone_totals) else np.zeros(len(COUNTERS))
+        return {"loaded": True, "events": state.total_events, "zones": int(len(state.zone_keys)),
+                "bays": int(len(state.bay_keys)), **{k: int(v) for k, v in zip(COUNTERS, totals.tolist())
+                                                      if k in ("stays", "overstays", "arrivals")},
+                "last_error": self.last_error}
+
+
+# Process-wide store, fed by history_store
+turnover_store = TurnoverStore()
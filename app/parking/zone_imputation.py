@@ -0,0 +1,169 @@
+# app/parking/zone_imputation.py
+"""
+Zone imputation for sensor rows with an empty ``Zone_Number``.
+
+This replaces the ``infer_zone_by_neighbors`` SQL function in data/schema.sql, which cross
+joins every unzoned bay against every zoned bay. Here the zoned rows go into a grid index,
+and the unzoned rows are answered by batched, ring-expanding k-nearest queries. The k
+nearest neighbours then vote for a zone, each vote weighted by 1 / distance. The cost is
+roughly linear in the number of rows.
+
+Imputed rows are flagged (``Zone_Imputed``), so the API can report them and the
+restriction engine can ignore them.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import click
+import numpy as np
+import pandas as pd
+from flask.cli import AppGroup
+
+from app.config.config import Config
+from app.parking.join_graph import to_int_keys
+from app.parking.spatial_index import BayGridIndex, M_PER_DEG_LAT
+
+IMPUTED_COLUMN = "Zone_Imputed"
+
+
+@dataclass(frozen=True)
+class ZoneImputation:
+    zone: np.ndarray         # int64 per row: source zone, imputed zone, or -1
+    imputed: np.ndarray      # bool per row
+    confidence: np.ndarray   # winning share of the vote weight (NaN where not imputed)
+    distance_m: np.ndarray   # distance to the nearest voter (NaN where not imputed)
+
+
+def _k_nearest(lat_ref: np.ndarray, lon_ref: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+               radius_m: float, k: int, batch: int = 512):
+    """
+    (query, ref row, distance) for the k nearest reference points of each query within
+    ``radius_m``. Cells are sized to hold about k points each. Every query first searches a
+    small ring of cells, and only queries with fewer than k hits widen it, up to the radius.
+    Work per query therefore stays roughly constant however dense the data gets. Queries go
+    in batches, so candidate pairs never have to fit in memory all at once.
+    """
+    probe = BayGridIndex(lat_ref, lon_ref, cell_m=radius_m)
+    spans = [np.ptp((lat_ref - probe.lat0) * M_PER_DEG_LAT), np.ptp((lon_ref - probe.lon0) * probe.m_per_deg_lon)]
+    cell_m = float(np.clip(np.sqrt(k * max(spans[0] * spans[1], 1.0) / len(lat_ref)), 10.0, radius_m))
+    grid = probe if cell_m == radius_m else BayGridIndex(lat_ref, lon_ref, cell_m=cell_m)
+
+    out = []
+    for lo in range(0, len(lat), batch):
+        pending = np.arange(lo, min(lo + batch, len(lat)))
+        reach = cell_m
+        while len(pending):
+            reach = min(reach, radius_m)
+            query, rows, dist = grid.query_radius_many(lat[pending], lon[pending], reach)
+            query = pending[query]
+            # Pairs arrive sorted by query, then distance: rank within each run
+            starts = np.flatnonzero(np.r_[True, query[1:] != query[:-1]]) if len(query) else query
+            rank = np.arange(len(query)) - np.repeat(starts, np.diff(np.r_[starts, len(query)]))
+            # Exact once k points lie within the searched radius, or the radius is the cap
+            done = np.isin(pending, query[rank == k - 1]) if reach < radius_m else np.ones(len(pending), dtype=bool)
+            keep = (rank < k) & np.isin(query, pending[done])
+            out.append((query[keep], rows[keep], dist[keep]))
+            pending = pending[~done]
+            reach *= 2
+    return tuple(np.concatenate(parts) for parts in zip(*out))
+
+
+def impute_zones(lat, lon, zone, k: int = 5, radius_m: float = 200.0) -> ZoneImputation:
+    """
+    Fill zone == -1 from the k nearest zoned points within ``radius_m``, each voting with
+    weight 1 / distance. Ties go to the zone with the nearest voter. Rows with no zoned
+    neighbour in range stay at -1.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    zone = np.asarray(zone, dtype=np.int64).copy()
+    n = len(zone)
+    imputed = np.zeros(n, dtype=bool)
+    confidence = np.full(n, np.nan)
+    distance = np.full(n, np.nan)
+
+    known = np.flatnonzero(zone >= 0)
+    missing = np.flatnonzero(zone < 0)
+    if not len(known) or not len(missing):
+        return ZoneImputation(zone, imputed, confidence, distance)
+
+    query, rows, dist = _k_nearest(lat[known], lon[known], lat[missing], lon[missing], radius_m, k)
+    if not len(query):
+        return ZoneImputation(zone, imputed, confidence, distance)
+    voter_zone = zone[known[rows]]
+    weight = 1.0 / np.maximum(dist, 1.0)
+
+    # Sum weights per (query, zone); pick the heaviest zone per query, nearest voter breaks ties
+    pair, pair_of = np.unique(np.stack([query, voter_zone], axis=1), axis=0, return_inverse=True)
+    pair_of = pair_of.ravel()
+    pair_weight = np.bincount(pair_of, weights=weight)
+    pair_nearest = np.full(len(pair), np.inf)
+    np.minimum.at(pair_nearest, pair_of, dist)
+    order = np.lexsort((pair_nearest, -pair_weight, pair[:, 0]))
+    first = order[np.r_[True, pair[order[1:], 0] != pair[order[:-1], 0]]]
+
+    q_total = np.bincount(query, weights=weight, minlength=len(missing))
+    target = missing[pair[first, 0]]
+    zone[target] = pair[first, 1]
+    imputed[target] = True
+    confidence[target] = np.round(pair_weight[first] / q_total[pair[first, 0]], 3)
+    distance[target] = np.round(pair_nearest[first], 1)
+    return ZoneImputation(zone, imputed, confidence, distance)
+
+
+def impute_sensor_zones(frame: pd.DataFrame, k: Optional[int] = None,
+                        radius_m: Optional[float] = None) -> pd.DataFrame:
+    """
+    Copy of the sensor frame with empty ``Zone_Number`` values filled in and a boolean
+    ``Zone_Imputed`` column. Rows flagged as imputed by an earlier pass are imputed again,
+    so zones follow the current neighbours.
+    """
+    k = Config.ZONE_IMPUTE_K if k is None else k
+    radius_m = Config.ZONE_IMPUTE_RADIUS_M if radius_m is None else radius_m
+    zone = to_int_keys(frame["Zone_Number"])
+    if IMPUTED_COLUMN in frame.columns:
+        zone[frame[IMPUTED_COLUMN].fillna(False).to_numpy(dtype=bool)] = -1
+    result = impute_zones(frame["Latitude"], frame["Longitude"], zone, k, radius_m)
+
+    out = frame.copy()
+    source = zone >= 0
+    # Keep the source's own values (and dtype) for zoned rows; -1 → NaN for rows still unknown
+    filled = np.where(result.zone >= 0, result.zone, np.nan)
+    out["Zone_Number"] = np.where(source, pd.to_numeric(frame["Zone_Number"], errors="coerce"), filled)
+    out[IMPUTED_COLUMN] = result.imputed
+    return out
+
+
+# ------------------------------------
+# CLI: flask zones impute
+# ------------------------------------
+zones_cli = AppGroup("zones", help="Parking zone utilities.")
+
+@zones_cli.command("impute")
+@click.option("--k", "k", type=int, default=None, help="Neighbours per vote (default ZONE_IMPUTE_K).")
+@click.option("--radius", "radius_m", type=float, default=None, help="Search radius in metres (default ZONE_IMPUTE_RADIUS_M).")
+@click.option("--output", type=click.Path(dir_okay=False), default=None, help="Write imputed rows to this CSV.")
+def impute_command(k: Optional[int], radius_m: Optional[float], output: Optional[str]):
+    """Impute missing sensor zones and print a summary."""
+    from app.repository import get_repository
+
+    k = Config.ZONE_IMPUTE_K if k is None else k
+    radius_m = Config.ZONE_IMPUTE_RADIUS_M if radius_m is None else radius_m
+    frame = get_repository().sensors().reset_index(drop=True)
+    zone = to_int_keys(frame["Zone_Number"])
+    result = impute_zones(frame["Latitude"], frame["Longitude"], zone, k, radius_m)
+
+    rows = np.flatnonzero(result.imputed)
+    click.echo(f"rows: {len(frame)}  missing zone: {int(np.count_nonzero(zone < 0))}  "
+               f"imputed: {len(rows)}  still missing: {int(np.count_nonzero(result.zone < 0))}")
+    if len(rows):
+        click.echo(f"median confidence: {np.median(result.confidence[rows]):.3f}  "
+                   f"median nearest voter: {np.median(result.distance_m[rows]):.1f} m")
+    if output:
+        pd.DataFrame({
+            "KerbsideID": frame["KerbsideID"].to_numpy()[rows],
+            "Zone_Number": result.zone[rows],
+            "confidence": result.confidence[rows],
+            "nearest_m": result.distance_m[rows],
+        }).to_csv(output, index=False)
+        click.echo(f"wrote {output}")
@@ -0,0 +1,436 @@
+# app/repository.py
+"""
+Pluggable data access for the parking and trend datasets.
+
+Every backend returns DataFrames with the flat-file column names (KerbsideID,
+RoadSegmentID, Zone_Number, ...), so the in-memory indexes built on top of them do not
+care where the rows came from.
+
+- ``files``: the CSV/XLSX sources through the columnar snapshot cache (default)
+- ``postgres``: the schema in data/schema.sql, over a pooled psycopg2 connection. Each
+  query is PREPAREd once per connection and fetched in bulk into NumPy columns.
+- ``sqlite``: a local stand-in with the same tables. ``flask db load-sqlite`` fills it
+  from the flat files for tests and offline development.
+
+``token(table)`` is a cheap change detector: a file mtime, or the newest sensor
+timestamp / a row count from the database. Caches and the live sensor refresher
+use it to decide when to reload.
+"""
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import click
+import numpy as np
+import pandas as pd
+from flask.cli import AppGroup
+
+from app.config.config import Config
+from app.snapshots import read_table
+
+TABLES = ("bays", "sensors", "zone_links", "sign_plates", "population", "vehicles")
+
+
+class Repository(ABC):
+    name = "base"
+
+    @abstractmethod
+    def bays(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def sensors(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def zone_links(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def sign_plates(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def population(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def vehicles(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def token(self, table: str) -> Any: ...
+
+    def sensors_since(self, epoch_s: float) -> pd.DataFrame:
+        """Latest sensor rows updated after ``epoch_s`` (backends may return more; callers filter)."""
+        return self.sensors()
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+# ------------------------------------
+# Flat files
+# ------------------------------------
+class FlatFileRepository(Repository):
+    name = "files"
+    PATHS: Dict[str, Callable[[], str]] = {
+        "bays": lambda: Config.PARKING_BAYS_DATA,
+        "sensors": lambda: Config.BAY_SENSORS_DATA,
+        "zone_links": lambda: Config.PARKING_ZONES_DATA,
+        "sign_plates": lambda: Config.SIGN_PLATES_DATA,
+        "population": lambda: Config.POPULATION_DATA,
+        "vehicles": lambda: Config.VEHICLE_DATA,
+    }
+
+    def _read(self, table: str) -> pd.DataFrame:
+        return read_table(self.PATHS[table]())
+
+    def bays(self): return self._read("bays")
+    def sensors(self): return self._read("sensors")
+    def zone_links(self): return self._read("zone_links")
+    def sign_plates(self): return self._read("sign_plates")
+    def population(self): return self._read("population")
+    def vehicles(self): return self._read("vehicles")
+
+    def token(self, table: str) -> Any:
+        try:
+            return os.path.getmtime(self.PATHS[table]())
+        except OSError:
+            return None
+
+
+# ------------------------------------
+# SQL backends
+# ------------------------------------
+FETCH_BATCH = 10000
+
+def _column(values: Sequence[Any]) -> np.ndarray:
+    """One result column as a NumPy array: int64/float64 when every value is numeric, else object."""
+    numeric = all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values)
+    if numeric and values:
+        if any(v is None or isinstance(v, float) for v in values):
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return np.array(values, dtype=np.int64)
+    return np.array(values, dtype=object)
+
+# The schema stores ids as text; the flat files (and the int-keyed indexes) see numbers
+_ID_COLUMNS = ("ParkingZone", "Zone_Number", "KerbsideID", "RoadSegmentID")
+
+def _restore_ids(df: pd.DataFrame) -> pd.DataFrame:
+    for col in _ID_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            parsed = pd.to_numeric(df[col], errors="coerce")
+            if parsed.notna().sum() == df[col].notna().sum():  # only when every id is numeric
+                df[col] = parsed.astype(np.int64) if parsed.notna().all() else parsed
+    return df
+
+def _frame(cur) -> pd.DataFrame:
+    """Drain a cursor in batches and transpose the rows into NumPy columns."""
+    names = [d[0] for d in cur.description]
+    rows: List[tuple] = []
+    while True:
+        batch = cur.fetchmany(FETCH_BATCH)
+        if not batch:
+            break
+        rows.extend(batch)
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return _restore_ids(pd.DataFrame({n: _column(list(c)) for n, c in zip(names, columns)}))
+
+# Column aliases shared by both dialects (flat-file names, so downstream code is unchanged)
+_BAY_COLS = ('street_segment_id AS "RoadSegmentID", bay_id AS "KerbsideID", road_segment_desc AS "RoadSegmentDescription", '
+             '{lat} AS "Latitude", {lon} AS "Longitude", last_updated_raw AS "LastUpdated", location_raw AS "Location"')
+_SENSOR_COLS = ('lastupdated_raw AS "Lastupdated", status_timestamp_raw AS "Status_Timestamp", zone_number AS "Zone_Number", '
+                'status_description AS "Status_Description", bay_id AS "KerbsideID", location_raw AS "Location", '
+                '{lat} AS "Latitude", {lon} AS "Longitude"')
+_LINK_SQL = ('SELECT l.zone_id AS "ParkingZone", s.on_street AS "OnStreet", s.street_from AS "StreetFrom", '
+             's.street_to AS "StreetTo", l.street_segment_id AS "Segment_ID" '
+             'FROM zone_street_link l LEFT JOIN street_segment s ON s.street_segment_id = l.street_segment_id')
+_SIGN_SQL = ('SELECT zone_id AS "ParkingZone", restriction_days AS "Restriction_Days", '
+             'time_restrictions_start AS "Time_Restrictions_Start", time_restrictions_finish AS "Time_Restrictions_Finish", '
+             'restriction_display AS "Restriction_Display" FROM sign_plate ORDER BY sign_id')
+_POP_SQL = 'SELECT region AS "Region", year AS "Year", population AS "Population" FROM population_stats WHERE population IS NOT NULL'
+_VEH_SQL = ('SELECT state AS "State", vehicle_type AS "Vehicle_Type", year AS "Year", vehicle_count AS "Vehicle_Count" '
+            'FROM vehicle_registration_vic')
+_COUNT_TABLES = {"bays": "parking_bay", "zone_links": "zone_street_link", "sign_plates": "sign_plate",
+                 "population": "population_stats", "vehicles": "vehicle_registration_vic"}
+
+
+class SqlRepository(Repository):
+    QUERIES: Dict[str, str] = {}
+
+    def __init__(self):
+        self._tokens: Dict[str, Any] = {}  # table → (checked_at, token)
+
+    @abstractmethod
+    def _query(self, name: str, params: Sequence[Any] = ()) -> pd.DataFrame: ...
+
+    def _scalar(self, name: str) -> Any:
+        df = self._query(name)
+        return df.iat[0, 0] if len(df) else None
+
+    def sensors(self): return self._query("sensors")
+    def zone_links(self): return self._query("zone_links")
+    def sign_plates(self): return self._query("sign_plates")
+    def population(self): return self._query("population")
+    def vehicles(self): return self._query("vehicles")
+
+    def bays(self):
+        df = self._query("bays")
+        df["LastUpdated"] = pd.to_datetime(df["LastUpdated"], errors="coerce")
+        return df
+
+    @abstractmethod
+    def _sensor_token(self) -> Optional[float]: ...
+
+    def token(self, table: str) -> Any:
+        # Asked on hot paths (HTTP cache keys), so each table is polled at most every DB_TOKEN_TTL_SECONDS
+        hit = self._tokens.get(table)
+        if hit and time.monotonic() - hit[0] < Config.DB_TOKEN_TTL_SECONDS:
+            return hit[1]
+        value = self._sensor_token() if table == "sensors" else self._scalar(f"count_{table}")
+        self._tokens[table] = (time.monotonic(), value)
+        return value
+
+
+class PostgresRepository(SqlRepository):
+    name = "postgres"
+    QUERIES = {
+        "bays": "SELECT " + _BAY_COLS.format(lat="latitude::float8", lon="longitude::float8") + " FROM parking_bay",
+        # Latest row per bay via DISTINCT ON, walking ix_sensor_bay_time
+        "sensors": ("SELECT DISTINCT ON (bay_id) " + _SENSOR_COLS.format(lat="latitude::float8", lon="longitude::float8") +
+                    " FROM bay_sensor WHERE status_timestamp_ts IS NOT NULL ORDER BY bay_id, status_timestamp_ts DESC"),
+        "sensors_since": ("SELECT DISTINCT ON (bay_id) " + _SENSOR_COLS.format(lat="latitude::float8", lon="longitude::float8") +
+                          " FROM bay_sensor WHERE status_timestamp_ts IS NOT NULL AND last_updated_ts > to_timestamp($1)"
+                          " ORDER BY bay_id, status_timestamp_ts DESC"),
+        "sensor_token": "SELECT extract(epoch FROM max(last_updated_ts))::float8 FROM bay_sensor",
+        "zone_links": _LINK_SQL,
+        "sign_plates": _SIGN_SQL,
+        "population": _POP_SQL,
+        "vehicles": _VEH_SQL,
+        **{f"count_{t}": f"SELECT count(*) FROM {tbl}" for t, tbl in _COUNT_TABLES.items()},
+    }
+
+    def __init__(self, dsn: str, minconn: int, maxconn: int):
+        super().__init__()
+        import psycopg2.extensions
+        import psycopg2.pool
+
+        class _PreparingConnection(psycopg2.extensions.connection):
+            """Remembers which statements were PREPAREd on this server session."""
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.prepared = set()
+
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, dsn,
+                                                          connection_factory=_PreparingConnection)
+
+    @contextmanager
+    def _conn(self):
+        conn = self._pool.getconn()
+        try:
+            yield conn
+            conn.rollback()  # read-only: end the transaction, keep the session (and its prepared statements)
+        except Exception:
+            self._pool.putconn(conn, close=True)
+            raise
+        else:
+            self._pool.putconn(conn)
+
+    def _query(self, name: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        with self._conn() as conn, conn.cursor() as cur:
+            if name not in conn.prepared:
+                cur.execute(f"PREPARE {name} AS {self.QUERIES[name]}")
+                conn.prepared.add(name)
+            args = "(" + ", ".join(["%s"] * len(params)) + ")" if params else ""
+            cur.execute(f"EXECUTE {name}{args}", tuple(params))
+            return _frame(cur)
+
+    def sensors_since(self, epoch_s: float) -> pd.DataFrame:
+        return self._query("sensors_since", (float(epoch_s),))
+
+    def _sensor_token(self) -> Optional[float]:
+        return self._scalar("sensor_token")
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name, "pool_max": self._pool.maxconn}
+
+
+# SQLite stand-in: same tables (population_stats is a plain table, timestamps are ISO text in UTC)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS street_segment (street_segment_id INTEGER PRIMARY KEY, on_street TEXT, street_from TEXT, street_to TEXT);
+CREATE TABLE IF NOT EXISTS parking_bay (bay_id TEXT PRIMARY KEY, street_segment_id INTEGER, road_segment_desc TEXT,
+    latitude REAL, longitude REAL, location_raw TEXT, last_updated_raw TEXT, zone_id TEXT, last_updated_ts TEXT);
+CREATE TABLE IF NOT EXISTS bay_sensor (sensor_id INTEGER PRIMARY KEY AUTOINCREMENT, bay_id TEXT, zone_number TEXT,
+    status_description TEXT, status_timestamp_raw TEXT, lastupdated_raw TEXT, latitude REAL, longitude REAL,
+    location_raw TEXT, status_timestamp_ts TEXT, last_updated_ts TEXT);
+CREATE TABLE IF NOT EXISTS zone_street_link (zone_id TEXT NOT NULL, street_segment_id INTEGER NOT NULL,
+    PRIMARY KEY (zone_id, street_segment_id));
+CREATE TABLE IF NOT EXISTS sign_plate (sign_id INTEGER PRIMARY KEY AUTOINCREMENT, zone_id TEXT NOT NULL, restriction_days TEXT,
+    time_restrictions_start TEXT, time_restrictions_finish TEXT, restriction_display TEXT);
+CREATE TABLE IF NOT EXISTS population_stats (region TEXT, year INTEGER, population INTEGER);
+CREATE TABLE IF NOT EXISTS vehicle_registration_vic (reg_id INTEGER PRIMARY KEY AUTOINCREMENT, state TEXT NOT NULL,
+    vehicle_type TEXT NOT NULL, year INTEGER NOT NULL, vehicle_count INTEGER NOT NULL, UNIQUE (state, vehicle_type, year));
+CREATE INDEX IF NOT EXISTS ix_sensor_bay_time ON bay_sensor (bay_id, status_timestamp_ts DESC);
+CREATE INDEX IF NOT EXISTS ix_sensor_zone ON bay_sensor (zone_number);
+CREATE INDEX IF NOT EXISTS ix_sign_zone ON sign_plate (zone_id);
+CREATE INDEX IF NOT EXISTS ix_bay_street ON parking_bay (street_segment_id);
+"""
+_SQLITE_TS = "%Y-%m-%dT%H:%M:%SZ"
+_SQLITE_LATEST = ("SELECT " + _SENSOR_COLS.format(lat="latitude", lon="longitude") + " FROM ("
+                  "SELECT *, ROW_NUMBER() OVER (PARTITION BY bay_id ORDER BY status_timestamp_ts DESC) AS rn "
+                  "FROM bay_sensor WHERE status_timestamp_ts IS NOT NULL{where}) WHERE rn = 1")
+
+
+class SqliteRepository(SqlRepository):
+    name = "sqlite"
+    QUERIES = {
+        "bays": "SELECT " + _BAY_COLS.format(lat="latitude", lon="longitude") + " FROM parking_bay",
+        "sensors": _SQLITE_LATEST.format(where=""),
+        "sensors_since": _SQLITE_LATEST.format(where=" AND last_updated_ts > ?"),
+        "sensor_token": "SELECT max(last_updated_ts) FROM bay_sensor",
+        "zone_links": _LINK_SQL,
+        "sign_plates": _SIGN_SQL,
+        "population": _POP_SQL,
+        "vehicles": _VEH_SQL,
+        **{f"count_{t}": f"SELECT count(*) FROM {tbl}" for t, tbl in _COUNT_TABLES.items()},
+    }
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 keeps each compiled statement in its statement cache
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, cached_statements=64)
+        return conn
+
+    def _query(self, name: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        cur = self._conn().execute(self.QUERIES[name], tuple(params))
+        try:
+            return _frame(cur)
+        finally:
+            cur.close()
+
+    def sensors_since(self, epoch_s: float) -> pd.DataFrame:
+        return self._query("sensors_since", (datetime.fromtimestamp(epoch_s, timezone.utc).strftime(_SQLITE_TS),))
+
+    def _sensor_token(self) -> Optional[float]:
+        newest = self._scalar("sensor_token")
+        return pd.Timestamp(newest).timestamp() if newest else None
+
+
+# ------------------------------------
+# Backend selection
+# ------------------------------------
+_repository: Optional[Repository] = None
+_repository_pid: Optional[int] = None
+_repository_lock = threading.Lock()
+
+def create_repository(backend: Optional[str] = None) -> Repository:
+    backend = (backend or Config.DATA_BACKEND).lower()
+    if backend == "postgres":
+        if not Config.DATABASE_URL:
+            raise RuntimeError("DATA_BACKEND=postgres requires DATABASE_URL")
+        return PostgresRepository(Config.DATABASE_URL, Config.DB_POOL_MIN, Config.DB_POOL_MAX)
+    if backend == "sqlite":
+        return SqliteRepository(Config.SQLITE_PATH)
+    return FlatFileRepository()
+
+def get_repository() -> Repository:
+    """Process-wide repository (re-created after fork so pooled sockets are never shared)."""
+    global _repository, _repository_pid
+    if _repository is None or _repository_pid != os.getpid():
+        with _repository_lock:
+            if _repository is None or _repository_pid != os.getpid():
+                _repository, _repository_pid = create_repository(), os.getpid()
+    return _repository
+
+# ------------------------------------
+# SQLite stand-in loader
+# ------------------------------------
+def _utc_text(values) -> List[Optional[str]]:
+    ts = pd.to_datetime(pd.Series(values), utc=True, errors="coerce", format="mixed")
+    return [None if pd.isna(t) else t.strftime(_SQLITE_TS) for t in ts]
+
+def _text(values) -> List[Optional[str]]:
+    out = []
+    for v in values:
+        if v is None or (isinstance(v, float) and v != v):
+            out.append(None)
+        elif isinstance(v, float) and v.is_integer():
+            out.append(str(int(v)))
+        else:
+            out.append(str(v))
+    return out
+
+def load_sqlite(path: str, source: Optional[Repository] = None) -> Dict[str, int]:
+    """Create the stand-in schema at ``path`` and fill it from ``source`` (default: flat files)."""
+    from app.trends.trend_utils import _build_cube
+
+    src = source or FlatFileRepository()
+    bays, sensors, links, signs = src.bays(), src.sensors(), src.zone_links(), src.sign_plates()
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SQLITE_SCHEMA)
+        for table in ("parking_bay", "bay_sensor", "zone_street_link", "street_segment", "sign_plate",
+                      "population_stats", "vehicle_registration_vic"):
+            conn.execute(f"DELETE FROM {table}")
+
+        seg = links.drop_duplicates("Segment_ID")
+        conn.executemany("INSERT INTO street_segment VALUES (?, ?, ?, ?)", zip(
+            seg["Segment_ID"].astype(int).tolist(), _text(seg["OnStreet"]), _text(seg["StreetFrom"]), _text(seg["StreetTo"])))
+        conn.executemany("INSERT OR IGNORE INTO zone_street_link VALUES (?, ?)", zip(
+            _text(links["ParkingZone"]), links["Segment_ID"].astype(int).tolist()))
+
+        b = bays.drop_duplicates("KerbsideID")
+        conn.executemany("INSERT INTO parking_bay VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?)", zip(
+            _text(b["KerbsideID"]), pd.to_numeric(b["RoadSegmentID"], errors="coerce").astype("Int64").astype(object)
+            .where(lambda s: s.notna(), None).tolist(), _text(b["RoadSegmentDescription"]),
+            b["Latitude"].astype(float).tolist(), b["Longitude"].astype(float).tolist(), _text(b["Location"]),
+            _text(b["LastUpdated"]), _utc_text(b["LastUpdated"])))
+
+        conn.executemany(
+            "INSERT INTO bay_sensor (bay_id, zone_number, status_description, status_timestamp_raw, lastupdated_raw, "
+            "latitude, longitude, location_raw, status_timestamp_ts, last_updated_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(_text(sensors["KerbsideID"]), _text(sensors["Zone_Number"]), _text(sensors["Status_Description"]),
+                _text(sensors["Status_Timestamp"]), _text(sensors["Lastupdated"]),
+                sensors["Latitude"].astype(float).tolist(), sensors["Longitude"].astype(float).tolist(),
+                _text(sensors["Location"]), _utc_text(sensors["Status_Timestamp"]), _utc_text(sensors["Lastupdated"])))
+
+        conn.executemany(
+            "INSERT INTO sign_plate (zone_id, restriction_days, time_restrictions_start, time_restrictions_finish, "
+            "restriction_display) VALUES (?, ?, ?, ?, ?)",
+            zip(_text(signs["ParkingZone"]), _text(signs["Restriction_Days"]), _text(signs["Time_Restrictions_Start"]),
+                _text(signs["Time_Restrictions_Finish"]), _text(signs["Restriction_Display"])))
+
+        pop = _build_cube(src.population(), None, "Region", "Population", "POPULATION").records()
+        conn.executemany("INSERT INTO population_stats VALUES (?, ?, ?)",
+                         [(r["Region"], r["Year"], int(r["Population"])) for r in pop])
+        veh = _build_cube(src.vehicles(), "Vehicle_Type", "State", "Vehicle_Count", "ALL").records()
+        conn.executemany("INSERT INTO vehicle_registration_vic (state, vehicle_type, year, vehicle_count) VALUES (?, ?, ?, ?)",
+                         [(r["State"], r["Vehicle_Type"], r["Year"], int(r["Vehicle_Count"])) for r in veh])
+        conn.commit()
+        return {t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0]
+                for t in ("parking_bay", "bay_sensor", "zone_street_link", "sign_plate",
+                          "population_stats", "vehicle_registration_vic")}
+    finally:
+        conn.close()
+
+# ------------------------------------
+# CLI: flask db ...
+# ------------------------------------
+db_cli = AppGroup("db", help="Data backend utilities.")
+
+@db_cli.command("load-sqlite")
+@click.argument("path", required=False)
+def load_sqlite_command(path: Optional[str]):
+    """Build the SQLite stand-in (default SQLITE_PATH) from the flat files."""
+    path = path or Config.SQLITE_PATH
+    for table, n in load_sqlite(path).items():
+        click.echo(f"{table:<26} {n}")
+    click.echo(f"wrote {path}")
+
+@db_cli.command("check")
+def check_command():
+    """Row counts per dataset through the configured backend."""
+    repo = get_repository()
+    click.echo(f"backend: {repo.name}")
+    for table in TABLES:
+        click.echo(f"{table:<12} {len(getattr(repo, table)())}")
@@ -1,13 +1,28 @@
 # app/routes.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 import os
 
+from app.config.config import Config
+from app.metrics import render as render_metrics
+from app.warmup import startup
+from app.ml_model.ml_predictor import health_check as ml_health_check
+
 core_bp = Blueprint("core", __name__)
 
 @core_bp.get("/health")
 def health():
     return jsonify({"status": "ok"}), 200
 
+@core_bp.get("/ready")
+def ready():
+    # Readiness (unlike /health): 503 until every dataset, index and the model are loaded
+    return jsonify(startup.status()), 200 if startup.ready else 503
+
+@core_bp.get("/ml/health")
+def ml_health():
+    # Model, zone map and forecast table status (loads the model if it isn't yet)
+    return jsonify(ml_health_check()), 200
+
 @core_bp.get("/version")
 def version():
     # surface a minimal version stub
@@ -15,3 +30,10 @@ def version():
         "name": "findmyspot-backend",
         "env": os.getenv("FLASK_ENV", "production")
     }), 200
+
+@core_bp.get("/metrics")
+def metrics():
+    # Prometheus text exposition format (per worker process)
+    if not Config.METRICS_ENABLED:
+        return jsonify({"error": "metrics disabled"}), 404
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,218 @@
+# app/snapshots.py
+"""
+Columnar on-disk snapshots of the Excel/CSV source datasets.
+
+The first read of a source file parses it with pandas and writes one ``.npy`` file per
+column plus a ``meta.json`` fingerprint (mtime, size, sha1). Later reads memory-map the
+``.npy`` files instead of re-parsing the workbook; a snapshot is rebuilt automatically
+when the source's mtime/size *and* content hash no longer match.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from typing import Dict, Any, List, Optional
+
+import click
+import numpy as np
+import pandas as pd
+from flask.cli import AppGroup
+
+from app.config.config import Config
+from app.metrics import DATA_LOAD_SECONDS
+
+SNAPSHOT_FORMAT = 1
+
+# ------------------------------------
+# Source parsing
+# ------------------------------------
+def parse_source(path: str) -> pd.DataFrame:
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path)
+    df.columns = [c.strip() if isinstance(c, str) else c for c in df.columns]
+    return df
+
+# ------------------------------------
+# Fingerprints
+# ------------------------------------
+def _sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _snapshot_dir(path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(Config.SNAPSHOT_DIR, f"{stem}-{tag}")
+
+def _read_meta(snap_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(snap_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+        return meta if meta.get("format") == SNAPSHOT_FORMAT else None
+    except Exception:
+        return None
+
+def _is_fresh(path: str, snap_dir: str, meta: Optional[Dict[str, Any]]) -> bool:
+    if not meta:
+        return False
+    st = os.stat(path)
+    if meta["mtime_ns"] == st.st_mtime_ns and meta["size"] == st.st_size:
+        return True
+    # Touched but identical (e.g. re-deployed checkout): re-stamp instead of rebuilding
+    if meta["size"] == st.st_size and meta["sha1"] == _sha1(path):
+        meta["mtime_ns"] = st.st_mtime_ns
+        try:
+            with open(os.path.join(snap_dir, "meta.json"), "w") as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+        return True
+    return False
+
+# ------------------------------------
+# Encode / decode columns
+# ------------------------------------
+def _encode_column(series: pd.Series):
+    """Return (kind, array, null mask or None) for one column."""
+    values = series.to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype) and not isinstance(series.dtype, pd.DatetimeTZDtype):
+        return "datetime", values.astype("datetime64[ns]").view(np.int64), None
+    if values.dtype.kind in "biuf":
+        return "numeric", values, None
+    nulls = series.isna().to_numpy()
+    non_null = series[~nulls]
+    if non_null.map(type).eq(str).all():
+        return "str", np.where(nulls, "", series.astype(str).to_numpy()).astype(str), nulls
+    # Mixed types (e.g. ints with a stray string id) keep their Python objects
+    return "object", values.astype(object), None
+
+def _decode_column(kind: str, arr: np.ndarray, nulls: Optional[np.ndarray]):
+    if kind == "datetime":
+        return pd.Series(np.asarray(arr).view("datetime64[ns]"))
+    if kind == "str":
+        col = np.asarray(arr).astype(object)
+        col[nulls] = np.nan
+        return col
+    return arr
+
+def write_snapshot(path: str, df: pd.DataFrame) -> str:
+    snap_dir = _snapshot_dir(path)
+    os.makedirs(Config.SNAPSHOT_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=Config.SNAPSHOT_DIR)
+
+    columns: List[Dict[str, Any]] = []
+    for i, name in enumerate(df.columns):
+        kind, arr, nulls = _encode_column(df[name])
+        np.save(os.path.join(tmp_dir, f"{i}.npy"), arr, allow_pickle=(kind == "object"))
+        if nulls is not None:
+            np.save(os.path.join(tmp_dir, f"{i}.null.npy"), nulls)
+        label = name.item() if isinstance(name, np.generic) else name
+        columns.append({"name": label if isinstance(label, (int, str)) else str(label), "kind": kind})
+
+    st = os.stat(path)
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "source": os.path.abspath(path),
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha1": _sha1(path),
+        "rows": int(len(df)),
+        "columns": columns,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # Swap the finished bundle into place; concurrent builders (other workers) may win the race
+    if os.path.isdir(snap_dir):
+        stale = f"{snap_dir}.stale-{os.getpid()}"
+        try:
+            os.replace(snap_dir, stale)
+            shutil.rmtree(stale, ignore_errors=True)
+        except OSError:
+            pass
+    try:
+        os.replace(tmp_dir, snap_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return snap_dir
+
+def load_snapshot(snap_dir: str, meta: Dict[str, Any]) -> pd.DataFrame:
+    data = {}
+    for i, col in enumerate(meta["columns"]):
+        kind = col["kind"]
+        arr = np.load(os.path.join(snap_dir, f"{i}.npy"),
+                      mmap_mode=None if kind == "object" else "r",
+                      allow_pickle=(kind == "object"))
+        nulls = np.load(os.path.join(snap_dir, f"{i}.null.npy")) if kind == "str" else None
+        data[col["name"]] = _decode_column(kind, arr, nulls)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]))
+
+# ------------------------------------
+# Public entry point
+# ------------------------------------
+def read_table(path: str) -> pd.DataFrame:
+    """
+    Read a source dataset through its columnar snapshot, (re)building it when stale.
+    Falls back to parsing the source directly if snapshots are disabled or unwritable.
+    """
+    dataset = os.path.basename(path)
+    t0 = time.perf_counter()
+    if not Config.SNAPSHOTS_ENABLED:
+        df = parse_source(path)
+        DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset=dataset, source="source")
+        return df
+
+    snap_dir = _snapshot_dir(path)
+    meta = _read_meta(snap_dir)
+    try:
+        if _is_fresh(path, snap_dir, meta):
+            df = load_snapshot(snap_dir, meta)
+            DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset=dataset, source="snapshot")
+            return df
+    except Exception as e:
+        print(f"[Snapshot] Ignoring unreadable snapshot {snap_dir}: {e}")
+
+    df = parse_source(path)
+    DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset=dataset, source="source")
+    try:
+        write_snapshot(path, df)
+    except Exception as e:
+        print(f"[Snapshot] Could not write snapshot for {path}: {e}")
+    return df
+
+def source_paths() -> List[str]:
+    return [
+        Config.PARKING_BAYS_DATA,
+        Config.BAY_SENSORS_DATA,
+        Config.PARKING_ZONES_DATA,
+        Config.SIGN_PLATES_DATA,
+        Config.POPULATION_DATA,
+        Config.VEHICLE_DATA,
+    ]
+
+# ------------------------------------
+# CLI: flask snapshots build
+# ------------------------------------
+snapshot_cli = AppGroup("snapshots", help="Manage columnar data snapshots.")
+
+@snapshot_cli.command("build")
+@click.option("--force", is_flag=True, help="Rebuild even when the snapshot is fresh.")
+def build_snapshots_command(force: bool):
+    """Prebuild snapshots for every source dataset (run during deploy)."""
+    for path in source_paths():
+        if not os.path.exists(path):
+            click.echo(f"skip    {path} (missing)")
+            continue
+        snap_dir = _snapshot_dir(path)
+        if not force and _is_fresh(path, snap_dir, _read_meta(snap_dir)):
+            click.echo(f"fresh   {snap_dir}")
+            continue
+        write_snapshot(path, parse_source(path))
+        click.echo(f"built   {snap_dir}")
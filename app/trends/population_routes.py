@@ -1,6 +1,6 @@
 # app/trends/population_routes.py
 from flask import Blueprint, request, jsonify
-from app.trends.trend_utils import filter_population
+from app.trends.trend_utils import filter_population, load_population_cube, range_error
 
 population_bp = Blueprint("population", __name__)
 
@@ -8,5 +8,50 @@ population_bp = Blueprint("population", __name__)
 def population_trends():
     start_year = request.args.get("start", type=int)
     end_year = request.args.get("end", type=int)
-    data = filter_population(start_year, end_year)
+    region = request.args.get("region")
+    data = filter_population(start_year, end_year, region)
     return jsonify({"count": len(data), "items": data}), 200
+
+@population_bp.get("/totals")
+def population_totals():
+    start_year = request.args.get("start", type=int)
+    end_year = request.args.get("end", type=int)
+    region = request.args.get("region")
+    err = range_error(start_year, end_year)
+    if err:
+        return jsonify({"error": err}), 400
+    cube = load_population_cube()
+    if cube is None:
+        return jsonify({"error": "Population data unavailable"}), 503
+    return jsonify({"region": region, **cube.totals(None, region, start_year, end_year)}), 200
+
+@population_bp.get("/growth")
+def population_growth():
+    start_year = request.args.get("start", type=int)
+    end_year = request.args.get("end", type=int)
+    region = request.args.get("region")  # exact name, or a substring such as "CBD" (summed)
+    err = range_error(start_year, end_year)
+    if err:
+        return jsonify({"error": err}), 400
+    cube = load_population_cube()
+    if cube is None:
+        return jsonify({"error": "Population data unavailable"}), 503
+    regions = [cube.places[i] for i in cube.place_codes(region)]
+    if not regions:
+        return jsonify({"error": f"Unknown region: {region}"}), 404
+    return jsonify({"region": region, "regions": regions, **cube.growth(None, region, start_year, end_year)}), 200
+
+@population_bp.get("/top")
+def population_top():
+    n = request.args.get("n", default=5, type=int)
+    year = request.args.get("year", type=int)
+    start_year = request.args.get("start", type=int)
+    by = request.args.get("by", default="value")  # value | growth
+    cube = load_population_cube()
+    if cube is None:
+        return jsonify({"error": "Population data unavailable"}), 503
+    try:
+        items = cube.top(n, year, by=by, group="place", start=start_year)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"count": len(items), "items": items}), 200
@@ -0,0 +1,238 @@
+# app/trends/trend_cube.py
+"""
+Pre-aggregated trend cubes.
+
+Each trend dataset (wide "one column per year" or long "Year/value rows") is loaded once into
+a dense float array indexed by (type, place, year) with a sorted year axis. Range filters
+become a searchsorted slice, and totals, growth and top-N queries are reductions over
+array views. NaN marks combinations missing from the source.
+"""
+import re
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+_YEAR = re.compile(r"^\s*(19|20)\d{2}(\.0+)?\s*$")
+
+# TrendCube.top: ranking keys and grouping axes
+TOP_BY = ("value", "growth")
+TOP_GROUPS = ("place", "type")
+
+
+def _as_year(value) -> Optional[int]:
+    if isinstance(value, (int, np.integer)) and 1900 <= int(value) <= 2100:
+        return int(value)
+    if isinstance(value, (float, np.floating)) and value == value and float(value).is_integer():
+        return _as_year(int(value))
+    if isinstance(value, str) and _YEAR.match(value):
+        return int(float(value))
+    return None
+
+
+class TrendCube:
+    def __init__(self, types: Sequence[str], places: Sequence[str], years: np.ndarray, values: np.ndarray,
+                 type_col: str, place_col: str, value_col: str):
+        self.types = list(types)
+        self.places = list(places)
+        self.years = years              # sorted int64
+        self.values = values            # (types, places, years) float64
+        self.type_col = type_col
+        self.place_col = place_col
+        self.value_col = value_col
+        self._type_code = {t.lower(): i for i, t in enumerate(self.types)}
+        self._place_code = {p.lower(): i for i, p in enumerate(self.places)}
+        self._places_lower = [p.lower() for p in self.places]
+        self.years.flags.writeable = False
+        self.values.flags.writeable = False
+
+    # ------------------------------------
+    # Builders
+    # ------------------------------------
+    @classmethod
+    def from_long(cls, df: pd.DataFrame, type_col: Optional[str], place_col: str, year_col: str, value_col: str,
+                  default_type: str = "ALL") -> "TrendCube":
+        years = pd.to_numeric(df[year_col], errors="coerce")
+        vals = pd.to_numeric(df[value_col], errors="coerce")
+        places = df[place_col].astype(str).str.strip()
+        types = df[type_col].astype(str).str.strip() if type_col else pd.Series(default_type, index=df.index)
+        ok = years.notna() & vals.notna() & df[place_col].notna()
+        return cls._from_triples(types[ok], places[ok], years[ok].astype(np.int64), vals[ok],
+                                 type_col or "Type", place_col, value_col)
+
+    @classmethod
+    def from_wide(cls, df: pd.DataFrame, type_col: Optional[str], place_col: str, value_col: str,
+                  default_type: str = "ALL", default_place: str = "ALL") -> "TrendCube":
+        """
+        Year columns are recognised from the header (2001, 2002, ...) or, for sheets whose
+        header row was exported as data, from the first row's values.
+        """
+        first = df.iloc[0] if len(df) else None
+        year_cols: Dict[Any, int] = {}
+        for c in df.columns:
+            if c in (type_col, place_col):
+                continue
+            y = _as_year(c)
+            if y is None and first is not None:
+                y = _as_year(first[c])
+            if y is not None:
+                year_cols[c] = y
+        id_cols = [c for c in (type_col, place_col) if c and c in df.columns]
+        long = df[id_cols + list(year_cols)].melt(id_vars=id_cols, var_name="_col", value_name="_value")
+        long["_year"] = long["_col"].map(year_cols)
+        if place_col not in long.columns:
+            long[place_col] = default_place
+        cube = cls.from_long(long, type_col if type_col in long.columns else None, place_col, "_year", "_value",
+                             default_type)
+        cube.value_col = value_col
+        return cube
+
+    @classmethod
+    def _from_triples(cls, types: pd.Series, places: pd.Series, years: pd.Series, vals: pd.Series,
+                      type_col: str, place_col: str, value_col: str) -> "TrendCube":
+        t_labels, t_code = np.unique(types.to_numpy(dtype=str), return_inverse=True)
+        # Places keep first-seen order (the source's own ordering, e.g. by region)
+        p_codes, p_labels = pd.factorize(places)
+        y_labels, y_code = np.unique(years.to_numpy(dtype=np.int64), return_inverse=True)
+        values = np.full((len(t_labels), len(p_labels), len(y_labels)), np.nan)
+        values[t_code.ravel(), p_codes, y_code.ravel()] = vals.to_numpy(dtype=np.float64)
+        return cls(t_labels.tolist(), list(p_labels), y_labels.astype(np.int64), values,
+                   type_col, place_col, value_col)
+
+    # ------------------------------------
+    # Selection
+    # ------------------------------------
+    def type_codes(self, name: Optional[str], aggregate: bool = False) -> np.ndarray:
+        """
+        Codes for one type, or all types. When aggregating, source-provided "TOTAL ..." rows
+        are left out of "all" so sums do not count them twice.
+        """
+        if not name:
+            return np.array([i for i, t in enumerate(self.types)
+                             if not (aggregate and t.lower().startswith("total"))], dtype=np.int64)
+        code = self._type_code.get(name.strip().lower())
+        return np.array([] if code is None else [code], dtype=np.int64)
+
+    def place_codes(self, name: Optional[str]) -> np.ndarray:
+        """Exact (case-insensitive) match, else every place containing the text ("CBD")."""
+        if not name:
+            return np.arange(len(self.places))
+        key = name.strip().lower()
+        code = self._place_code.get(key)
+        if code is not None:
+            return np.array([code], dtype=np.int64)
+        return np.array([i for i, p in enumerate(self._places_lower) if key in p], dtype=np.int64)
+
+    def year_slice(self, start: Optional[int], end: Optional[int]) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(self.years, start, side="left"))
+        hi = len(self.years) if end is None else int(np.searchsorted(self.years, end, side="right"))
+        return slice(lo, hi)
+
+    def _block(self, type_name, place, start, end, aggregate: bool = False):
+        t, p, ys = self.type_codes(type_name, aggregate), self.place_codes(place), self.year_slice(start, end)
+        return t, p, ys, self.values[np.ix_(t, p)][:, :, ys]
+
+    # ------------------------------------
+    # Queries
+    # ------------------------------------
+    def records(self, type_name: Optional[str] = None, place: Optional[str] = None,
+                start: Optional[int] = None, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        t, p, ys, block = self._block(type_name, place, start, end)
+        ti, pi, yi = np.nonzero(~np.isnan(block))
+        years = self.years[ys]
+        return [
+            {self.type_col: self.types[t[a]], self.place_col: self.places[p[b]],
+             "Year": int(years[c]), self.value_col: _num(block[a, b, c])}
+            for a, b, c in zip(ti.tolist(), pi.tolist(), yi.tolist())
+        ]
+
+    def totals(self, type_name: Optional[str] = None, place: Optional[str] = None,
+               start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, Any]:
+        """Per-year total over the selected types and places."""
+        _, _, ys, block = self._block(type_name, place, start, end, aggregate=True)
+        present = (~np.isnan(block)).any(axis=(0, 1))
+        sums = np.nansum(block, axis=(0, 1))
+        return {
+            "years": self.years[ys].tolist(),
+            "totals": [_num(v) if ok else None for v, ok in zip(sums.tolist(), present.tolist())],
+        }
+
+    def growth(self, type_name: Optional[str] = None, place: Optional[str] = None,
+               start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, Any]:
+        """Per-year totals with year-on-year change, overall change and compound annual growth."""
+        out = self.totals(type_name, place, start, end)
+        years = np.asarray(out["years"], dtype=np.int64)
+        totals = np.array([np.nan if v is None else v for v in out["totals"]], dtype=np.float64)
+        keep = ~np.isnan(totals)
+        years, totals = years[keep], totals[keep]
+        yoy = [None] + [_pct(b, a) for a, b in zip(totals[:-1].tolist(), totals[1:].tolist())]
+        out.update({"years": years.tolist(), "totals": [_num(v) for v in totals.tolist()], "yoy_pct": yoy})
+        if len(totals) >= 2:
+            span = int(years[-1] - years[0])
+            out["change"] = _num(totals[-1] - totals[0])
+            out["change_pct"] = _pct(totals[-1], totals[0])
+            out["cagr_pct"] = (round(float((totals[-1] / totals[0]) ** (1 / span) - 1) * 100, 3)
+                               if span > 0 and totals[0] > 0 else None)
+        return out
+
+    def top(self, n: int = 5, year: Optional[int] = None, by: str = "value", group: str = "place",
+            type_name: Optional[str] = None, place: Optional[str] = None,
+            start: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Top-N places (or types) by value in ``year`` (default: latest), or by growth from
+        ``start`` (default: earliest) to ``year``. Raises ValueError for n < 1 or an
+        unknown ``by`` / ``group``.
+        """
+        if int(n) < 1:
+            raise ValueError("n must be a positive integer")
+        if by not in TOP_BY:
+            raise ValueError(f"by must be one of {', '.join(TOP_BY)}")
+        if group not in TOP_GROUPS:
+            raise ValueError(f"group must be one of {', '.join(TOP_GROUPS)}")
+        t, p = self.type_codes(type_name, aggregate=True), self.place_codes(place)
+        if not len(self.years) or not len(t) or not len(p):
+            return []
+        if year is None:
+            yi = len(self.years) - 1
+        else:
+            yi = int(np.searchsorted(self.years, year))
+            if yi >= len(self.years) or self.years[yi] != year:
+                return []
+        block = self.values[np.ix_(t, p)]
+        axis = 0 if group == "place" else 1
+        labels = [self.places[i] for i in p] if group == "place" else [self.types[i] for i in t]
+        present = (~np.isnan(block[:, :, yi])).any(axis=axis)
+        current = np.nansum(block[:, :, yi], axis=axis)
+        score, base = current, None
+        if by == "growth":
+            si = 0 if start is None else int(np.searchsorted(self.years, start))
+            si = min(si, yi)
+            base = np.nansum(block[:, :, si], axis=axis)
+            present &= (~np.isnan(block[:, :, si])).any(axis=axis) & (base > 0)
+            score = np.where(base > 0, current / np.where(base > 0, base, 1) - 1, np.nan)
+        idx = np.flatnonzero(present)
+        if not len(idx):
+            return []
+        n = min(int(n), len(idx))
+        best = idx[np.argpartition(-score[idx], n - 1)[:n]]
+        best = best[np.argsort(-score[best], kind="stable")]
+        key = self.place_col if group == "place" else self.type_col
+        rows = []
+        for i in best.tolist():
+            row = {key: labels[i], "Year": int(self.years[yi]), self.value_col: _num(current[i])}
+            if base is not None:
+                row["from_year"] = int(self.years[si])
+                row["growth_pct"] = round(float(score[i]) * 100, 3)
+            rows.append(row)
+        return rows
+
+
+def _num(v: float):
+    v = float(v)
+    return int(v) if v.is_integer() else v
+
+
+def _pct(new: float, old: float) -> Optional[float]:
+    if not old or old != old or new != new:
+        return None
+    return round(float((new - old) / old) * 100, 3)
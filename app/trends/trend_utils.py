@@ -1,54 +1,89 @@
 # app/trends/trend_utils.py
-import os
+import time
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Tuple
 
-from app.config.config import Config
+from app.metrics import DATA_LOAD_SECONDS
+from app.repository import get_repository
+from app.trends.trend_cube import TrendCube
 
-def _read_table(path: str) -> pd.DataFrame:
-    if path.lower().endswith(".csv"):
-        df = pd.read_csv(path)
-    else:
-        df = pd.read_excel(path)
-    df.columns = df.columns.str.strip()
-    return df
+# Cubes are rebuilt only when the dataset changes: table → (repository token, cube)
+_cubes: Dict[str, Tuple[Any, TrendCube]] = {}
+
+def _cached_cube(table: str, build: Callable[[pd.DataFrame], TrendCube]) -> Optional[TrendCube]:
+    repo = get_repository()
+    try:
+        token = repo.token(table)
+    except Exception as e:
+        print(f"[Trends] Failed to check {table}: {e}")
+        token = None
+    if token is None:
+        return None
+    hit = _cubes.get(table)
+    if hit and hit[0] == token:
+        return hit[1]
+    t0 = time.perf_counter()
+    try:
+        cube = build(getattr(repo, table)())
+    except Exception as e:
+        print(f"[Trends] Failed to build cube for {table}: {e}")
+        return None
+    DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, dataset=table, source="cube")
+    _cubes[table] = (token, cube)
+    return cube
+
+def _build_cube(df: pd.DataFrame, type_col: Optional[str], place_col: str, value_col: str,
+                default_type: str) -> TrendCube:
+    # Long layout (Year + value columns) or wide layout (one column per year)
+    if {"Year", value_col} <= set(df.columns):
+        years = pd.to_numeric(df["Year"], errors="coerce")
+        if years.notna().any() and years.dropna().between(1900, 2100).all():
+            return TrendCube.from_long(df, type_col if type_col in df.columns else None, place_col,
+                                       "Year", value_col, default_type)
+    return TrendCube.from_wide(df, type_col, place_col, value_col, default_type)
 
 # ---- Population ----
 
 def load_population_df() -> pd.DataFrame:
     try:
-        return _read_table(Config.POPULATION_DATA)
+        return get_repository().population()
     except Exception:
         return pd.DataFrame()
 
-def filter_population(start_year: int | None, end_year: int | None) -> List[Dict[str, Any]]:
-    df = load_population_df()
-    if df.empty:
+def load_population_cube() -> Optional[TrendCube]:
+    # Region × Year; wide workbook (one column per year) or long rows from the database
+    return _cached_cube("population",
+                        lambda df: _build_cube(df, None, "Region", "Population", "POPULATION"))
+
+def filter_population(start_year: int | None, end_year: int | None, region: str | None = None) -> List[Dict[str, Any]]:
+    cube = load_population_cube()
+    if cube is None:
         return []
-    if start_year is not None and "Year" in df.columns:
-        df = df[df["Year"] >= int(start_year)]
-    if end_year is not None and "Year" in df.columns:
-        df = df[df["Year"] <= int(end_year)]
-    return df.to_dict(orient="records")
+    return [{k: v for k, v in r.items() if k != cube.type_col}
+            for r in cube.records(None, region, start_year, end_year)]
+
+# ---- Parameter checks (shared by the population and vehicle routes) ----
+
+def range_error(start_year: int | None, end_year: int | None) -> Optional[str]:
+    if start_year is not None and end_year is not None and start_year > end_year:
+        return "start must be <= end"
+    return None
 
 # ---- Vehicles ----
 
 def load_vehicle_df() -> pd.DataFrame:
     try:
-        return _read_table(Config.VEHICLE_DATA)
+        return get_repository().vehicles()
     except Exception:
         return pd.DataFrame()
 
+def load_vehicle_cube() -> Optional[TrendCube]:
+    # Vehicle_Type × State × Year; the dataset has no suburb column, so State is the place axis
+    return _cached_cube("vehicles",
+                        lambda df: _build_cube(df, "Vehicle_Type", "State", "Vehicle_Count", "ALL"))
+
 def filter_vehicles(vehicle_type: str | None, start_year: int | None, end_year: int | None, suburb: str | None) -> List[Dict[str, Any]]:
-    df = load_vehicle_df()
-    if df.empty:
+    cube = load_vehicle_cube()
+    if cube is None:
         return []
-    if vehicle_type and "Vehicle_Type" in df.columns:
-        df = df[df["Vehicle_Type"].astype(str).str.lower() == vehicle_type.lower()]
-    if suburb and "Suburb" in df.columns:
-        df = df[df["Suburb"].astype(str).str.lower() == suburb.lower()]
-    if start_year is not None and "Year" in df.columns:
-        df = df[df["Year"] >= int(start_year)]
-    if end_year is not None and "Year" in df.columns:
-        df = df[df["Year"] <= int(end_year)]
-    return df.to_dict(orient="records")
+    return cube.records(vehicle_type, suburb, start_year, end_year)
@@ -1,6 +1,6 @@
 # app/trends/vehicle_routes.py
 from flask import Blueprint, request, jsonify
-from app.trends.trend_utils import filter_vehicles
+from app.trends.trend_utils import filter_vehicles, load_vehicle_cube, range_error
 
 vehicle_bp = Blueprint("vehicles", __name__)
 
@@ -12,3 +12,49 @@ def vehicle_trends():
     suburb     = request.args.get("suburb")
     data = filter_vehicles(vehicle_type, start_year, end_year, suburb)
     return jsonify({"count": len(data), "items": data}), 200
+
+@vehicle_bp.get("/totals")
+def vehicle_totals():
+    vehicle_type = request.args.get("type")
+    start_year = request.args.get("start", type=int)
+    end_year   = request.args.get("end", type=int)
+    suburb     = request.args.get("suburb")
+    err = range_error(start_year, end_year)
+    if err:
+        return jsonify({"error": err}), 400
+    cube = load_vehicle_cube()
+    if cube is None:
+        return jsonify({"error": "Vehicle data unavailable"}), 503
+    return jsonify({"type": vehicle_type, "suburb": suburb,
+                    **cube.totals(vehicle_type, suburb, start_year, end_year)}), 200
+
+@vehicle_bp.get("/growth")
+def vehicle_growth():
+    vehicle_type = request.args.get("type")
+    start_year = request.args.get("start", type=int)
+    end_year   = request.args.get("end", type=int)
+    suburb     = request.args.get("suburb")
+    err = range_error(start_year, end_year)
+    if err:
+        return jsonify({"error": err}), 400
+    cube = load_vehicle_cube()
+    if cube is None:
+        return jsonify({"error": "Vehicle data unavailable"}), 503
+    return jsonify({"type": vehicle_type, "suburb": suburb,
+                    **cube.growth(vehicle_type, suburb, start_year, end_year)}), 200
+
+@vehicle_bp.get("/top")
+def vehicle_top():
+    n = request.args.get("n", default=5, type=int)
+    year = request.args.get("year", type=int)
+    start_year = request.args.get("start", type=int)
+    by = request.args.get("by", default="value")          # value | growth
+    group = request.args.get("group", default="type")     # type | place
+    cube = load_vehicle_cube()
+    if cube is None:
+        return jsonify({"error": "Vehicle data unavailable"}), 503
+    try:
+        items = cube.top(n, year, by=by, group=group, start=start_year)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"count": len(items), "items": items}), 200
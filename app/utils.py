@@ -1,9 +1,15 @@
 # app/utils.py
 
 import math
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
 import pandas as pd
 from typing import List, Optional, Any
 
+from app.config.config import Config
+
 def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate great-circle distance (in meters) between two latitude-longitude points using the haversine formula.
@@ -15,6 +21,18 @@ def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     a = math.sin(dphi / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlmb / 2) ** 2
     return 2 * R * math.asin(math.sqrt(a))
 
+def haversine_m_np(lat1: float, lon1: float, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """
+    Vectorised haversine: distance (in meters) from one point to arrays of latitude-longitude points.
+    """
+    R = 6371000.0
+    p1 = np.radians(lat1)
+    p2 = np.radians(lat2)
+    dphi = p2 - p1
+    dlmb = np.radians(np.asarray(lon2) - lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlmb / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
 def infer_col(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
     """
     Return the first matching column name from the candidate list that exists in the DataFrame.
@@ -31,3 +49,15 @@ def as_bool(value: Any, default: bool = False) -> bool:
         return value
     v = str(value).strip().lower()
     return v in ("1", "true", "yes", "y", "on")
+
+def local_now() -> datetime:
+    """
+    Current time in LOCAL_TIMEZONE (Melbourne), whatever zone the host runs in.
+    """
+    return datetime.now(ZoneInfo(Config.LOCAL_TIMEZONE))
+
+def to_local(at: datetime) -> datetime:
+    """
+    Convert an aware datetime to LOCAL_TIMEZONE; naive datetimes are taken as local already.
+    """
+    return at.astimezone(ZoneInfo(Config.LOCAL_TIMEZONE)) if at.tzinfo is not None else at
@@ -0,0 +1,152 @@
+# app/warmup.py
+"""
+Startup timing and the warm-up phase behind /api/ready.
+
+Importing app.init records how long the heavy libraries and the app's own modules take.
+Warm-up then loads what the first requests would otherwise pay for: the parking tables
+(through their snapshots), the live sensor snapshot, the spatial, join, restriction,
+street and tile indexes, the trend cubes, the LocationIQ session, and the model with its
+forecast table. /api/ready answers 503 until warm-up has finished. /api/health stays a
+plain liveness check.
+
+WARMUP_MODE:
+- background (default): warm up in a thread. The server accepts connections at once, and
+  load balancers wait for /api/ready
+- sync: create_app returns only when warm
+- off: no warm-up. Data loads on first use, and /api/ready reports ready straight away
+
+Under gunicorn with preload_app, the master warms up before forking (gunicorn.conf.py),
+so every worker starts ready.
+"""
+import time
+import importlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config.config import Config
+
+
+def warmup_stages() -> List[Tuple[str, Callable[[], Any]]]:
+    """(name, loader) pairs in the order they run; each loader is a cached no-op once built."""
+    from app.parking import parking_utils as pu
+    from app.parking.sensor_feed import sensor_store
+    from app.parking.tile_pyramid import tile_store
+    from app.parking.geocoding import geocoder
+    from app.trends.trend_utils import load_population_cube, load_vehicle_cube
+    from app.ml_model.ml_predictor import start_forecasts
+
+    stages = [
+        ("parking_tables", lambda: (pu.load_bays(), pu.load_zone_links(), pu.load_sign_plates(), pu.load_zone_map())),
+        ("sensor_snapshot", sensor_store.current),
+        ("spatial_index", pu.load_bay_index),
+        ("join_graph", pu.load_join_graph),
+        ("restrictions", pu.load_restriction_engine),
+        ("tiles", lambda: tile_store.current(sensor_store.current())),
+        ("nearest", pu.bay_sensor_rows),
+        ("trend_cubes", lambda: (load_population_cube(), load_vehicle_cube())),
+        ("http_client", lambda: geocoder.session),
+    ]
+    if Config.STREET_INDEX_ENABLED:
+        stages.insert(5, ("street_index", pu.load_street_index))
+    if Config.HISTORY_ENABLED:
+        from app.parking.history import history_store
+        from app.parking.turnover import turnover_store
+        # Turnover first: loaded (or replayed from the log) before the history batch
+        # seeded from the current snapshot reaches it
+        stages.append(("turnover", turnover_store.current))
+        stages.append(("history", history_store.load))
+    if Config.ML_PRELOAD_MODEL:
+        stages.append(("model", start_forecasts))
+    return stages
+
+
+class Startup:
+    """Import and warm-up timings for this process, and whether it is ready for traffic."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.imports_ms: Dict[str, float] = {}
+        self.warmup_ms: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.state = "cold"  # cold → warming → ready
+        self.stage: Optional[str] = None
+        self.ready_after_s: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    # ------------------------------------
+    # Imports
+    # ------------------------------------
+    def time_imports(self, *modules: str):
+        """Import ``modules`` in order, timing each. A module already pulled in by an earlier one costs ~0."""
+        for name in modules:
+            t = time.perf_counter()
+            importlib.import_module(name)
+            self.imports_ms[name] = (time.perf_counter() - t) * 1000
+
+    def imports_done(self):
+        """Attribute the rest of the import time since ``t0`` to the app's own modules."""
+        total = (time.perf_counter() - self.t0) * 1000
+        self.imports_ms["app"] = total - sum(v for k, v in self.imports_ms.items() if k != "app")
+
+    # ------------------------------------
+    # Warm-up
+    # ------------------------------------
+    def _mark_ready(self):
+        self.state = "ready"
+        self.ready_after_s = time.perf_counter() - self.t0
+
+    def run(self, stages: Optional[List[Tuple[str, Callable[[], Any]]]] = None):
+        """Run every stage once. A call made while another thread is warming up waits for it."""
+        with self._lock:
+            if self.ready:
+                return
+            self.state = "warming"
+            for name, fn in stages if stages is not None else warmup_stages():
+                self.stage = name
+                t = time.perf_counter()
+                try:
+                    fn()
+                except Exception as e:
+                    # Reported, not fatal: the same loader will be retried by the first request that needs it
+                    self.errors[name] = str(e)
+                    print(f"[Warmup] {name} failed: {e}")
+                self.warmup_ms[name] = (time.perf_counter() - t) * 1000
+            self.stage = None
+            self._mark_ready()
+        print("[Startup] " + self.summary())
+
+    def start(self, mode: str):
+        if mode == "off":
+            self._mark_ready()
+        elif mode == "sync":
+            self.run()
+        elif self._thread is None and not self.ready:
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def summary(self) -> str:
+        def parts(timings: Dict[str, float]) -> str:
+            return ", ".join(f"{k} {v:.0f}" for k, v in sorted(timings.items(), key=lambda kv: -kv[1]))
+        return (f"imports {sum(self.imports_ms.values()):.0f} ms ({parts(self.imports_ms)}); "
+                f"warm-up {sum(self.warmup_ms.values()):.0f} ms ({parts(self.warmup_ms)}); "
+                f"ready after {self.ready_after_s or 0:.2f} s")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "stage": self.stage,
+            "errors": dict(self.errors),
+            # dict() copies first: the warm-up thread may be adding entries
+            "imports_ms": {k: round(v, 1) for k, v in dict(self.imports_ms).items()},
+            "warmup_ms": {k: round(v, 1) for k, v in dict(self.warmup_ms).items()},
+            "ready_after_s": None if self.ready_after_s is None else round(self.ready_after_s, 3),
+        }
+
+
+startup = Startup()
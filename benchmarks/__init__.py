@@ -0,0 +1,5 @@
+# benchmarks/__init__.py
+"""
+Performance benchmarks: a synthetic dataset generator (benchmarks.synthetic) and a
+runner that drives the API through the Flask test client (benchmarks.run).
+"""
@@ -0,0 +1,239 @@
+# benchmarks/run.py
+"""
+Benchmark runner: generates (or reuses) a synthetic dataset, points the app at it and
+drives the main endpoints through the Flask test client.
+
+    python -m benchmarks.run --bays 10000 100000 --requests 300 --output results.json
+
+For each scale and scenario it reports the first (cold) request, latency percentiles,
+throughput and the process's peak RSS so far, as one JSON document. Each scale runs in
+a fresh interpreter, because Config reads the data paths at import time. The HTTP
+response cache is off unless --http-cache is given, so repeated queries are measured
+rather than served from memory.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import FILES, REPO_DIR, write_dataset
+
+SCENARIOS = ("find", "nearest", "realtime", "predict_many", "tiles", "population_trends", "vehicle_trends")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1 << 20) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _summary(latencies_ms: List[float], wall_s: float, statuses: List[int]) -> Dict[str, Any]:
+    lat = np.asarray(latencies_ms)
+    codes, counts = np.unique(statuses, return_counts=True)
+    return {
+        "requests": int(len(lat)),
+        "status_counts": {str(c): int(n) for c, n in zip(codes, counts)},
+        "mean_ms": round(float(lat.mean()), 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p90_ms": round(float(np.percentile(lat, 90)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "max_ms": round(float(lat.max()), 3),
+        "throughput_rps": round(len(lat) / wall_s, 1) if wall_s > 0 else None,
+    }
+
+
+def _url_factories(rng: np.random.Generator) -> Dict[str, Callable[[], str]]:
+    """Scenario name → function returning a random request URL over the loaded data."""
+    from app.parking.parking_utils import load_bays
+    from app.parking.sensor_feed import sensor_store
+    from app.parking.tile_pyramid import mercator_xy
+
+    bays = load_bays()
+    lat, lon = bays["Latitude"].to_numpy(float), bays["Longitude"].to_numpy(float)
+    zones = sensor_store.current().index.zone_keys
+    zones = zones[zones >= 0]
+
+    def point():
+        i = rng.integers(len(lat))
+        return lat[i] + rng.normal(0, 0.0005), lon[i] + rng.normal(0, 0.0005)
+
+    def find():
+        a, b = point()
+        return f"/api/parking/find?lat={a:.6f}&lon={b:.6f}&radius={rng.choice([100, 200, 500])}"
+
+    def nearest():
+        a, b = point()
+        return f"/api/parking/nearest?lat={a:.6f}&lon={b:.6f}&k=5&radius=800"
+
+    def realtime():
+        return f"/api/parking/realtime?zone_number={rng.choice(zones)}&only_available={rng.choice(['true', 'false'])}"
+
+    def predict_many():
+        return f"/api/parking/predict_many?zone_number={rng.choice(zones)}&hour={rng.integers(7, 20)}&hours_ahead=3"
+
+    def tiles():
+        z = int(rng.integers(12, 19))
+        a, b = point()
+        x, y = mercator_xy(a, b)
+        return f"/api/parking/tiles/{z}/{int(x * 2 ** z)}/{int(y * 2 ** z)}"
+
+    def population_trends():
+        start = int(rng.integers(2001, 2015))
+        return f"/api/population/trends?start={start}&end={start + int(rng.integers(1, 7))}"
+
+    def vehicle_trends():
+        return f"/api/vehicles/trends?start=2016&end={rng.choice([2020, 2021])}"
+
+    return {"find": find, "nearest": nearest, "realtime": realtime, "predict_many": predict_many, "tiles": tiles,
+            "population_trends": population_trends, "vehicle_trends": vehicle_trends}
+
+
+def run_scale(n_bays: int, data_dir: str, requests: int, threads: int, seed: int,
+              scenarios: List[str]) -> Dict[str, Any]:
+    """Runs inside the child interpreter, after the Config environment is set."""
+    t0 = time.perf_counter()
+    from app.init import create_app
+    from app.warmup import startup
+    imported = time.perf_counter()
+    app = create_app()  # WARMUP_MODE=sync: returns once every dataset and index is loaded
+    created = time.perf_counter()
+
+    rng = np.random.default_rng(seed)
+    urls = _url_factories(rng)
+
+    status = startup.status()
+    out: Dict[str, Any] = {
+        "bays": n_bays,
+        "startup": {"import_s": round(imported - t0, 3), "create_app_s": round(created - imported, 3),
+                    "imports_ms": status["imports_ms"], "warmup_ms": status["warmup_ms"]},
+        "scenarios": {},
+    }
+    for name in scenarios:
+        client = app.test_client()
+        t = time.perf_counter()
+        cold = client.get(urls[name]())
+        cold_ms = (time.perf_counter() - t) * 1000
+        batch = [urls[name]() for _ in range(requests)]
+
+        def timed(url: str):
+            c = app.test_client()
+            s = time.perf_counter()
+            resp = c.get(url)
+            return (time.perf_counter() - s) * 1000, resp.status_code
+
+        start = time.perf_counter()
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = list(pool.map(timed, batch))
+        else:
+            results = [timed(u) for u in batch]
+        wall = time.perf_counter() - start
+
+        stats = _summary([ms for ms, _ in results], wall, [code for _, code in results])
+        stats.update(cold_ms=round(cold_ms, 3), cold_status=cold.status_code, peak_rss_mb=_peak_rss_mb())
+        out["scenarios"][name] = stats
+        print(f"[bench] {n_bays} bays  {name:<18} p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  "
+              f"{stats['throughput_rps']} req/s", file=sys.stderr)
+    out["peak_rss_mb"] = _peak_rss_mb()
+    return out
+
+
+def _child_env(paths: Dict[str, str], data_dir: str, http_cache: bool) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(paths)
+    env.update({
+        "SNAPSHOT_DIR": os.path.join(data_dir, ".snapshots"),
+        # Synthetic sensor events go to the dataset's own history log, never the app's
+        "HISTORY_DIR": os.path.join(data_dir, ".history"),
+        "SENSOR_REFRESH_SECONDS": "0",
+        "HTTP_CACHE_ENABLED": "1" if http_cache else "0",
+        "WARMUP_MODE": "sync",
+        "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FindMySpot API on synthetic data.")
+    parser.add_argument("--bays", type=int, nargs="+", default=[10_000, 100_000], help="Scales to run")
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent client threads")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-root", default=os.path.join(REPO_DIR, "benchmarks", ".data"),
+                        help="Where generated datasets are kept (reused across runs)")
+    parser.add_argument("--http-cache", action="store_true", help="Leave the HTTP response cache on")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)  # internal: run one scale in this process
+    args = parser.parse_args()
+
+    if args.child:
+        n_bays, data_dir = args.child.split(":", 1)
+        result = run_scale(int(n_bays), data_dir, args.requests, args.threads, args.seed, args.scenarios)
+        print(json.dumps(result))
+        return
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "threads": args.threads,
+            "seed": args.seed,
+            "http_cache": args.http_cache,
+        },
+        "runs": [],
+    }
+    for n_bays in args.bays:
+        data_dir = os.path.join(args.data_root, f"bays-{n_bays}-seed-{args.seed}")
+        t = time.perf_counter()
+        if os.path.exists(os.path.join(data_dir, "zone_locations.json")):
+            paths = {key: os.path.join(data_dir, name) for key, name in FILES.items()}
+            generate_s = None
+        else:
+            paths = write_dataset(n_bays, data_dir, args.seed)
+            generate_s = round(time.perf_counter() - t, 3)
+
+        cmd = [sys.executable, "-m", "benchmarks.run", "--child", f"{n_bays}:{data_dir}",
+               "--requests", str(args.requests), "--threads", str(args.threads), "--seed", str(args.seed),
+               "--scenarios", *args.scenarios]
+        proc = subprocess.run(cmd, cwd=REPO_DIR, env=_child_env(paths, data_dir, args.http_cache),
+                              stdout=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            report["runs"].append({"bays": n_bays, "error": f"benchmark exited with {proc.returncode}"})
+            continue
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        run["generate_s"] = generate_s
+        report["runs"].append(run)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"[bench] wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# benchmarks/synthetic.py
+"""
+Synthetic city-scale parking datasets with the same schema as the files in data/.
+
+The city is grown around the Melbourne CBD and keeps the real density, so the area scales
+with the bay count. Road segments carry about 8 bays each. Zones are spatial clusters of
+segments, and some segments link to a second zone. About 62% of bays have a sensor, and
+7% of sensors have no zone, as in the real feed. Sign plate sets and zone → location names
+are sampled from the real files, so restriction parsing and the model see realistic
+values.
+
+    python -m benchmarks.synthetic --bays 100000 --out /tmp/fms-100k
+"""
+import os
+import json
+import argparse
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_DATA = os.path.join(REPO_DIR, "data")
+REAL_ZONE_MAP = os.path.join(REPO_DIR, "app", "config", "zone_locations.json")
+
+# Output file names; the runner points the Config paths at them
+FILES = {
+    "PARKING_BAYS_DATA": "on_street_parking_bays.csv",
+    "BAY_SENSORS_DATA": "on_street_parking_bay_sensors.csv",
+    "PARKING_ZONES_DATA": "parking_zones_linked_to_street_segments.csv",
+    "SIGN_PLATES_DATA": "sign_plates_located_in_each_parking_zone.csv",
+    "ZONE_LOCATIONS_PATH": "zone_locations.json",
+}
+
+CENTER_LAT, CENTER_LON = -37.8136, 144.9631
+M_PER_DEG_LAT = 111_195.0
+# The real 5,339 bays cover roughly 5.5 km × 5.5 km
+REAL_BAYS, REAL_SIDE_M = 5339, 5500.0
+BAYS_PER_SEGMENT = 8
+SEGMENT_LENGTH_M = 120.0
+ZONE_CELL_M = 150.0
+SENSOR_SHARE = 0.62
+UNZONED_SENSOR_SHARE = 0.07
+PRESENT_SHARE = 0.62
+
+
+def _location_text(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    return np.char.add(np.char.add(lat.round(7).astype(str), ", "), lon.round(7).astype(str))
+
+
+def generate(n_bays: int, seed: int = 0) -> Dict[str, object]:
+    """DataFrames (and the zone → location map) keyed like FILES."""
+    rng = np.random.default_rng(seed)
+    side = REAL_SIDE_M * np.sqrt(max(n_bays, 1) / REAL_BAYS)
+    m_per_deg_lon = M_PER_DEG_LAT * np.cos(np.radians(CENTER_LAT))
+
+    real_links = pd.read_csv(os.path.join(REAL_DATA, "parking_zones_linked_to_street_segments_cleaned.csv"))
+    real_plates = pd.read_csv(os.path.join(REAL_DATA, "sign_plates_located_in_each_parking_zone_cleaned.csv"))
+    with open(REAL_ZONE_MAP) as f:
+        real_locations = np.array(sorted(set(json.load(f).values())), dtype=object)
+    streets = real_links["OnStreet"].dropna().unique().astype(object)
+
+    # Road segments: a centre, a heading, and street names
+    n_seg = max(int(np.ceil(n_bays / BAYS_PER_SEGMENT)), 1)
+    seg_x = rng.uniform(-side / 2, side / 2, n_seg)
+    seg_y = rng.uniform(-side / 2, side / 2, n_seg)
+    heading = rng.uniform(0, np.pi, n_seg)
+    seg_id = 20000 + np.arange(n_seg)
+    on_street, street_from, street_to = (rng.choice(streets, n_seg) for _ in range(3))
+
+    # Zones: spatial cells of segments; one in five segments also links to a neighbour's zone
+    cell = np.floor(seg_x / ZONE_CELL_M).astype(np.int64) * 1_000_003 + np.floor(seg_y / ZONE_CELL_M).astype(np.int64)
+    _, seg_zone = np.unique(cell, return_inverse=True)
+    seg_zone = 7000 + seg_zone.ravel()
+    zones = np.unique(seg_zone)
+    extra = rng.random(n_seg) < 0.2
+    link_seg = np.r_[np.arange(n_seg), np.flatnonzero(extra)]
+    link_zone = np.r_[seg_zone, rng.choice(zones, int(extra.sum()))]
+    zone_links = pd.DataFrame({
+        "ParkingZone": link_zone,
+        "OnStreet": on_street[link_seg],
+        "StreetFrom": street_from[link_seg],
+        "StreetTo": street_to[link_seg],
+        "Segment_ID": seg_id[link_seg],
+    })
+
+    # Bays spread along their segment, with a little kerbside jitter
+    bay_seg = np.sort(rng.integers(0, n_seg, n_bays))
+    along = rng.uniform(-SEGMENT_LENGTH_M / 2, SEGMENT_LENGTH_M / 2, n_bays)
+    x = seg_x[bay_seg] + along * np.cos(heading[bay_seg]) + rng.normal(0, 3, n_bays)
+    y = seg_y[bay_seg] + along * np.sin(heading[bay_seg]) + rng.normal(0, 3, n_bays)
+    lat = CENTER_LAT + y / M_PER_DEG_LAT
+    lon = CENTER_LON + x / m_per_deg_lon
+    kerbside = 100000 + np.arange(n_bays)
+    updated = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n_bays), unit="D")
+    bays = pd.DataFrame({
+        "RoadSegmentID": seg_id[bay_seg],
+        "KerbsideID": kerbside,
+        "RoadSegmentDescription": np.char.add(np.char.add(np.char.add(np.char.add(
+            on_street[bay_seg].astype(str), " between "), street_from[bay_seg].astype(str)), " and "),
+            street_to[bay_seg].astype(str)),
+        "Latitude": lat.round(7),
+        "Longitude": lon.round(7),
+        "LastUpdated": updated.strftime("%Y-%m-%d"),
+        "Location": _location_text(lat, lon),
+    })
+
+    # Sensors on a subset of bays
+    s = np.sort(rng.choice(n_bays, int(n_bays * SENSOR_SHARE), replace=False))
+    sensor_zone = seg_zone[bay_seg[s]].astype(np.float64)
+    sensor_zone[rng.random(len(s)) < UNZONED_SENSOR_SHARE] = np.nan
+    now = pd.Timestamp("2025-01-22T14:44:37+11:00")
+    status_ts = now - pd.to_timedelta(rng.integers(60, 30 * 86400, len(s)), unit="s")
+    sensors = pd.DataFrame({
+        "Lastupdated": now.isoformat(),
+        "Status_Timestamp": status_ts.strftime("%Y-%m-%dT%H:%M:%S+11:00"),
+        "Zone_Number": pd.array(sensor_zone, dtype="Int64"),
+        "Status_Description": np.where(rng.random(len(s)) < PRESENT_SHARE, "Present", "Unoccupied"),
+        "KerbsideID": kerbside[s],
+        "Location": bays["Location"].to_numpy()[s],
+        "Latitude": bays["Latitude"].to_numpy()[s],
+        "Longitude": bays["Longitude"].to_numpy()[s],
+    })
+
+    # Sign plates: each zone copies the plate set of a random real zone
+    groups = [g.drop(columns="ParkingZone") for _, g in real_plates.groupby("ParkingZone")]
+    sizes = np.array([len(g) for g in groups])
+    pick = rng.integers(0, len(groups), len(zones))
+    template = pd.concat(groups, ignore_index=True)
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    lens = sizes[pick]
+    rows = np.repeat(starts[pick] - (np.cumsum(lens) - lens), lens) + np.arange(int(lens.sum()))
+    sign_plates = template.iloc[rows].reset_index(drop=True)
+    sign_plates.insert(0, "ParkingZone", np.repeat(zones, lens))
+
+    zone_locations = dict(zip(zones.astype(str).tolist(), rng.choice(real_locations, len(zones)).tolist()))
+    return {
+        "PARKING_BAYS_DATA": bays,
+        "BAY_SENSORS_DATA": sensors,
+        "PARKING_ZONES_DATA": zone_links,
+        "SIGN_PLATES_DATA": sign_plates,
+        "ZONE_LOCATIONS_PATH": zone_locations,
+    }
+
+
+def write_dataset(n_bays: int, out_dir: str, seed: int = 0) -> Dict[str, str]:
+    """Generate and write a dataset; returns Config attribute → file path."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for key, data in generate(n_bays, seed).items():
+        path = os.path.join(out_dir, FILES[key])
+        if isinstance(data, pd.DataFrame):
+            data.to_csv(path, index=False)
+        else:
+            with open(path, "w") as f:
+                json.dump(data, f)
+        paths[key] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic FindMySpot parking dataset.")
+    parser.add_argument("--bays", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="Output directory")
+    args = parser.parse_args()
+    for key, path in write_dataset(args.bays, args.out, args.seed).items():
+        print(f"{key}={path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# gunicorn.conf.py  (repo root; picked up by `gunicorn wsgi:app`)
+"""
+The master imports the app and runs the warm-up (app/warmup.py) before forking. Workers
+therefore start ready, and share the loaded datasets copy-on-write (see app/memory.py).
+Each worker then restarts its own sensor refresher and forecast thread. With
+GUNICORN_PRELOAD=0, each worker warms up on its own and /api/ready reports when it is done.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        from app.memory import before_fork, preload_shared_data
+        preload_shared_data()
+        before_fork()
+
+
+def post_fork(server, worker):
+    from app.memory import after_fork
+    after_fork()
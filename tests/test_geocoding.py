@@ -0,0 +1,144 @@
+# tests/test_geocoding.py
+"""
+LocationIQClient against a local stub server (http.server on 127.0.0.1): TTL-LRU caching,
+coalescing of identical lookups, timeouts and non-200 answers.
+
+Run from the repository root: python -m pytest tests
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+requests = pytest.importorskip("requests")
+
+from app.parking.geocoding import LocationIQClient
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """/search and /autocomplete: q="slow ..." sleeps, "missing ..." → 404, "broken ..." → 500."""
+    calls = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = parse_qs(url.query).get("q", [""])[0]
+        type(self).calls.append((url.path, q))
+        if q.startswith("slow"):
+            time.sleep(0.5)
+        if q.startswith("missing"):
+            return self._send(404, {"error": "Unable to geocode"})
+        if q.startswith("broken"):
+            return self._send(500, {"error": "Internal error"})
+        if url.path.endswith("/autocomplete"):
+            rows = [{"display_name": f"{q} Street, Melbourne", "lat": "-37.81", "lon": "144.96"}]
+        else:
+            rows = [{"display_name": q, "lat": "-37.8136", "lon": "144.9631"}]
+        self._send(200, rows)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(stub_url):
+    _Stub.calls.clear()
+
+    def make(**kwargs):
+        kwargs.setdefault("timeout", 2)
+        return LocationIQClient(base_url=stub_url, key_fn=lambda: "test-key", cache_path="", **kwargs)
+    return make
+
+
+def test_repeated_lookups_are_served_from_cache(make_client):
+    client = make_client()
+    first = client.search("Swanston  St", countrycodes="au")
+    # Same query after normalisation (case, spacing) → cache hit, no second upstream call
+    assert client.search("swanston st", countrycodes="au") == first
+    assert first[0]["display_name"] == "Swanston St"
+    assert len(_Stub.calls) == 1
+    assert client.stats()["hits"] == 1 and client.stats()["upstream_calls"] == 1
+
+
+def test_entries_expire_after_ttl(make_client):
+    client = make_client(ttl=0.2)
+    client.search("Collins St")
+    time.sleep(0.3)
+    client.search("Collins St")
+    assert len(_Stub.calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted(make_client):
+    client = make_client(cache_size=2)
+    for q in ("a st", "b st", "a st", "c st"):  # "b st" is the least recently used when "c st" arrives
+        client.search(q)
+    client.search("a st")
+    client.search("b st")
+    assert [q for _, q in _Stub.calls] == ["a st", "b st", "c st", "b st"]
+
+
+def test_concurrent_identical_lookups_share_one_call(make_client):
+    client = make_client()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.search("slow lane"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 5 and len(_Stub.calls) == 1
+
+
+def test_autocomplete_answers_longer_prefix_from_cache(make_client):
+    client = make_client()
+    client.autocomplete("flinders", limit=5)
+    rows = client.autocomplete("flinders st", limit=5)
+    assert rows and len(_Stub.calls) == 1 and client.stats()["prefix_hits"] == 1
+
+
+def test_timeout_raises_and_is_not_cached(make_client):
+    client = make_client(timeout=0.1)
+    with pytest.raises(requests.exceptions.Timeout):
+        client.search("slow road")
+    with pytest.raises(requests.exceptions.Timeout):
+        client.search("slow road")
+    assert len(_Stub.calls) == 2
+
+
+def test_not_found_is_an_empty_cached_result(make_client):
+    client = make_client()
+    assert client.search("missing place") == []
+    assert client.search("missing place") == []
+    assert len(_Stub.calls) == 1
+
+
+def test_server_error_raises_and_is_not_cached(make_client):
+    client = make_client()
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.search("broken road")
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.search("broken road")
+    assert len(_Stub.calls) == 2